@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+Headless batch processing.
+
+This module runs a recorded operation chain (preprocessing and processing operations) on data files
+and measures the detected spots without starting the user interface, spreading the files across
+worker processes. The measured data of all files is written to a single CSV file.
+
+Usage:
+    python -m batch --type s94 --pipeline chain.json --output results data/folder other.s94
+    python -m batch --list-operations
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, os.path.dirname(os.path.realpath(__file__)))
+
+import argparse
+import csv
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from data.data_manager import create_data_models
+from data.files.parallel_loader import read_data_file
+from data.detection.spots_measurement import analyze_images
+from data.detection.morphometrics import calculate_morphometrics, MORPHOMETRICS_COLUMNS
+from data.detection.spatial_statistics import (
+    compute_nearest_neighbors,
+    calculate_spatial_statistics,
+    NEIGHBOR_BOUNDARY_MODES,
+    SPATIAL_COLUMNS
+)
+from data.detection.tracking import track_spots_across_frames, calculate_track_statistics, TRACK_STATS_DTYPE
+from data.pipeline import load_pipeline, apply_operation_batch
+from data.operation_registry import get_operations
+from data.operation_cache import OperationCache
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+FILE_TYPES = ("s94", "stp", "mpp")
+
+RESULT_COLUMNS = [
+    "file",
+    "frame",
+    "label",
+    "area",
+    "nearest_neighbor_distance",
+    "nearest_neighbor_label",
+    *MORPHOMETRICS_COLUMNS,
+    *SPATIAL_COLUMNS
+]
+
+TRACK_COLUMNS = ["file", *TRACK_STATS_DTYPE.names]
+
+def collect_input_files(inputs, file_type):
+    """
+    Expand the input paths into a list of files of the given type.
+
+    Args:
+        inputs (list): Paths of files or folders; folders contribute all files of the given type.
+        file_type (str): The type of the files ('s94', 'stp', 'mpp').
+
+    Returns:
+        list: Paths of the files, folder contents in sorted order.
+
+    Raises:
+        FileNotFoundError: If an input path does not exist.
+    """
+    extension = f".{file_type.lower()}"
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.lower().endswith(extension)
+            )
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"Input path '{path}' does not exist.")
+    return files
+
+def track_file_spots(data_models, all_centroids, tracking):
+    """
+    Link the spots of all frames of a file into tracks.
+
+    Args:
+        data_models (list): FileDataModel instances, one per frame.
+        all_centroids (list): Centroids (row, col) in pixels of the spots of each frame.
+        tracking (dict): Tracking settings: 'max_distance' (nm), 'max_gap' (frames) and 'frame_interval'.
+
+    Returns:
+        tuple: Track id of every spot, in frame order, and the track statistics.
+    """
+    positions = np.concatenate([
+        np.asarray(centroids).reshape(-1, 2)[:, ::-1] * (data_model.x_px_nm_coefficient, data_model.y_px_nm_coefficient)
+        for data_model, centroids in zip(data_models, all_centroids)
+    ])
+    counts = [len(centroids) for centroids in all_centroids]
+    offsets = np.r_[0, np.cumsum(counts)]
+    frames = np.repeat(np.arange(len(counts)), counts)
+
+    track_ids = track_spots_across_frames(positions, offsets, tracking["max_distance"], tracking["max_gap"])
+    stats = calculate_track_statistics(positions, frames, track_ids, tracking["frame_interval"])
+    return track_ids, stats
+
+def process_file(file_path, file_type, operations, tracking=None, boundary="none", float_precision=False):
+    """
+    Read a file, run the operation chain on every frame and measure the spots.
+
+    This is the unit of work executed by the pool workers.
+
+    Args:
+        file_path (str): The path to the file.
+        file_type (str): The type of the file ('s94', 'stp', 'mpp').
+        operations (list): List of dictionaries with 'name' and 'params' keys.
+        tracking (dict, optional): Tracking settings (see track_file_spots); None disables tracking.
+        boundary (str): Boundary mode of the nearest neighbor distances, one of NEIGHBOR_BOUNDARY_MODES.
+        float_precision (bool): Whether the chain starts from the float heights instead of the greyscale images.
+
+    Returns:
+        tuple: The file path, a list of result rows (dictionaries keyed by RESULT_COLUMNS, plus
+               'track_id' when tracking), a list of track rows (dictionaries keyed by TRACK_COLUMNS)
+               and an error message, None if the file was processed successfully.
+    """
+    try:
+        item = read_data_file(file_path, file_type)
+        data_models = create_data_models(file_type, item)
+
+        # The frames of a file share their size, so operations with a batched implementation process them as one stack
+        images = [data_model.get_pipeline_input(float_precision) for data_model in data_models]
+        for operation in operations:
+            images = [image for _, image in apply_operation_batch(operation["name"], operation["params"], images)]
+
+        all_centroids, all_areas, all_labels_names, _, _, labeled_images, _ = analyze_images(images)
+
+        rows = []
+        file_name = os.path.basename(file_path)
+        for i, data_model in enumerate(data_models):
+            areas = all_areas[i] * data_model.area_px_nm_coefficient
+            distances, neighbor_names = compute_nearest_neighbors(
+                all_centroids[i],
+                all_labels_names[i],
+                labeled_images[i].shape,
+                data_model.x_px_nm_coefficient,
+                data_model.y_px_nm_coefficient,
+                boundary
+            )
+            morphometrics = calculate_morphometrics(
+                labeled_images[i],
+                data_model.data,
+                data_model.x_px_nm_coefficient,
+                data_model.y_px_nm_coefficient
+            )
+            spatial = calculate_spatial_statistics(
+                all_labels_names[i],
+                all_centroids[i],
+                labeled_images[i].shape,
+                data_model.x_px_nm_coefficient,
+                data_model.y_px_nm_coefficient,
+                boundary=boundary
+            )
+            for label, area, distance, neighbor_name, record, spatial_record in zip(all_labels_names[i], areas, distances, neighbor_names, morphometrics, spatial):
+                row = {
+                    "file": file_name,
+                    "frame": data_model.data_name,
+                    "label": label,
+                    "area": area,
+                    "nearest_neighbor_distance": distance,
+                    "nearest_neighbor_label": neighbor_name
+                }
+                for column in MORPHOMETRICS_COLUMNS:
+                    row[column] = record[column]
+                for column in SPATIAL_COLUMNS:
+                    row[column] = spatial_record[column]
+                rows.append(row)
+
+        track_rows = []
+        if tracking is not None:
+            track_ids, stats = track_file_spots(data_models, all_centroids, tracking)
+            for row, track_id in zip(rows, track_ids):
+                row["track_id"] = track_id
+            for record in stats:
+                track_row = {"file": file_name}
+                for column in TRACK_STATS_DTYPE.names:
+                    track_row[column] = record[column]
+                track_rows.append(track_row)
+
+        return file_path, rows, track_rows, None
+    except Exception as e:
+        logger.error(f"Error processing file '{file_path}': {e}")
+        return file_path, [], [], str(e)
+
+def configure_worker(cache_dir):
+    """
+    Configure the operation cache of a worker process.
+
+    Args:
+        cache_dir (str): Folder of the on-disk operation cache shared by the workers; None disables it.
+    """
+    if cache_dir:
+        OperationCache().configure(disk_dir=cache_dir, write_through=True)
+
+def run_batch(file_paths, file_type, operations, output_path, max_workers=None, cache_dir=None, tracking=None, boundary="none", float_precision=False):
+    """
+    Process the files in parallel and write the measured data to a CSV file.
+
+    Rows are written in the order of the input files as soon as each file is done.
+
+    Args:
+        file_paths (list): Paths of the files to process.
+        file_type (str): The type of the files ('s94', 'stp', 'mpp').
+        operations (list): List of dictionaries with 'name' and 'params' keys.
+        output_path (str): Path of the CSV file to write.
+        max_workers (int, optional): Number of worker processes; None uses all cores.
+        cache_dir (str, optional): Folder of an on-disk operation cache, so that re-runs of the
+            same chain on the same files skip the already computed operations.
+        tracking (dict, optional): Tracking settings (see track_file_spots); when given, spots are linked
+            across frames, a 'track_id' column is added and the track statistics are written to
+            'tracks.csv' next to the output file.
+        boundary (str): Boundary mode of the nearest neighbor distances, one of NEIGHBOR_BOUNDARY_MODES.
+        float_precision (bool): Whether the chains start from the float heights instead of the greyscale images.
+
+    Returns:
+        list: Tuples (file path, error message) of the files that failed.
+    """
+    failed = []
+    total = len(file_paths)
+    with ExitStack() as stack:
+        csv_file = stack.enter_context(open(output_path, "w", newline="", encoding="utf-8"))
+        writer = csv.DictWriter(csv_file, fieldnames=RESULT_COLUMNS + (["track_id"] if tracking else []))
+        writer.writeheader()
+
+        tracks_writer = None
+        if tracking is not None:
+            tracks_path = os.path.join(os.path.dirname(output_path), "tracks.csv")
+            tracks_file = stack.enter_context(open(tracks_path, "w", newline="", encoding="utf-8"))
+            tracks_writer = csv.DictWriter(tracks_file, fieldnames=TRACK_COLUMNS)
+            tracks_writer.writeheader()
+
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=configure_worker, initargs=(cache_dir,)) as executor:
+            results = executor.map(
+                process_file,
+                file_paths,
+                [file_type] * total,
+                [operations] * total,
+                [tracking] * total,
+                [boundary] * total,
+                [float_precision] * total
+            )
+            for done, (file_path, rows, track_rows, error) in enumerate(results, start=1):
+                if error is not None:
+                    failed.append((file_path, error))
+                writer.writerows(rows)
+                if tracks_writer is not None:
+                    tracks_writer.writerows(track_rows)
+                logger.info(f"[{done}/{total}] {file_path}: {len(rows)} spots")
+
+    return failed
+
+def format_operations():
+    """
+    Describe the registered operations and their parameters.
+
+    Returns:
+        str: One line per operation, followed by one indented line per parameter.
+    """
+    lines = []
+    for operation in get_operations():
+        dtypes = ", ".join(dtype.name for dtype in operation.input_dtypes)
+        output = operation.output_dtype.name if operation.output_dtype is not None else "same"
+        flags = [operation.kind]
+        if operation.batched is not None:
+            flags.append("batched for " + ", ".join(dtype.name for dtype in operation.batched_dtypes))
+        if operation.interactive:
+            flags.append("interactive, not available in batch mode")
+        lines.append(f"{operation.name} [{operation.category}] ({'; '.join(flags)}): {dtypes} -> {output}")
+        for param in operation.params:
+            if param.is_choice:
+                values = "one of " + ", ".join(str(value) for _, value in param.choices)
+            else:
+                values = f"{param.type.__name__} in [{param.minimum}, {param.maximum}]" + (", odd" if param.odd else "")
+            lines.append(f"    {param.name}: {values}, default {param.default}")
+    return "\n".join(lines)
+
+def parse_args(argv=None):
+    """
+    Parse the command line arguments.
+
+    Args:
+        argv (list, optional): Arguments to parse; None uses sys.argv.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m batch",
+        description="Run an operation chain and spot measurement on data files without the user interface."
+    )
+    parser.add_argument("inputs", nargs="*", help="Data files or folders holding data files.")
+    parser.add_argument("--type", choices=FILE_TYPES, help="Type of the data files.")
+    parser.add_argument("--list-operations", action="store_true", help="List the operations available in pipelines with their parameters and exit.")
+    parser.add_argument("--pipeline", help="JSON file with the operation chain; without it the original images are measured.")
+    parser.add_argument("--output", default="results", help="Output folder (default: results).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: all cores).")
+    parser.add_argument("--cache-dir", default=None, help="Folder of an on-disk cache of operation results, reused by later runs.")
+    parser.add_argument("--boundary", default="none", choices=NEIGHBOR_BOUNDARY_MODES, help="Handling of spots near the image border by the nearest neighbor distances (default: none).")
+    parser.add_argument("--float", action="store_true", help="Run the operation chain on the heights in float precision instead of the 8-bit greyscale images.")
+    parser.add_argument("--track", action="store_true", help="Link spots across the frames of each file into tracks.")
+    parser.add_argument("--max-distance", type=float, default=5.0, help="Largest spot displacement between frames, in nm (default: 5).")
+    parser.add_argument("--max-gap", type=int, default=1, help="Largest number of frames a tracked spot may be missed in (default: 1).")
+    parser.add_argument("--frame-interval", type=float, default=1.0, help="Time between frames; sets the time unit of diffusion coefficients (default: 1).")
+    args = parser.parse_args(argv)
+    if not args.list_operations:
+        if not args.inputs:
+            parser.error("the following arguments are required: inputs")
+        if args.type is None:
+            parser.error("the following arguments are required: --type")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list_operations:
+        print(format_operations())
+        return 0
+    logging.getLogger().setLevel(logging.INFO)
+
+    try:
+        operations = load_pipeline(args.pipeline) if args.pipeline else []
+        file_paths = collect_input_files(args.inputs, args.type)
+    except Exception as e:
+        logger.critical(f"Invalid batch input: {e}")
+        print(f"Error: {e}")
+        return 2
+
+    if not file_paths:
+        print(f"No .{args.type} files found.")
+        return 1
+
+    os.makedirs(args.output, exist_ok=True)
+    output_path = os.path.join(args.output, "measured_data.csv")
+
+    tracking = None
+    if args.track:
+        tracking = {
+            "max_distance": args.max_distance,
+            "max_gap": args.max_gap,
+            "frame_interval": args.frame_interval
+        }
+
+    failed = run_batch(file_paths, args.type, operations, output_path, args.workers, args.cache_dir, tracking, args.boundary, args.float)
+
+    print(f"Processed {len(file_paths) - len(failed)}/{len(file_paths)} files, results written to {output_path}")
+    for file_path, error in failed:
+        print(f"Failed: {file_path}: {error}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
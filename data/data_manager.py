@@ -17,12 +17,18 @@ sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
 
 from data.observer.observable import Observable
 from data.model.file_data_model import FileDataModel
+from data.model.frame_proxy import FrameCache, FrameProxy
+from data.files.read_s94 import scale_s94_item_data
+from data.detection.spatial_statistics import NEIGHBOR_BOUNDARY_MODES
+from data.overlay_export import OVERLAY_FORMATS
+from data.session import save_session, load_session
 
 from data.file_params import (
     calculate_avg_nm_per_px,
     calculate_pixel_to_nm_coefficients
 )
 
+import numpy as np
 from PIL import Image
 
 import logging
@@ -55,6 +61,11 @@ class DataManager(Observable):
         if not hasattr(self, 'initialized'):
             super().__init__()
             self.data_for_analisys = []  # List to store data for analysis
+            self.frame_cache = FrameCache()  # Decoded frames of lazily loaded movies
+            self.analysis_workers = None  # Worker processes used by spot analysis, None for all cores
+            self.neighbor_boundary = "none"  # Boundary mode of the nearest neighbor distances
+            self.overlay_format = "png"  # Format of the overlay images saved with the measured data
+            self.float_pipeline = False  # Whether operation chains start from the float heights instead of the greyscale image
             self.initialized = True  # Flag to prevent reinitialization
 
     def clear_data(self):
@@ -62,8 +73,94 @@ class DataManager(Observable):
         Clear all data from the data list and notify observers.
         """
         self.data_for_analisys.clear()
+        self.frame_cache.clear()
         self.notify_observers()
+
+    def set_frame_cache_size(self, max_items):
+        """
+        Set the maximum number of decoded frames kept in memory for lazily loaded movies.
+
+        Args:
+            max_items (int): Maximum number of decoded entries held by the frame cache.
+        """
+        self.frame_cache.max_items = max_items
+
+    def set_analysis_workers(self, workers):
+        """
+        Set the number of worker processes used by spot analysis.
+
+        Args:
+            workers (int): Number of worker processes; 1 analyzes in the application process, None uses all cores.
+        """
+        self.analysis_workers = max(1, int(workers)) if workers is not None else None
+
+    def set_neighbor_boundary(self, boundary):
+        """
+        Set how spots near the image border are handled by the nearest neighbor distances.
+
+        Args:
+            boundary (str): 'none', 'exclude' or 'periodic' (see NEIGHBOR_BOUNDARY_MODES).
+
+        Raises:
+            ValueError: If the boundary mode is unknown.
+        """
+        if boundary not in NEIGHBOR_BOUNDARY_MODES:
+            raise ValueError(f"Unknown boundary mode '{boundary}'.")
+        self.neighbor_boundary = boundary
+
+    def set_overlay_format(self, overlay_format):
+        """
+        Set the format of the overlay images saved with the measured data.
+
+        Args:
+            overlay_format (str): 'png', 'tiff', 'tiff_stack', 'bmp' or 'none' (see OVERLAY_FORMATS).
+
+        Raises:
+            ValueError: If the overlay format is unknown.
+        """
+        if overlay_format not in OVERLAY_FORMATS:
+            raise ValueError(f"Unknown overlay format '{overlay_format}'.")
+        self.overlay_format = overlay_format
+
+    def set_float_pipeline(self, enabled):
+        """
+        Set whether operation chains are applied to the measured heights in float precision.
+
+        Args:
+            enabled (bool): True to start the chains from the float heights, quantized only for display;
+                            False to start them from the 8-bit greyscale image.
+        """
+        self.float_pipeline = bool(enabled)
     
+    def save_session(self, path, compress=True):
+        """
+        Save all items, with their operations and analysis results, to a session file.
+
+        Args:
+            path (str): Path of the session file.
+            compress (bool): Whether the analysis results are compressed.
+
+        Raises:
+            ValueError: If saving fails.
+        """
+        save_session(path, self.data_for_analisys, compress)
+
+    def open_session(self, path):
+        """
+        Replace all items with the items of a session file and notify observers.
+
+        Args:
+            path (str): Path of the session file.
+
+        Raises:
+            ValueError: If the file cannot be read; the current items are kept.
+        """
+        data_models = load_session(path)
+        self.data_for_analisys.clear()
+        self.frame_cache.clear()
+        self.data_for_analisys.extend(data_models)
+        self.notify_observers()
+
     def get_index(self, item):
         """
         Get the index of the specified item in the data list.
@@ -86,89 +183,134 @@ class DataManager(Observable):
         self.data_for_analisys.remove(item)
         self.notify_observers()
 
-    def insert_data(self, file_ext, item):
+    def insert_data(self, file_ext, item, notify=True):
         """
         Insert new data into the data list based on the file extension.
 
         Args:
             file_ext (str): The file extension (e.g., 'stp', 's94', 'mpp').
-            item (dict): The item containing file data and header information.
+            item (dict): The item containing file data and header information. An optional
+                'images' list holds greyscale images already converted, one per frame.
+            notify (bool): If False observers are not notified; used when inserting in batches.
 
         Raises:
             Exception: If there is an error during data insertion.
         """
         try:
-            # Calculate conversion coefficients
-            x_coeff, y_coeff = calculate_pixel_to_nm_coefficients(item['header_info'], file_ext.lower())
-            area_coeff = calculate_avg_nm_per_px(item['header_info'], file_ext.lower())
-            
-            # Process files based on their extension
-            if file_ext.lower() == "stp" or file_ext.lower() == "s94":
-                filename_only = os.path.basename(item['file_name'])
-                data_model = FileDataModel()
-                data_model.data_name = filename_only
-                data_model.file_name = item['file_name']
-                data_model.header_info = item['header_info']
-                data_model.data = item['data']
-                data_model.original_image = convert_data_to_greyscale_image(item['data'])
-                data_model.area_px_nm_coefficient = area_coeff
-                data_model.x_px_nm_coefficient = x_coeff
-                data_model.y_px_nm_coefficient = y_coeff
-                self.data_for_analisys.append(data_model)
-            elif file_ext.lower() == "mpp":
-                filename_only = os.path.basename(item['file_name'])
-                for i, frame in enumerate(item['data'], start=1):
-                    frame_name = f"frame {i}"
-                    data_model = FileDataModel()
-                    data_model.data_name = frame_name
-                    data_model.file_name = item['file_name']
-                    data_model.frame_number = i
-                    data_model.header_info = item['header_info']
-                    data_model.data = frame
-                    data_model.original_image = convert_data_to_greyscale_image(frame)
-                    data_model.area_px_nm_coefficient = area_coeff
-                    data_model.x_px_nm_coefficient = x_coeff
-                    data_model.y_px_nm_coefficient = y_coeff
-                    self.data_for_analisys.append(data_model)
-            self.notify_observers()
+            self.data_for_analisys.extend(create_data_models(file_ext, item, self.frame_cache))
+            if notify:
+                self.notify_observers()
 
         except Exception as e:
             logger.error(f"Error in insert_data: {e}")
             raise
 
-def convert_data_to_greyscale_image(points):
+def create_data_models(file_ext, item, frame_cache=None):
+    """
+    Create data models for the frames of a file read from disk.
+
+    Args:
+        file_ext (str): The file extension (e.g., 'stp', 's94', 'mpp').
+        item (dict): The item containing file data and header information. An optional
+            'images' list holds greyscale images already converted, one per frame.
+        frame_cache (FrameCache, optional): Cache for decoded frames of lazily loaded movies.
+
+    Returns:
+        list: FileDataModel instances, one per image or movie frame.
+    """
+    data_models = []
+
+    # Calculate conversion coefficients
+    x_coeff, y_coeff = calculate_pixel_to_nm_coefficients(item['header_info'], file_ext.lower())
+    area_coeff = calculate_avg_nm_per_px(item['header_info'], file_ext.lower())
+
+    images = item.get('images')
+
+    # Process files based on their extension
+    if file_ext.lower() == "stp" or file_ext.lower() == "s94":
+        filename_only = os.path.basename(item['file_name'])
+        data_model = FileDataModel()
+        data_model.data_name = filename_only
+        data_model.file_name = item['file_name']
+        data_model.header_info = item['header_info']
+        # Raw s94 counts are scaled into heights only here
+        data_model.data = scale_s94_item_data(item)
+        data_model.original_image = images[0] if images else convert_data_to_greyscale_image(data_model.data)
+        data_model.area_px_nm_coefficient = area_coeff
+        data_model.x_px_nm_coefficient = x_coeff
+        data_model.y_px_nm_coefficient = y_coeff
+        data_models.append(data_model)
+    elif file_ext.lower() == "mpp":
+        for i, frame in enumerate(item['data'], start=1):
+            frame_name = f"frame {i}"
+            data_model = FileDataModel()
+            data_model.data_name = frame_name
+            data_model.file_name = item['file_name']
+            data_model.frame_number = i
+            data_model.header_info = item['header_info']
+            if isinstance(frame, FrameProxy):
+                # Lazy mode: data and image are decoded on first access
+                frame.bind(frame_cache, convert_data_to_greyscale_image)
+                data_model.frame_proxy = frame
+            else:
+                data_model.data = frame
+                data_model.original_image = images[i - 1] if images else convert_data_to_greyscale_image(frame)
+            data_model.area_px_nm_coefficient = area_coeff
+            data_model.x_px_nm_coefficient = x_coeff
+            data_model.y_px_nm_coefficient = y_coeff
+            data_models.append(data_model)
+
+    return data_models
+
+def convert_data_to_greyscale_image(points, clip_percentiles=None, bit_depth=8):
     """
     Create a grayscale image from input data.
 
+    By default the values are mapped linearly from [min, max] to [0, 255], truncating towards zero,
+    which gives exactly the same image as the original per-pixel conversion.
+
     Parameters:
-        points (list): List of lists containing the data points.
+        points (numpy.ndarray or list): 2D array (or list of lists) containing the data points.
+        clip_percentiles (tuple, optional): Lower and upper percentiles (e.g. (1, 99)) used instead of
+            the minimum and maximum; values outside are clipped, which makes the mapping robust to outliers.
+        bit_depth (int): 8 for an 'L' image or 16 for an 'I;16' image.
 
     Returns:
         PIL.Image.Image: The created grayscale image.
 
     Raises:
-        ValueError: If points is not a list of lists.
+        ValueError: If points is not a 2D array or bit_depth is not supported.
     """
     try:
+        if bit_depth == 8:
+            max_value, out_dtype = 255, np.uint8
+        elif bit_depth == 16:
+            max_value, out_dtype = 65535, np.uint16
+        else:
+            raise ValueError(f"Unsupported bit depth: {bit_depth}")
 
-        # Create a new grayscale image
-        img = Image.new('L', (len(points[0]), len(points)))
+        points = np.asarray(points)
+        if points.ndim != 2:
+            raise ValueError(f"Expected 2D data, got shape {points.shape}")
+        if not np.issubdtype(points.dtype, np.floating):
+            points = points.astype(np.float64)
 
-        # Normalize the values in data to the range [0, 255]
-        max_z = max(map(max, points))
-        min_z = min(map(min, points))
+        # Normalize the values in data to the range [0, max_value]
+        if clip_percentiles is not None:
+            min_z, max_z = np.percentile(points, clip_percentiles).astype(points.dtype)
+            points = np.clip(points, min_z, max_z)
+        else:
+            max_z = points.max()
+            min_z = points.min()
         if max_z == min_z:
             max_z += 1
-        for i in range(len(points)):
-            for j in range(len(points[i])):
-                val = int(255 * (points[i][j] - min_z) / (max_z - min_z))
-                img.putpixel((j, i), val)
+        values = max_value * (points - min_z) / (max_z - min_z)
 
-        return img
+        return Image.fromarray(values.astype(out_dtype))
     except ValueError as ve:
         msg = f"ValueError in create_greyscale_image: {ve}"
         logger.error(msg)
         raise ValueError(msg)
     except Exception as e:
         logger.error(f"Error in create_greyscale_image: {e}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Rendering of spot contours and labels over the original images.
+
+Contours are taken from the label image itself: a pixel lies on a boundary if the 3x3 morphological
+gradient of the labels is non-zero there, which also separates touching spots with different labels.
+Label texts are rasterized once into a shared mask from cached glyph bitmaps, with all occurrences of
+a character drawn by a single scatter, and the black and white variants of an overlay are composed
+from the same boundary and text masks. For highlighting a selected label, `SelectionOverlay` keeps
+the masks and the pixels of every label, so a change of the selection only recolors one label.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import numpy as np
+import cv2
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+LABEL_FONT_SCALE = 0.3
+LABEL_THICKNESS = 1
+
+# Pixel values of the contours and labels of each overlay variant
+OVERLAY_COLORS = {
+    "black": 0,
+    "white": 255
+}
+
+_glyph_cache = {}
+
+def _get_glyph(char):
+    """
+    Get the pixel offsets of a character relative to the text origin, and its advance width.
+    """
+    glyph = _glyph_cache.get(char)
+    if glyph is None:
+        (width, height), baseline = cv2.getTextSize(char, LABEL_FONT, LABEL_FONT_SCALE, LABEL_THICKNESS)
+        pad = 2 * LABEL_THICKNESS + 2
+        canvas = np.zeros((height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8)
+        origin = (pad, height + pad)
+        cv2.putText(canvas, char, origin, LABEL_FONT, LABEL_FONT_SCALE, 255, LABEL_THICKNESS)
+        rows, cols = np.nonzero(canvas)
+        # The advance within a string is shorter than the width of a lone character
+        advance = cv2.getTextSize(char * 2, LABEL_FONT, LABEL_FONT_SCALE, LABEL_THICKNESS)[0][0] - width
+        glyph = (rows - origin[1], cols - origin[0], advance)
+        _glyph_cache[char] = glyph
+    return glyph
+
+def label_boundaries(labeled_image):
+    """
+    Find the boundary pixels of all labeled regions.
+
+    Args:
+        labeled_image (numpy.ndarray): Labeled 2D image, 0 for the background.
+
+    Returns:
+        numpy.ndarray: Boolean mask of the region pixels adjacent to another label or the background.
+    """
+    # Labels are exact in float32 up to 2**24, which cv2 morphology handles natively
+    labels = np.asarray(labeled_image).astype(np.float32)
+    kernel = np.ones((3, 3), dtype=np.uint8)
+    gradient = cv2.morphologyEx(labels, cv2.MORPH_GRADIENT, kernel, borderType=cv2.BORDER_REPLICATE)
+    return (labels > 0) & (gradient > 0)
+
+def _label_text_pixels(shape, label_names, centroids):
+    """
+    Find the pixels of the label texts and the index of the label each pixel belongs to.
+    """
+    if len(label_names) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # One entry per character of every label: the character, its label and the position of its origin
+    origins = np.asarray(centroids, dtype=np.float64).reshape(-1, 2).astype(np.int64)
+    chars = []
+    char_owners = []
+    char_rows = []
+    char_cols = []
+    for index, (name, (row, col)) in enumerate(zip(label_names, origins)):
+        offset = 0
+        for char in str(name):
+            chars.append(char)
+            char_owners.append(index)
+            char_rows.append(row)
+            char_cols.append(col + offset)
+            offset += _get_glyph(char)[2]
+
+    chars = np.array(chars)
+    char_owners = np.array(char_owners)
+    char_rows = np.array(char_rows)
+    char_cols = np.array(char_cols)
+    all_rows, all_cols, all_owners = [], [], []
+    for char in np.unique(chars):
+        glyph_rows, glyph_cols, _ = _get_glyph(char)
+        selected = chars == char
+        rows = (char_rows[selected, None] + glyph_rows).ravel()
+        cols = (char_cols[selected, None] + glyph_cols).ravel()
+        owners = np.repeat(char_owners[selected], len(glyph_rows))
+        inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+        all_rows.append(rows[inside])
+        all_cols.append(cols[inside])
+        all_owners.append(owners[inside])
+    return np.concatenate(all_rows), np.concatenate(all_cols), np.concatenate(all_owners)
+
+def rasterize_labels(shape, label_names, centroids):
+    """
+    Rasterize the label texts into a mask, with each text starting at the centroid of its region.
+
+    Args:
+        shape (tuple): Shape (rows, cols) of the mask.
+        label_names (list): Texts of the labels.
+        centroids (list): Centroids (row, col) of the labels.
+
+    Returns:
+        numpy.ndarray: Boolean mask of the text pixels.
+    """
+    mask = np.zeros(shape[:2], dtype=bool)
+    rows, cols, _ = _label_text_pixels(shape, label_names, centroids)
+    mask[rows, cols] = True
+    return mask
+
+def render_label_overlays(original_image, labeled_image, label_names, centroids, colors=tuple(OVERLAY_COLORS)):
+    """
+    Draw the contours and labels of all regions over an image, in several color variants at once.
+
+    Args:
+        original_image (PIL.Image.Image or numpy.ndarray): The original image.
+        labeled_image (numpy.ndarray): The labeled image.
+        label_names (list): Names of the labels.
+        centroids (list): Centroids (row, col) of the labels.
+        colors (tuple): Names of the variants to render, keys of OVERLAY_COLORS.
+
+    Returns:
+        dict: Overlay image (numpy.ndarray) of each requested variant.
+
+    Raises:
+        ValueError: If rendering fails.
+    """
+    try:
+        image = np.asarray(original_image)
+        mask = label_boundaries(labeled_image) | rasterize_labels(image.shape, label_names, centroids)
+
+        overlays = {}
+        for color in colors:
+            overlay = image.copy()
+            overlay[mask] = OVERLAY_COLORS[color]
+            overlays[color] = overlay
+        return overlays
+
+    except Exception as e:
+        logger.error(f"Error in render_label_overlays: {e}")
+        raise ValueError(f"Failed to render label overlays: {e}")
+
+class SelectionOverlay:
+    """
+    Overlay of a frame with one label highlighted, prepared for fast changes of the selection.
+
+    The contour and text masks are computed once, together with the outline and text pixels of every
+    label. Highlighting a label then copies the cached base overlay and recolors only the pixels of
+    that label.
+    """
+    def __init__(self, original_image, labeled_image, label_names, centroids):
+        """
+        Prepare the masks of a frame.
+
+        Args:
+            original_image (PIL.Image.Image or numpy.ndarray): The original image.
+            labeled_image (numpy.ndarray): The labeled image.
+            label_names (list): Names of the labels, in the order of the label values.
+            centroids (list): Centroids (row, col) of the labels.
+        """
+        self._image = np.asarray(original_image)
+        labeled_image = np.asarray(labeled_image)
+        shape = labeled_image.shape
+
+        boundary = label_boundaries(labeled_image)
+        outline_rows, outline_cols = np.nonzero(boundary)
+        # Label names follow the sorted label values
+        outline_owners = np.searchsorted(np.unique(labeled_image[labeled_image > 0]), labeled_image[outline_rows, outline_cols])
+        text_rows, text_cols, text_owners = _label_text_pixels(shape, label_names, centroids)
+
+        self._mask = boundary
+        self._mask[text_rows, text_cols] = True
+
+        # Pixels of all labels grouped by label, label i owning the range offsets[i]:offsets[i + 1]
+        rows = np.concatenate((outline_rows, text_rows))
+        cols = np.concatenate((outline_cols, text_cols))
+        owners = np.concatenate((outline_owners, text_owners))
+        order = np.argsort(owners, kind="stable")
+        self._rows = rows[order]
+        self._cols = cols[order]
+        self._offsets = np.searchsorted(owners[order], np.arange(len(label_names) + 1))
+        self._base_overlays = {}
+
+    def get_base_overlay(self, value):
+        """
+        Get the overlay with all contours and labels drawn in one pixel value.
+
+        Args:
+            value (int): Pixel value of the contours and labels.
+
+        Returns:
+            numpy.ndarray: The overlay; cached, so it must not be modified.
+        """
+        overlay = self._base_overlays.get(value)
+        if overlay is None:
+            overlay = self._image.copy()
+            overlay[self._mask] = value
+            self._base_overlays[value] = overlay
+        return overlay
+
+    def render(self, index, value=255):
+        """
+        Render the overlay with the outline and text of one label in the contrasting value.
+
+        Args:
+            index (int): Index of the label to highlight.
+            value (int): Pixel value of the other contours and labels (0 or 255).
+
+        Returns:
+            numpy.ndarray: The overlay.
+        """
+        overlay = self.get_base_overlay(value).copy()
+        if 0 <= index < len(self._offsets) - 1:
+            start, end = self._offsets[index], self._offsets[index + 1]
+            overlay[self._rows[start:end], self._cols[start:end]] = 255 - value
+        return overlay
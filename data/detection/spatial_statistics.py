@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+Spatial statistics of spot positions.
+
+This module describes the arrangement of the spots of a frame: per-spot distances to the k nearest
+neighbors and Voronoi cell areas, and per-frame radial statistics, the pair correlation function g(r)
+and Ripley's K and L functions. Positions are spot centroids converted to nm with the pixel-to-nm
+coefficients of the file, so non-square pixels are handled correctly.
+
+Spots near the image border have their true neighbors cut off. Neighbor queries therefore take a
+boundary mode: 'none' uses the visible spots only, 'exclude' drops neighbor distances longer than
+the distance to the border (the true neighbor may lie outside the image), and 'periodic' wraps the
+image around like a torus.
+
+Neighbor distances and pair counts come from batched queries of a single KD-tree, so dense frames
+with thousands of spots are handled without per-spot Python loops. Radial statistics are corrected
+for the pairs of spots cut off by the image edges with the isotropic set covariance of the image.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import numpy as np
+from scipy.spatial import cKDTree, Voronoi
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Number of nearest neighbors whose distances are reported for every spot
+KNN_NEIGHBORS = 3
+
+# Number of radii at which the radial statistics are evaluated
+RADIAL_BINS = 50
+
+NEIGHBOR_BOUNDARY_MODES = ("none", "exclude", "periodic")
+
+SPATIAL_STATS_DTYPE = np.dtype(
+    [("label", np.int64)]
+    + [(f"knn{k}_distance_nm", np.float64) for k in range(1, KNN_NEIGHBORS + 1)]
+    + [
+        ("knn_mean_distance_nm", np.float64),
+        ("voronoi_area_nm2", np.float64)
+    ]
+)
+
+# Columns added to the measured data exports, in order
+SPATIAL_COLUMNS = SPATIAL_STATS_DTYPE.names[1:]
+
+RADIAL_STATS_DTYPE = np.dtype([
+    ("radius_nm", np.float64),
+    ("pair_correlation", np.float64),
+    ("ripley_k", np.float64),
+    ("ripley_l", np.float64)
+])
+
+def centroids_to_nm(centroids, x_coeff=1.0, y_coeff=1.0):
+    """
+    Convert centroids (row, col) in pixels to positions (x, y) in nm.
+
+    Pixel (row, col) covers [col, col + 1) x [row, row + 1) in pixel units, so the image spans
+    [0, cols * x_coeff] x [0, rows * y_coeff] nm.
+
+    Args:
+        centroids (numpy.ndarray): Array of shape (n, 2) with the centroids rows and columns.
+        x_coeff (float): Nanometers per pixel along the columns.
+        y_coeff (float): Nanometers per pixel along the rows.
+
+    Returns:
+        numpy.ndarray: Array of shape (n, 2) with the x and y positions in nm.
+    """
+    centroids = np.asarray(centroids, dtype=np.float64).reshape(-1, 2)
+    return (centroids[:, ::-1] + 0.5) * (float(x_coeff or 1.0), float(y_coeff or 1.0))
+
+def image_size_nm(image_shape, x_coeff=1.0, y_coeff=1.0):
+    """
+    Calculate the width and height of an image in nm.
+
+    Args:
+        image_shape (tuple): Shape (rows, cols) of the image.
+        x_coeff (float): Nanometers per pixel along the columns.
+        y_coeff (float): Nanometers per pixel along the rows.
+
+    Returns:
+        tuple: The width and height.
+    """
+    rows, cols = image_shape[:2]
+    return cols * float(x_coeff or 1.0), rows * float(y_coeff or 1.0)
+
+def build_neighbor_tree(points, bounds=None, boundary="none"):
+    """
+    Build the KD-tree used for neighbor queries.
+
+    Args:
+        points (numpy.ndarray): Array of shape (n, 2) with the point positions (x, y).
+        bounds (tuple, optional): Width and height of the image; required by the 'periodic' mode.
+        boundary (str): Boundary mode, one of NEIGHBOR_BOUNDARY_MODES.
+
+    Returns:
+        scipy.spatial.cKDTree: The tree; in the 'periodic' mode distances wrap around the image.
+
+    Raises:
+        ValueError: If the boundary mode is unknown.
+    """
+    if boundary not in NEIGHBOR_BOUNDARY_MODES:
+        raise ValueError(f"Unknown boundary mode '{boundary}', expected one of {NEIGHBOR_BOUNDARY_MODES}.")
+    if boundary == "periodic":
+        return cKDTree(np.mod(points, bounds), boxsize=bounds)
+    return cKDTree(points)
+
+def knn_distances(points, k=KNN_NEIGHBORS, tree=None, bounds=None, boundary="none"):
+    """
+    Find the distances to the k nearest neighbors of every point with one batched tree query.
+
+    Args:
+        points (numpy.ndarray): Array of shape (n, 2) with the point positions (x, y).
+        k (int): Number of neighbors.
+        tree (scipy.spatial.cKDTree, optional): Tree built on the points with build_neighbor_tree
+            for the same boundary mode, reused if given.
+        bounds (tuple, optional): Width and height of the image; required by the 'exclude' and
+            'periodic' modes.
+        boundary (str): Boundary mode, one of NEIGHBOR_BOUNDARY_MODES.
+
+    Returns:
+        tuple: Arrays of shape (n, k) with the distances (NaN where a point has fewer than k
+               neighbors or the neighbor is excluded) and the indices of the neighbors (-1 where
+               missing), nearest first.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    distances = np.full((len(points), k), np.nan)
+    indices = np.full((len(points), k), -1, dtype=np.int64)
+    available = min(k, len(points) - 1)
+    if available <= 0:
+        return distances, indices
+
+    tree = tree if tree is not None else build_neighbor_tree(points, bounds, boundary)
+    # The first neighbor returned for each point is the point itself
+    found_distances, found_indices = tree.query(tree.data, k=available + 1, workers=-1)
+    distances[:, :available] = found_distances[:, 1:]
+    indices[:, :available] = found_indices[:, 1:]
+
+    if boundary == "exclude":
+        # A neighbor farther away than the border may be preceded by an unseen spot outside the image
+        width, height = bounds
+        border_distances = np.minimum.reduce([points[:, 0], width - points[:, 0], points[:, 1], height - points[:, 1]])
+        excluded = distances > border_distances[:, None]
+        distances[excluded] = np.nan
+        indices[excluded] = -1
+
+    return distances, indices
+
+def compute_nearest_neighbors(centroids, names, image_shape, x_coeff=1.0, y_coeff=1.0, boundary="none"):
+    """
+    Compute the nearest neighbor distances in nm and the names of the nearest neighbors.
+
+    Args:
+        centroids (numpy.ndarray): Centroids (row, col) of the spots, in pixels.
+        names (list): Names of the spots.
+        image_shape (tuple): Shape (rows, cols) of the image.
+        x_coeff (float): Nanometers per pixel along the columns.
+        y_coeff (float): Nanometers per pixel along the rows.
+        boundary (str): Boundary mode, one of NEIGHBOR_BOUNDARY_MODES.
+
+    Returns:
+        tuple: The nearest neighbor distances (NaN where there is no valid neighbor) and the
+               names of the nearest neighbors (empty where there is no valid neighbor).
+
+    Raises:
+        ValueError: If the computation fails.
+    """
+    try:
+        points = centroids_to_nm(centroids, x_coeff, y_coeff)
+        distances, indices = knn_distances(points, 1, bounds=image_size_nm(image_shape, x_coeff, y_coeff), boundary=boundary)
+        neighbor_names = [names[index] if index >= 0 else "" for index in indices[:, 0]]
+        return distances[:, 0], neighbor_names
+
+    except Exception as e:
+        logger.error(f"Error in compute_nearest_neighbors: {e}")
+        raise ValueError(f"Failed to compute nearest neighbors: {e}")
+
+def voronoi_cell_areas(points, width, height):
+    """
+    Calculate the area of the Voronoi cell of every point.
+
+    Cells that are unbounded or reach outside the image are not fully determined by the visible spots
+    and get NaN areas.
+
+    Args:
+        points (numpy.ndarray): Array of shape (n, 2) with the point positions (x, y).
+        width (float): Width of the image, in the units of the positions.
+        height (float): Height of the image, in the units of the positions.
+
+    Returns:
+        numpy.ndarray: The cell areas.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    areas = np.full(len(points), np.nan)
+    if len(points) < 4:
+        return areas
+
+    try:
+        voronoi = Voronoi(points)
+    except Exception as e:
+        # Degenerate arrangements (e.g. collinear spots) have no Voronoi diagram
+        logger.warning(f"Voronoi diagram could not be computed: {e}")
+        return areas
+
+    regions = [voronoi.regions[index] for index in voronoi.point_region]
+    lengths = np.array([len(region) for region in regions])
+    region_vertices = np.fromiter(
+        (vertex for region in regions for vertex in region),
+        dtype=np.int64,
+        count=int(lengths.sum())
+    )
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    cell_of_vertex = np.repeat(np.arange(len(regions)), lengths)
+
+    # Cells with a vertex at infinity or outside the image are not bounded by the visible spots
+    vertices = voronoi.vertices
+    outside = np.r_[
+        (vertices[:, 0] < 0) | (vertices[:, 0] > width) | (vertices[:, 1] < 0) | (vertices[:, 1] > height),
+        True
+    ]
+    # The vertex index -1 (at infinity) maps to the extra True entry
+    outside_counts = np.bincount(cell_of_vertex, weights=outside[region_vertices], minlength=len(regions))
+    valid = (lengths >= 3) & (outside_counts == 0)
+
+    # Shoelace formula over consecutive vertices of every cell, wrapping to the first vertex
+    positions = np.arange(len(region_vertices))
+    cell_ends = starts[cell_of_vertex] + lengths[cell_of_vertex]
+    next_positions = np.where(positions + 1 == cell_ends, starts[cell_of_vertex], positions + 1)
+    current = vertices[region_vertices]
+    following = vertices[region_vertices[next_positions]]
+    cross = current[:, 0] * following[:, 1] - following[:, 0] * current[:, 1]
+    doubled_areas = np.bincount(cell_of_vertex, weights=cross, minlength=len(regions))
+
+    areas[valid] = np.abs(doubled_areas[valid]) / 2
+    return areas
+
+def calculate_spatial_statistics(labels, centroids, image_shape, x_coeff=1.0, y_coeff=1.0, k=KNN_NEIGHBORS, boundary="none"):
+    """
+    Calculate the per-spot spatial statistics of a frame.
+
+    Args:
+        labels (numpy.ndarray): Labels of the spots.
+        centroids (numpy.ndarray): Centroids (row, col) of the spots, in pixels.
+        image_shape (tuple): Shape (rows, cols) of the image.
+        x_coeff (float): Nanometers per pixel along the columns.
+        y_coeff (float): Nanometers per pixel along the rows.
+        k (int): Number of nearest neighbors used for the mean k-NN distance; the distances to the
+                 first KNN_NEIGHBORS neighbors are reported individually.
+        boundary (str): Boundary mode of the neighbor distances, one of NEIGHBOR_BOUNDARY_MODES.
+
+    Returns:
+        numpy.ndarray: Structured array of dtype SPATIAL_STATS_DTYPE with one record per spot,
+                       in the order of the given labels.
+
+    Raises:
+        ValueError: If the calculation fails.
+    """
+    try:
+        labels = np.asarray(labels)
+        points = centroids_to_nm(centroids, x_coeff, y_coeff)
+        result = np.zeros(len(labels), dtype=SPATIAL_STATS_DTYPE)
+        result["label"] = labels
+        if len(labels) == 0:
+            return result
+
+        bounds = image_size_nm(image_shape, x_coeff, y_coeff)
+        distances, _ = knn_distances(points, max(k, KNN_NEIGHBORS), bounds=bounds, boundary=boundary)
+        for neighbor in range(KNN_NEIGHBORS):
+            result[f"knn{neighbor + 1}_distance_nm"] = distances[:, neighbor]
+        with np.errstate(invalid="ignore"):
+            result["knn_mean_distance_nm"] = distances[:, :k].mean(axis=1)
+
+        result["voronoi_area_nm2"] = voronoi_cell_areas(points, *bounds)
+        return result
+
+    except Exception as e:
+        logger.error(f"Error in calculate_spatial_statistics: {e}")
+        raise ValueError(f"Failed to calculate spatial statistics: {e}")
+
+def calculate_radial_statistics(centroids, image_shape, x_coeff=1.0, y_coeff=1.0, r_max=None, bins=RADIAL_BINS, boundary="none"):
+    """
+    Calculate the pair correlation function and Ripley's K and L functions of a frame.
+
+    All pair counts come from a single dual-tree count over the bin edges.
+
+    Args:
+        centroids (numpy.ndarray): Centroids (row, col) of the spots, in pixels.
+        image_shape (tuple): Shape (rows, cols) of the image.
+        x_coeff (float): Nanometers per pixel along the columns.
+        y_coeff (float): Nanometers per pixel along the rows.
+        r_max (float, optional): Largest radius in nm; defaults to a quarter of the shorter image side.
+        bins (int): Number of radii.
+        boundary (str): Boundary mode, one of NEIGHBOR_BOUNDARY_MODES; in the 'periodic' mode pairs
+            wrap around the image and need no edge correction.
+
+    Returns:
+        numpy.ndarray: Structured array of dtype RADIAL_STATS_DTYPE with one record per radius.
+                       K(r) and L(r) count the pairs within the radius, g(r) is averaged over the ring
+                       between the previous radius and the radius; all values are NaN for frames
+                       with fewer than two spots.
+
+    Raises:
+        ValueError: If the calculation fails.
+    """
+    try:
+        points = centroids_to_nm(centroids, x_coeff, y_coeff)
+        width, height = image_size_nm(image_shape, x_coeff, y_coeff)
+        area = width * height
+        if r_max is None:
+            r_max = min(width, height) / 4
+
+        edges = np.linspace(0, r_max, bins + 1)
+        result = np.zeros(bins, dtype=RADIAL_STATS_DTYPE)
+        result["radius_nm"] = edges[1:]
+        n = len(points)
+        if n < 2:
+            result["pair_correlation"] = np.nan
+            result["ripley_k"] = np.nan
+            result["ripley_l"] = np.nan
+            return result
+
+        tree = build_neighbor_tree(points, (width, height), boundary)
+        # Ordered pairs within each radius; every point also counts itself at distance 0
+        pair_counts = tree.count_neighbors(tree, edges[1:]).astype(np.float64) - n
+        ring_pairs = np.diff(np.r_[0.0, pair_counts])
+
+        # Pairs at distance r are only seen if both spots fall in the image; the isotropic set
+        # covariance of the rectangle gives the fraction of the area where that happens
+        if boundary != "periodic":
+            ring_radii = (edges[1:] + edges[:-1]) / 2
+            visible_fraction = (area - 2 * ring_radii * (width + height) / np.pi + ring_radii ** 2 / np.pi) / area
+            ring_pairs = ring_pairs / np.maximum(visible_fraction, np.finfo(np.float64).eps)
+
+        ring_areas = np.pi * (edges[1:] ** 2 - edges[:-1] ** 2)
+        density = (n - 1) / area
+        ripley_k = np.cumsum(ring_pairs) / (n * density)
+
+        result["pair_correlation"] = ring_pairs / (n * density * ring_areas)
+        result["ripley_k"] = ripley_k
+        result["ripley_l"] = np.sqrt(ripley_k / np.pi)
+        return result
+
+    except Exception as e:
+        logger.error(f"Error in calculate_radial_statistics: {e}")
+        raise ValueError(f"Failed to calculate radial statistics: {e}")
@@ -13,13 +13,18 @@ import os, sys
 
 sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
 
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
 import numpy as np
 import cv2
 from skimage import measure, morphology
+from scipy import ndimage
 from scipy.spatial import KDTree
-from skimage import feature
 from PIL import Image, ImageTk
 
+from data.detection.overlay_rendering import render_label_overlays, SelectionOverlay
+
 import logging
 
 logger = logging.getLogger(__name__)
@@ -75,6 +80,70 @@ def calculate_regions(labeled_image):
         logger.error(f"Error in calculate_regions: {e}")
         raise ValueError(f"Failed to calculate regions: {e}")
 
+# Per-region statistics computed by calculate_region_stats; the bounding box follows the
+# regionprops convention (min_row, min_col, max_row, max_col) with exclusive maxima
+REGION_STATS_DTYPE = np.dtype([
+    ("label", np.int64),
+    ("area", np.int64),
+    ("centroid_row", np.float64),
+    ("centroid_col", np.float64),
+    ("bbox_min_row", np.int64),
+    ("bbox_min_col", np.int64),
+    ("bbox_max_row", np.int64),
+    ("bbox_max_col", np.int64),
+    ("equivalent_diameter", np.float64)
+])
+
+def calculate_region_stats(labeled_image):
+    """
+    Calculate statistics of all labeled regions at once, without per-region objects.
+
+    Args:
+        labeled_image (numpy.ndarray): Labeled 2D image where each region has a unique positive label.
+
+    Returns:
+        numpy.ndarray: Structured array of dtype REGION_STATS_DTYPE with one record per non-empty
+                       region, sorted by label.
+
+    Raises:
+        ValueError: If region calculation fails.
+    """
+    try:
+        labeled_image = np.asarray(labeled_image)
+        flat = labeled_image.ravel()
+        num_labels = int(flat.max()) if flat.size else 0
+        if num_labels <= 0:
+            return np.zeros(0, dtype=REGION_STATS_DTYPE)
+
+        rows, cols = labeled_image.shape
+        areas = np.bincount(flat, minlength=num_labels + 1)
+        row_sums = np.bincount(flat, weights=np.repeat(np.arange(rows, dtype=np.float64), cols), minlength=num_labels + 1)
+        col_sums = np.bincount(flat, weights=np.tile(np.arange(cols, dtype=np.float64), rows), minlength=num_labels + 1)
+
+        labels = np.flatnonzero(areas[1:]) + 1
+        stats = np.zeros(len(labels), dtype=REGION_STATS_DTYPE)
+        stats["label"] = labels
+        stats["area"] = areas[labels]
+        stats["centroid_row"] = row_sums[labels] / areas[labels]
+        stats["centroid_col"] = col_sums[labels] / areas[labels]
+        stats["equivalent_diameter"] = np.sqrt(4 * areas[labels] / np.pi)
+
+        objects = ndimage.find_objects(labeled_image, max_label=num_labels)
+        bboxes = np.array([
+            (obj[0].start, obj[1].start, obj[0].stop, obj[1].stop)
+            for obj in (objects[label - 1] for label in labels)
+        ], dtype=np.int64).reshape(-1, 4)
+        stats["bbox_min_row"] = bboxes[:, 0]
+        stats["bbox_min_col"] = bboxes[:, 1]
+        stats["bbox_max_row"] = bboxes[:, 2]
+        stats["bbox_max_col"] = bboxes[:, 3]
+
+        return stats
+
+    except Exception as e:
+        logger.error(f"Error in calculate_region_stats: {e}")
+        raise ValueError(f"Failed to calculate region statistics: {e}")
+
 def compute_nearest_neighbor_distances(centroids, names):
     """
     Compute the nearest neighbor distances and corresponding region names.
@@ -135,13 +204,181 @@ def track_spots(previous_centroids, current_centroids, threshold=5):
         logger.error(f"Error in track_spots: {e}")
         raise ValueError(f"Failed to track spots: {e}")
 
-def analyze_images(images, threshold=5):
+# Names of the per-spot columns returned by the columnar analysis
+SPOT_COLUMNS = ("frame", "label", "area", "centroid_row", "centroid_col", "nn_distance", "nn_label")
+
+# Data type of the labeled images produced by the columnar analysis
+LABEL_DATA_TYPE = np.dtype(np.int32)
+
+# Smaller batches are not worth starting worker processes for
+MIN_FRAMES_PER_WORKER = 4
+
+def measure_frame(img, labeled_out=None):
+    """
+    Label a binary image and measure its spots.
+
+    Args:
+        img (numpy.ndarray): Binary image to be analyzed.
+        labeled_out (numpy.ndarray, optional): Array the labeled image is written into.
+
+    Returns:
+        tuple: Labeled image, and a dictionary of per-spot arrays: 'label', 'area', 'centroid_row',
+               'centroid_col', 'nn_distance' and 'nn_label' (label of the nearest neighbor).
+               Frames with fewer than two spots get NaN distances and a nearest neighbor label of 0.
+    """
+    labeled_image = morphology.label(np.asarray(img))
+    if labeled_out is not None:
+        labeled_out[...] = labeled_image
+        labeled_image = labeled_out
+
+    stats = calculate_region_stats(labeled_image)
+    labels = stats["label"]
+    areas = stats["area"].astype(np.float64)
+    centroids = np.column_stack((stats["centroid_row"], stats["centroid_col"]))
+
+    nn_distances = np.full(len(labels), np.nan)
+    nn_labels = np.zeros(len(labels), dtype=np.int64)
+    if len(labels) > 1:
+        distances, indices = KDTree(centroids).query(centroids, k=2)  # k=2 because the first neighbor is the point itself
+        nn_distances = distances[:, 1]
+        nn_labels = labels[indices[:, 1]]
+
+    return labeled_image, {
+        "label": labels,
+        "area": areas,
+        "centroid_row": centroids[:, 0],
+        "centroid_col": centroids[:, 1],
+        "nn_distance": nn_distances,
+        "nn_label": nn_labels
+    }
+
+def _measure_shared_frames(input_spec, output_spec, frame_indices):
+    """
+    Measure frames of an image stack held in shared memory.
+
+    This is the unit of work executed by the pool workers; the labeled images are written
+    into the shared output stack, only the per-spot columns are sent back.
+
+    Args:
+        input_spec (tuple): Name, shape and dtype of the shared binary image stack.
+        output_spec (tuple): Name, shape and dtype of the shared labeled image stack.
+        frame_indices (list): Indices of the frames to measure.
+
+    Returns:
+        list: Tuples (frame index, columns dictionary).
+    """
+    input_memory = shared_memory.SharedMemory(name=input_spec[0])
+    output_memory = shared_memory.SharedMemory(name=output_spec[0])
+    try:
+        images = np.ndarray(input_spec[1], dtype=input_spec[2], buffer=input_memory.buf)
+        labeled_images = np.ndarray(output_spec[1], dtype=output_spec[2], buffer=output_memory.buf)
+        results = []
+        for i in frame_indices:
+            _, columns = measure_frame(images[i], labeled_images[i])
+            results.append((i, columns))
+        del images, labeled_images
+        return results
+    finally:
+        input_memory.close()
+        output_memory.close()
+
+def _concatenate_frame_columns(frame_columns):
+    """
+    Concatenate per-frame columns into columnar arrays covering all frames.
+
+    Args:
+        frame_columns (list): Columns dictionaries, one per frame, in frame order.
+
+    Returns:
+        tuple: Dictionary of per-spot arrays (keys SPOT_COLUMNS) and an array of frame offsets;
+               the spots of frame i are rows offsets[i]:offsets[i + 1].
+    """
+    counts = np.array([len(columns["label"]) for columns in frame_columns], dtype=np.int64)
+    offsets = np.zeros(len(frame_columns) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    result = {"frame": np.repeat(np.arange(len(frame_columns)), counts)}
+    for key in SPOT_COLUMNS[1:]:
+        result[key] = np.concatenate([columns[key] for columns in frame_columns]) if frame_columns else np.empty(0)
+    return result, offsets
+
+def analyze_images_columnar(images, max_workers=1):
+    """
+    Label and measure the spots of all frames, returning the results in columnar arrays.
+
+    With more than one worker the frames are stacked into shared memory and split across
+    a process pool, so the images are not pickled. Frames of different shapes cannot be
+    stacked and are analyzed serially.
+
+    Args:
+        images (list): List of binary images to be analyzed.
+        max_workers (int): Number of worker processes; 1 analyzes the frames in this process,
+            None uses all cores.
+
+    Returns:
+        tuple: Dictionary of per-spot arrays (keys SPOT_COLUMNS), array of frame offsets
+               (the spots of frame i are rows offsets[i]:offsets[i + 1]) and list of labeled images.
+
+    Raises:
+        ValueError: If image analysis fails.
+    """
+    try:
+        arrays = [np.asarray(img) for img in images]
+        workers = max_workers or os.cpu_count() or 1
+        workers = min(workers, len(arrays) // MIN_FRAMES_PER_WORKER)
+        same_shape = len({array.shape for array in arrays}) == 1
+
+        if workers <= 1 or not same_shape:
+            labeled_images = []
+            frame_columns = []
+            for array in arrays:
+                labeled_image, columns = measure_frame(array, np.empty(array.shape, dtype=LABEL_DATA_TYPE))
+                labeled_images.append(labeled_image)
+                frame_columns.append(columns)
+            columns, offsets = _concatenate_frame_columns(frame_columns)
+            return columns, offsets, labeled_images
+
+        shape = (len(arrays),) + arrays[0].shape
+        dtype = np.result_type(*arrays)
+        input_memory = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+        output_memory = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * LABEL_DATA_TYPE.itemsize))
+        try:
+            stack = np.ndarray(shape, dtype=dtype, buffer=input_memory.buf)
+            for i, array in enumerate(arrays):
+                stack[i] = array
+            del stack
+
+            input_spec = (input_memory.name, shape, dtype.str)
+            output_spec = (output_memory.name, shape, LABEL_DATA_TYPE.str)
+            chunks = [list(chunk) for chunk in np.array_split(np.arange(len(arrays)), workers) if len(chunk)]
+
+            frame_columns = [None] * len(arrays)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_measure_shared_frames, input_spec, output_spec, chunk) for chunk in chunks]
+                for future in futures:
+                    for i, columns in future.result():
+                        frame_columns[i] = columns
+
+            labeled_stack = np.ndarray(shape, dtype=LABEL_DATA_TYPE, buffer=output_memory.buf).copy()
+        finally:
+            for memory in (input_memory, output_memory):
+                memory.close()
+                memory.unlink()
+
+        columns, offsets = _concatenate_frame_columns(frame_columns)
+        return columns, offsets, list(labeled_stack)
+    except Exception as e:
+        logger.error(f"Error in analyze_images_columnar: {e}")
+        raise ValueError(f"Failed to analyze images: {e}")
+
+def analyze_images(images, threshold=5, max_workers=1):
     """
     Analyze a list of images, labeling regions, calculating centroids, areas, and nearest neighbor distances.
 
     Args:
         images (list): List of binary images to be analyzed.
         threshold (float): Distance threshold for spot tracking (not used in this function but provided for consistency).
+        max_workers (int): Number of worker processes; 1 analyzes the frames in this process, None uses all cores.
 
     Returns:
         tuple: Containing all centroids, areas, labels names, nearest neighbor distances, and other analysis data.
@@ -150,34 +387,24 @@ def analyze_images(images, threshold=5):
         ValueError: If image analysis fails.
     """
     try:
-        all_regions = []
+        columns, offsets, labeled_images = analyze_images_columnar(images, max_workers)
+
         all_centroids = []
         all_areas = []
         all_labels_num = []
         all_labels_names = []
         nearest_neighbor_distances_list = []
         nearest_neighbor_names = []
-        # spot_tracks = defaultdict(list)
-        labeled_images = []
-        
-        for frame_index, img in enumerate(images):
-            labeled_image, labels_num, labels_names = label_image(img)
-            regions = calculate_regions(labeled_image)
-            labeled_images.append(labeled_image)
-            all_labels_num.append(labels_num)
-            all_labels_names.append(labels_names)
-
-            all_regions.append(regions)
-            
-            centroids = np.array([region.centroid for region in regions])
-            areas = np.array([region.area for region in regions])
-            
-            all_centroids.append(centroids)
-            all_areas.append(areas)
-            
-            nearest_neighbor_distances, nearest_neighbor_name = compute_nearest_neighbor_distances(centroids, labels_names)
-            nearest_neighbor_distances_list.append(nearest_neighbor_distances)
-            nearest_neighbor_names.append(nearest_neighbor_name)
+
+        for frame_index in range(len(labeled_images)):
+            frame = slice(offsets[frame_index], offsets[frame_index + 1])
+            labels = columns["label"][frame]
+            all_centroids.append(np.column_stack((columns["centroid_row"][frame], columns["centroid_col"][frame])))
+            all_areas.append(columns["area"][frame])
+            all_labels_num.append(len(labels))
+            all_labels_names.append(["{:03}".format(label) for label in labels])
+            nearest_neighbor_distances_list.append(columns["nn_distance"][frame])
+            nearest_neighbor_names.append(["{:03}".format(label) if label else "" for label in columns["nn_label"][frame]])
 
         return all_centroids, all_areas, all_labels_names, nearest_neighbor_distances_list, nearest_neighbor_names, labeled_images, all_labels_num
     except Exception as e:
@@ -188,6 +415,8 @@ def overlay_labels_on_original(original_images, labeled_images, label_names, cen
     """
     Overlay labels and contours on original images.
 
+    Renders a single color variant; use render_label_overlays to render both variants at once.
+
     Args:
         original_images (list): List of original images.
         labeled_images (list): List of labeled images.
@@ -204,25 +433,8 @@ def overlay_labels_on_original(original_images, labeled_images, label_names, cen
     try:
         labeled_overlays = []
         for original_image, labeled_image, label_name, centroid in zip(original_images, labeled_images, label_names, centroids):
-            overlay = original_image.copy()
-            
-            # Perform Canny edge detection on the labeled image
-            edges = feature.canny(labeled_image > 0.5)  # Canny edge detector expects a binary image
-
-            edges_color = 0
-            text_color = (0,0,0)
-
-            if color == 'white':
-                edges_color = 255
-                text_color = (255,255,255)
-            # Overlay edges on the original image
-            overlay = np.array(overlay)
-            overlay[edges] = edges_color
-            
-            for label, center in zip(label_name, centroid):
-                overlay = cv2.putText(overlay, label, (int(center[1]), int(center[0])), cv2.FONT_HERSHEY_SIMPLEX, 0.3, text_color, 1)
-            
-            labeled_overlays.append(overlay)
+            overlays = render_label_overlays(original_image, labeled_image, label_name, centroid, colors=(color,))
+            labeled_overlays.append(overlays[color])
         return labeled_overlays
     
     except Exception as e:
@@ -238,7 +450,7 @@ def overlay_selected_label(
         label_colors=255
     ):
     """
-    Overlay a selected label on the original image, highlighting it with the specified color.
+    Overlay a selected label on the original image, highlighting its outline and text in the contrasting color.
 
     Args:
         original_image (numpy.ndarray): The original image.
@@ -250,34 +462,13 @@ def overlay_selected_label(
 
     Returns:
         overlay (numpy.ndarray): Image with the selected label highlighted.
+                                 For repeated selections on the same frame, keep a SelectionOverlay instead.
     
     Raises:
         ValueError: If overlay fails.
     """
     try:
-        overlay = original_image.copy()
-        selected_label = label_names[index]
-        
-        edges = feature.canny(labeled_image > 0.5)
-
-        text_color = (label_colors,label_colors,label_colors)
-        edges_color = label_colors
-
-        overlay[edges] = edges_color
-
-        for label, center in zip(label_names, centroids):
-            if label == selected_label:
-                if label_colors == 255:
-                        text_color = (0,0,0)
-                elif label_colors == 0:
-                        text_color = (255,255,255)
-            else:
-                if label_colors == 255:
-                    text_color = (255,255,255)
-                elif label_colors == 0:
-                    text_color = (0,0,0)
-            overlay = cv2.putText(overlay, label, (int(center[1]), int(center[0])), cv2.FONT_HERSHEY_SIMPLEX, 0.3, text_color, 1)
-        return overlay
+        return SelectionOverlay(original_image, labeled_image, label_names, centroids).render(index, label_colors)
     except Exception as e:
         logger.error(f"Error in overlay_selected_label: {e}")
         raise ValueError(f"Failed to overlay selected label: {e}")
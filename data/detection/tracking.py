@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+Spot tracking across the frames of a movie.
+
+This module links the spots detected in consecutive frames into tracks with one-to-one
+assignment, closes gaps where a spot is missed in a few frames, and summarizes each track
+(lifetime, path length, mean squared displacement based diffusion coefficient).
+
+Linking follows the linear assignment approach: candidate links are restricted to a gating
+distance, the candidate graph is split into connected components, and each component is
+solved exactly with `scipy.optimize.linear_sum_assignment` on a cost matrix augmented with
+birth and death alternatives. Components are small for sensible gates, so the cost grows
+roughly linearly with the number of spots and frames.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Number of time lags used to fit the mean squared displacement
+DEFAULT_MSD_LAGS = 4
+
+TRACK_STATS_DTYPE = np.dtype([
+    ("track_id", np.int64),
+    ("start_frame", np.int64),
+    ("end_frame", np.int64),
+    ("lifetime", np.int64),
+    ("num_points", np.int64),
+    ("path_length", np.float64),
+    ("net_displacement", np.float64),
+    ("diffusion_coefficient", np.float64)
+])
+
+def solve_gated_assignment(sources, targets, costs, alternative_cost):
+    """
+    Solve a one-to-one assignment restricted to candidate pairs.
+
+    The candidate graph is split into connected components, each solved exactly with
+    linear_sum_assignment on a cost matrix augmented with "no link" alternatives, so
+    a pair is linked only if that is cheaper than leaving both ends unlinked.
+
+    Args:
+        sources (numpy.ndarray): Source index of each candidate pair.
+        targets (numpy.ndarray): Target index of each candidate pair.
+        costs (numpy.ndarray): Cost of each candidate pair.
+        alternative_cost (float): Cost of leaving a source or a target unlinked.
+
+    Returns:
+        tuple: Arrays of linked source and target indices.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    costs = np.asarray(costs, dtype=np.float64)
+    if sources.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # Compact indices of the sources and targets taking part in any candidate pair
+    source_ids, source_local = np.unique(sources, return_inverse=True)
+    target_ids, target_local = np.unique(targets, return_inverse=True)
+    num_sources, num_targets = len(source_ids), len(target_ids)
+
+    graph = coo_matrix(
+        (np.ones(len(sources)), (source_local, num_sources + target_local)),
+        shape=(num_sources + num_targets, num_sources + num_targets)
+    )
+    _, component = connected_components(graph, directed=False)
+    pair_component = component[source_local]
+
+    order = np.argsort(pair_component, kind="stable")
+    boundaries = np.flatnonzero(np.diff(pair_component[order])) + 1
+    linked_sources = []
+    linked_targets = []
+    blocked = np.inf
+
+    for pairs in np.split(order, boundaries):
+        if len(pairs) == 1:
+            # A lone candidate pair is linked if it beats the alternatives
+            if costs[pairs[0]] < 2 * alternative_cost:
+                linked_sources.append(source_ids[source_local[pairs]])
+                linked_targets.append(target_ids[target_local[pairs]])
+            continue
+
+        rows, row_index = np.unique(source_local[pairs], return_inverse=True)
+        cols, col_index = np.unique(target_local[pairs], return_inverse=True)
+        n, m = len(rows), len(cols)
+
+        link = np.full((n, m), blocked)
+        link[row_index, col_index] = costs[pairs]
+        cost_matrix = np.full((n + m, n + m), blocked)
+        cost_matrix[:n, :m] = link
+        cost_matrix[:n, m:][np.diag_indices(n)] = alternative_cost
+        cost_matrix[n:, :m][np.diag_indices(m)] = alternative_cost
+        cost_matrix[n:, m:] = np.where(np.isfinite(link.T), 0.0, blocked)
+
+        # Infinite entries are not accepted by linear_sum_assignment
+        finite_max = np.max(cost_matrix[np.isfinite(cost_matrix)])
+        cost_matrix[~np.isfinite(cost_matrix)] = (finite_max + 1) * (n + m)
+
+        row_assigned, col_assigned = linear_sum_assignment(cost_matrix)
+        is_link = (row_assigned < n) & (col_assigned < m)
+        is_link[is_link] = np.isfinite(link[row_assigned[is_link], col_assigned[is_link]])
+        linked_sources.append(source_ids[rows[row_assigned[is_link]]])
+        linked_targets.append(target_ids[cols[col_assigned[is_link]]])
+
+    return np.concatenate(linked_sources), np.concatenate(linked_targets)
+
+def link_frames(previous_points, current_points, max_distance):
+    """
+    Link the spots of two frames one-to-one, minimizing the sum of squared displacements.
+
+    Args:
+        previous_points (numpy.ndarray): Positions (N, 2) of the spots in the previous frame.
+        current_points (numpy.ndarray): Positions (M, 2) of the spots in the current frame.
+        max_distance (float): Largest displacement allowed for a link.
+
+    Returns:
+        tuple: Arrays of linked indices into previous_points and current_points.
+    """
+    previous_points = np.asarray(previous_points, dtype=np.float64).reshape(-1, 2)
+    current_points = np.asarray(current_points, dtype=np.float64).reshape(-1, 2)
+    if len(previous_points) == 0 or len(current_points) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    candidates = cKDTree(previous_points).sparse_distance_matrix(
+        cKDTree(current_points), max_distance, output_type="ndarray"
+    )
+    return solve_gated_assignment(
+        candidates["i"], candidates["j"], candidates["v"] ** 2, max_distance ** 2
+    )
+
+def _close_gaps(positions, frames, segment_ids, max_distance, max_gap):
+    """
+    Join track segments separated by up to max_gap missing frames.
+
+    Returns:
+        numpy.ndarray: Track id of every segment.
+    """
+    num_segments = int(segment_ids.max()) + 1
+    order = np.lexsort((frames, segment_ids))
+    sorted_segments = segment_ids[order]
+    first = order[np.r_[0, np.flatnonzero(np.diff(sorted_segments)) + 1]]
+    last = order[np.r_[np.flatnonzero(np.diff(sorted_segments)), len(order) - 1]]
+
+    end_frames = frames[last]
+    start_frames = frames[first]
+    sources, targets, costs = [], [], []
+
+    for frame in np.unique(end_frames):
+        ending = np.flatnonzero(end_frames == frame)
+        end_tree = cKDTree(positions[last[ending]])
+        for gap in range(1, max_gap + 1):
+            starting = np.flatnonzero(start_frames == frame + gap + 1)
+            if len(starting) == 0:
+                continue
+            reach = max_distance * np.sqrt(gap + 1)
+            candidates = end_tree.sparse_distance_matrix(
+                cKDTree(positions[first[starting]]), reach, output_type="ndarray"
+            )
+            sources.append(ending[candidates["i"]])
+            targets.append(starting[candidates["j"]])
+            # Squared displacement per elapsed frame, comparable with frame-to-frame links
+            costs.append(candidates["v"] ** 2 / (gap + 1))
+
+    track_of_segment = np.arange(num_segments)
+    if not sources:
+        return track_of_segment
+
+    linked_ends, linked_starts = solve_gated_assignment(
+        np.concatenate(sources), np.concatenate(targets), np.concatenate(costs), max_distance ** 2
+    )
+    next_segment = np.full(num_segments, -1)
+    next_segment[linked_ends] = linked_starts
+    has_previous = np.zeros(num_segments, dtype=bool)
+    has_previous[linked_starts] = True
+
+    # Follow the chains of joined segments from their heads
+    for head in np.flatnonzero(~has_previous):
+        segment = next_segment[head]
+        while segment >= 0:
+            track_of_segment[segment] = head
+            segment = next_segment[segment]
+    return track_of_segment
+
+def track_spots_across_frames(positions, offsets, max_distance, max_gap=0):
+    """
+    Link spots into tracks across all frames.
+
+    Args:
+        positions (numpy.ndarray): Positions (N, 2) of all spots, grouped by frame.
+        offsets (numpy.ndarray): Frame offsets; the spots of frame i are rows offsets[i]:offsets[i + 1].
+        max_distance (float): Largest displacement between consecutive frames, in the units of positions.
+        max_gap (int): Largest number of consecutive frames in which a spot may be missed.
+
+    Returns:
+        numpy.ndarray: Track id of every spot; ids are consecutive, numbered by first appearance.
+
+    Raises:
+        ValueError: If tracking fails.
+    """
+    try:
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        num_spots = len(positions)
+        if num_spots == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # Frame-to-frame links: each spot points to its successor
+        successor = np.full(num_spots, -1)
+        has_predecessor = np.zeros(num_spots, dtype=bool)
+        for frame in range(len(offsets) - 2):
+            previous = slice(offsets[frame], offsets[frame + 1])
+            current = slice(offsets[frame + 1], offsets[frame + 2])
+            linked_previous, linked_current = link_frames(positions[previous], positions[current], max_distance)
+            successor[offsets[frame] + linked_previous] = offsets[frame + 1] + linked_current
+            has_predecessor[offsets[frame + 1] + linked_current] = True
+
+        # Segments are the chains of linked spots
+        segment_ids = np.full(num_spots, -1)
+        heads = np.flatnonzero(~has_predecessor)
+        segment_ids[heads] = np.arange(len(heads))
+        current = heads
+        while current.size:
+            current = current[successor[current] >= 0]
+            segment_ids[successor[current]] = segment_ids[current]
+            current = successor[current]
+
+        if max_gap > 0 and len(heads) > 1:
+            frames = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+            track_of_segment = _close_gaps(positions, frames, segment_ids, max_distance, max_gap)
+            segment_ids = track_of_segment[segment_ids]
+
+        # Renumber consecutively in order of first appearance
+        _, first_index, track_ids = np.unique(segment_ids, return_index=True, return_inverse=True)
+        rank = np.empty(len(first_index), dtype=np.int64)
+        rank[np.argsort(first_index)] = np.arange(len(first_index))
+        return rank[track_ids.ravel()]
+
+    except Exception as e:
+        logger.error(f"Error in track_spots_across_frames: {e}")
+        raise ValueError(f"Failed to track spots: {e}")
+
+def calculate_track_statistics(positions, frames, track_ids, frame_interval=1.0, max_lag=DEFAULT_MSD_LAGS):
+    """
+    Summarize every track: lifetime, path length, net displacement and diffusion coefficient.
+
+    The diffusion coefficient is fitted to the mean squared displacement of the first max_lag
+    time lags, MSD(t) = 4 D t, through the origin; it is NaN for tracks shorter than two points.
+
+    Args:
+        positions (numpy.ndarray): Positions (N, 2) of all spots.
+        frames (numpy.ndarray): Frame index of every spot.
+        track_ids (numpy.ndarray): Track id of every spot, as returned by track_spots_across_frames.
+        frame_interval (float): Time between frames; the diffusion coefficient is in position units
+            squared per this time unit.
+        max_lag (int): Largest time lag, in frames, used for the fit.
+
+    Returns:
+        numpy.ndarray: Structured array of dtype TRACK_STATS_DTYPE with one record per track.
+
+    Raises:
+        ValueError: If the calculation fails.
+    """
+    try:
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        frames = np.asarray(frames, dtype=np.int64)
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        num_tracks = int(track_ids.max()) + 1 if track_ids.size else 0
+        stats = np.zeros(num_tracks, dtype=TRACK_STATS_DTYPE)
+        if num_tracks == 0:
+            return stats
+
+        order = np.lexsort((frames, track_ids))
+        tracks = track_ids[order]
+        track_frames = frames[order]
+        track_positions = positions[order]
+
+        starts = np.r_[0, np.flatnonzero(np.diff(tracks)) + 1]
+        ends = np.r_[starts[1:], len(tracks)] - 1
+        stats["track_id"] = tracks[starts]
+        stats["start_frame"] = track_frames[starts]
+        stats["end_frame"] = track_frames[ends]
+        stats["lifetime"] = stats["end_frame"] - stats["start_frame"] + 1
+        stats["num_points"] = ends - starts + 1
+        stats["net_displacement"] = np.linalg.norm(track_positions[ends] - track_positions[starts], axis=1)
+
+        steps = np.linalg.norm(np.diff(track_positions, axis=0), axis=1)
+        same_track = tracks[1:] == tracks[:-1]
+        stats["path_length"] = np.bincount(tracks[1:][same_track], weights=steps[same_track], minlength=num_tracks)
+
+        # Squared displacements summed per (track, lag); gaps make index shifts differ from lags
+        bins = num_tracks * (max_lag + 1)
+        sums = np.zeros(bins)
+        counts = np.zeros(bins)
+        for shift in range(1, max_lag + 1):
+            same = tracks[shift:] == tracks[:-shift]
+            lags = track_frames[shift:] - track_frames[:-shift]
+            valid = same & (lags <= max_lag)
+            squared = np.sum((track_positions[shift:] - track_positions[:-shift]) ** 2, axis=1)
+            index = tracks[shift:][valid] * (max_lag + 1) + lags[valid]
+            sums += np.bincount(index, weights=squared[valid], minlength=bins)
+            counts += np.bincount(index, minlength=bins)
+
+        sums = sums.reshape(num_tracks, max_lag + 1)
+        counts = counts.reshape(num_tracks, max_lag + 1)
+        lag_times = np.arange(max_lag + 1) * frame_interval
+        with np.errstate(divide="ignore", invalid="ignore"):
+            msd = sums / counts
+            available = counts > 0
+            numerator = np.sum(np.where(available, lag_times * msd, 0), axis=1)
+            denominator = np.sum(np.where(available, lag_times ** 2, 0), axis=1)
+            stats["diffusion_coefficient"] = np.where(denominator > 0, numerator / (4 * denominator), np.nan)
+
+        return stats
+
+    except Exception as e:
+        logger.error(f"Error in calculate_track_statistics: {e}")
+        raise ValueError(f"Failed to calculate track statistics: {e}")
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel file import.
+
+This module spreads reading of data files and their conversion into greyscale images
+across a pool of worker processes (or threads). Results are streamed back in the order
+of the input files, with progress reporting and cancellation.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from data.files.read_mpp import read_mpp_file
+from data.files.read_s94 import read_s94_file
+from data.files.read_stp import read_stp_file
+from data.data_manager import convert_data_to_greyscale_image
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+def read_data_file(file_path, file_type, lazy=False):
+    """
+    Read the file based on its type.
+
+    Args:
+        file_path (str): The path to the file to be read.
+        file_type (str): The type of the file ('s94', 'stp', 'mpp').
+        lazy (bool): If True, mpp frames are returned as proxies decoded on first access.
+
+    Returns:
+        dict: The content of the file.
+
+    Raises:
+        ValueError: If the file type is not supported or the file could not be read.
+    """
+    file_type = file_type.lower()
+    if file_type == "s94":
+        item = read_s94_file(file_path)
+    elif file_type == "stp":
+        item = read_stp_file(file_path)
+    elif file_type == "mpp":
+        item = read_mpp_file(file_path, lazy=lazy)
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+    # The s94 and stp readers log errors and return None instead of raising
+    if item is None:
+        raise ValueError(f"Failed to read {file_type} file '{file_path}'.")
+    return item
+
+def read_and_convert_file(file_path, file_type):
+    """
+    Read a file and convert its data into greyscale images.
+
+    This is the unit of work executed by the pool workers.
+
+    Args:
+        file_path (str): The path to the file to be read.
+        file_type (str): The type of the file ('s94', 'stp', 'mpp').
+
+    Returns:
+        dict: The content of the file with an additional 'images' list holding one greyscale
+              image per frame.
+    """
+    item = read_data_file(file_path, file_type)
+    if file_type.lower() == "mpp":
+        # Memory-mapped frames are materialized so that they can be sent back to the parent process
+        item['data'] = np.array(item['data'])
+        item['images'] = [convert_data_to_greyscale_image(frame) for frame in item['data']]
+    else:
+        item['data'] = np.array(item['data'])
+        item['images'] = [convert_data_to_greyscale_image(item['data'])]
+    return item
+
+class ParallelFileLoader:
+    """
+    Loads files in parallel and streams the results back in input order.
+
+    Attributes:
+        max_workers (int): Number of workers; None uses all cores.
+        use_processes (bool): If True a process pool is used, otherwise a thread pool.
+    """
+    def __init__(self, max_workers=None, use_processes=True):
+        """
+        Initialize the loader.
+
+        Args:
+            max_workers (int, optional): Number of workers; None uses all cores.
+            use_processes (bool): If True a process pool is used, otherwise a thread pool.
+        """
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """
+        Request cancellation; files not yet started are skipped.
+        """
+        self._cancel_event.set()
+
+    def load(self, file_paths, file_type, on_item, on_progress=None, on_error=None):
+        """
+        Read and convert the files, calling on_item for each result in input order.
+
+        At most two files per worker are in flight at any time, so results waiting
+        for an earlier file never pile up in memory.
+
+        Args:
+            file_paths (list): Paths of the files to load.
+            file_type (str): The type of the files ('s94', 'stp', 'mpp').
+            on_item (callable): Called with each loaded item.
+            on_progress (callable, optional): Called with (done, total) after each file.
+            on_error (callable, optional): Called with (file_path, exception) for files that failed.
+
+        Returns:
+            int: Number of files processed (loaded or failed) before completion or cancellation.
+        """
+        file_paths = list(file_paths)
+        total = len(file_paths)
+        done = 0
+
+        executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        workers = self.max_workers or os.cpu_count() or 1
+        executor = executor_class(max_workers=workers)
+        window = 2 * workers
+        pending = deque()
+        remaining = iter(file_paths)
+
+        try:
+            for path in remaining:
+                pending.append((path, executor.submit(read_and_convert_file, path, file_type)))
+                if len(pending) >= window:
+                    break
+
+            while pending and not self.cancelled:
+                path, future = pending.popleft()
+                try:
+                    on_item(future.result())
+                except Exception as e:
+                    logger.error(f"Error loading file '{path}': {e}")
+                    if on_error:
+                        on_error(path, e)
+
+                done += 1
+                if on_progress:
+                    on_progress(done, total)
+
+                next_path = next(remaining, None)
+                if next_path is not None and not self.cancelled:
+                    pending.append((next_path, executor.submit(read_and_convert_file, next_path, file_type)))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        return done
@@ -4,6 +4,10 @@ Read .mpp file.
 
 This module contains a function to read data from a .mpp file.
 
+The text header is parsed once, after which the whole frame block is exposed
+as a single (frames, rows, cols) array, memory-mapped by default, so that
+every frame is a zero-copy view into the file.
+
 @author
 Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
 """
@@ -12,22 +16,171 @@ import os, sys
 
 sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
 
+from data.model.frame_proxy import FrameProxy
+
+import argparse
 import numpy as np
 import struct
 import re
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
-def read_mpp_file(file_name):
+# Frame values are stored as little-endian double precision floats
+MPP_DATA_TYPE = np.dtype('<f8')
+
+def read_mpp_header(file):
+    """
+    Parse the text header of an opened .mpp file.
+
+    Args:
+        file (io.BufferedReader): The .mpp file opened in binary mode, positioned at the start.
+
+    Returns:
+        tuple: The header information dictionary and the image header length.
+               After the call the file is positioned at the first byte of the frame block.
+
+    Raises:
+        ValueError: If the header end marker is missing.
+    """
+    header_info = {}
+    header_length = None
+    current_section = None
+    while True:
+        raw_line = file.readline()
+        if not raw_line:
+            msg = "read_mpp_header: Missing '[Header end]' marker."
+            logger.error(msg)
+            raise ValueError(msg)
+        line = raw_line.decode().strip()
+        if line == "[Header end]":
+            break
+        elif line.startswith("Image header size: "):
+            header_length = int(re.search(r'\d+', line).group())
+        elif line.startswith("[") and line.endswith("]"):
+            current_section = line[1:-1]
+            header_info[current_section] = {}
+        elif ":" in line and current_section:
+            key, value = line.split(":", 1)
+            key = key.strip()
+            value = value.strip()
+            header_info[current_section][key] = value
+
+    return header_info, header_length
+
+def get_mpp_dimensions(header_info):
+    """
+    Extract the frame block dimensions from the .mpp header.
+
+    Args:
+        header_info (dict): Header information returned by read_mpp_header.
+
+    Returns:
+        tuple: Number of frames, rows and columns.
+
+    Raises:
+        ValueError: If any of the dimensions is missing or zero.
+    """
+    num_columns = int(header_info.get("General Info", {}).get("Number of columns", 0))
+    num_rows = int(header_info.get("General Info", {}).get("Number of rows", 0))
+    num_frames = int(header_info.get("General Info", {}).get("Number of Frames", 0))
+
+    if num_columns == 0 or num_rows == 0 or num_frames == 0:
+        msg = "read_mpp_file: Invalid dimensions in header."
+        logger.error(msg)
+        raise ValueError(msg)
+
+    return num_frames, num_rows, num_columns
+
+def check_mpp_frame_block(file_name, data_offset, shape):
+    """
+    Verify that the file holds the whole frame block declared in the header.
+
+    Args:
+        file_name (str): The path to the .mpp file.
+        data_offset (int): Byte offset of the first frame.
+        shape (tuple): Shape of the frame block (frames, rows, cols).
+
+    Returns:
+        int: Number of values in the frame block.
+
+    Raises:
+        ValueError: If the file is shorter than the declared frame block.
+    """
+    count = int(np.prod(shape))
+    available = (os.path.getsize(file_name) - data_offset) // MPP_DATA_TYPE.itemsize
+    if available < count:
+        msg = f"read_mpp_file: File holds {available} values, header declares {count}."
+        logger.error(msg)
+        raise ValueError(msg)
+    return count
+
+def read_mpp_frames(file_name, data_offset, shape, mmap=True):
+    """
+    Read the whole frame block of a .mpp file as one array.
+
+    Args:
+        file_name (str): The path to the .mpp file.
+        data_offset (int): Byte offset of the first frame.
+        shape (tuple): Shape of the frame block (frames, rows, cols).
+        mmap (bool): If True the block is memory-mapped read-only, otherwise it is loaded into memory.
+
+    Returns:
+        numpy.ndarray: Array of shape (frames, rows, cols); indexing it yields zero-copy frame views.
+
+    Raises:
+        ValueError: If the file is shorter than the declared frame block.
+    """
+    count = check_mpp_frame_block(file_name, data_offset, shape)
+
+    if mmap:
+        return np.memmap(file_name, dtype=MPP_DATA_TYPE, mode='r', offset=data_offset, shape=shape)
+    return np.fromfile(file_name, dtype=MPP_DATA_TYPE, count=count, offset=data_offset).reshape(shape)
+
+def create_mpp_frame_proxies(file_name, data_offset, shape):
+    """
+    Create lazy proxies for every frame of a .mpp file.
+
+    Args:
+        file_name (str): The path to the .mpp file.
+        data_offset (int): Byte offset of the first frame.
+        shape (tuple): Shape of the frame block (frames, rows, cols).
+
+    Returns:
+        list: List of FrameProxy objects, one per frame.
+
+    Raises:
+        ValueError: If the file is shorter than the declared frame block.
+    """
+    check_mpp_frame_block(file_name, data_offset, shape)
+
+    num_frames, num_rows, num_columns = shape
+    frame_bytes = num_rows * num_columns * MPP_DATA_TYPE.itemsize
+    return [
+        FrameProxy(
+            file_name=file_name,
+            frame_index=i,
+            offset=data_offset + i * frame_bytes,
+            shape=(num_rows, num_columns),
+            dtype=MPP_DATA_TYPE
+        )
+        for i in range(num_frames)
+    ]
+
+def read_mpp_file(file_name, mmap=True, lazy=False):
     """
     Read data from a .mpp file.
 
     Args:
         file_name (str): The path to the .mpp file.
+        mmap (bool): If True (default) the frames are memory-mapped instead of loaded into memory.
+        lazy (bool): If True the data is a list of FrameProxy objects decoded only on first access.
 
     Returns:
-        dict: A dictionary containing the file name, header information, data array, and header length.
+        dict: A dictionary containing the file name, header information, data array of shape
+              (frames, rows, cols) or list of frame proxies, header length and the byte offset
+              of the frame block.
 
     Raises:
         ValueError: If the file is invalid or contains incorrect data.
@@ -37,58 +190,28 @@ def read_mpp_file(file_name):
         msg = "read_mpp_file: Invalid input. filename must be strings."
         logger.error(msg)
         raise ValueError(msg)
-    
-    try:
-        header_info = {}
-        data_frames = []
-        header_length = None
 
+    try:
         # Read header information
         with open(file_name, "rb") as file:
-            current_section = None
-            while True:
-                line = file.readline().decode().strip()
-                if line == "[Header end]":
-                    break
-                elif line.startswith("Image header size: "):
-                    header_length = int(re.search(r'\d+', line).group())
-                elif line.startswith("[") and line.endswith("]"):
-                    current_section = line[1:-1]
-                    header_info[current_section] = {}
-                elif ":" in line and current_section:
-                    key, value = line.split(":", 1)
-                    key = key.strip()
-                    value = value.strip()
-                    header_info[current_section][key] = value
-
-            # Extract dimensions from header
-            num_columns = int(header_info.get("General Info", {}).get("Number of columns", 0))
-            num_rows = int(header_info.get("General Info", {}).get("Number of rows", 0))
-            num_frames = int(header_info.get("General Info", {}).get("Number of Frames", 0))
-
-            if num_columns == 0 or num_rows == 0 or num_frames == 0:
-                msg = "read_mpp_file: Invalid dimensions in header."
-                logger.error(msg)
-                raise ValueError(msg)
-
-            for _ in range(num_frames):
-                frame_data = []
-                for _ in range(num_columns * num_rows):
-                    raw_data = file.read(8)  # Assuming double precision floating-point data
-                    if not raw_data:
-                        break
-                    value = struct.unpack('d', raw_data)[0]
-                    frame_data.append(value)
-                data_array = np.array(frame_data).reshape((num_rows, num_columns))
-                data_frames.append(data_array)
+            header_info, header_length = read_mpp_header(file)
+            data_offset = file.tell()
+
+        # Extract dimensions from header
+        shape = get_mpp_dimensions(header_info)
+        if lazy:
+            data_frames = create_mpp_frame_proxies(file_name, data_offset, shape)
+        else:
+            data_frames = read_mpp_frames(file_name, data_offset, shape, mmap=mmap)
 
         return {
             "file_name": file_name,
             "header_info": header_info,
             "data": data_frames,
-            "header_length": header_length
+            "header_length": header_length,
+            "data_offset": data_offset
         }
-    
+
     except FileNotFoundError as e:
         logger.error(f"File '{file_name}' not found: {e}")
         raise FileNotFoundError(f"File '{file_name}' not found.")
@@ -99,13 +222,96 @@ def read_mpp_file(file_name):
         logger.error(f"An unexpected error occurred: {e}")
         raise Exception(f"An unexpected error occurred: {e}")
 
-def main():
-    file_name = "test_files/cut3_upper_part_of_stm_movie.mpp"
+def _read_mpp_frames_struct(file_name):
+    """
+    Reference per-value reader, kept only for benchmarking the vectorized reader.
+
+    Args:
+        file_name (str): The path to the .mpp file.
+
+    Returns:
+        list: List of frames as numpy arrays.
+    """
+    data_frames = []
+    with open(file_name, "rb") as file:
+        header_info, _ = read_mpp_header(file)
+        num_frames, num_rows, num_columns = get_mpp_dimensions(header_info)
+        for _ in range(num_frames):
+            frame_data = []
+            for _ in range(num_columns * num_rows):
+                raw_data = file.read(8)
+                if not raw_data:
+                    break
+                frame_data.append(struct.unpack('<d', raw_data)[0])
+            data_frames.append(np.array(frame_data).reshape((num_rows, num_columns)))
+    return data_frames
+
+def benchmark_read_mpp(file_name, repeats=3):
+    """
+    Compare the vectorized reader with the per-value struct loop.
+
+    Args:
+        file_name (str): The path to the .mpp file.
+        repeats (int): Number of timed runs of each reader; the best time is reported.
+
+    Returns:
+        dict: Best times in seconds for the struct loop, the in-memory and the memory-mapped reader,
+              and whether all readers returned identical frames.
+    """
+    def best_time(reader):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = reader()
+            times.append(time.perf_counter() - start)
+        return min(times), result
+
+    loop_time, loop_frames = best_time(lambda: _read_mpp_frames_struct(file_name))
+    # Touch every value so the memory-mapped timing includes the actual page reads
+    memory_time, memory_frames = best_time(lambda: read_mpp_file(file_name, mmap=False)["data"])
+    mmap_time, mmap_frames = best_time(lambda: np.array(read_mpp_file(file_name, mmap=True)["data"]))
+
+    identical = (
+        np.array_equal(np.array(loop_frames), memory_frames)
+        and np.array_equal(memory_frames, mmap_frames)
+    )
+
+    return {
+        "struct_loop": loop_time,
+        "fromfile": memory_time,
+        "memmap": mmap_time,
+        "identical": identical
+    }
+
+def main(argv=None):
+    """
+    Read an .mpp file and compare the vectorized readers with the struct loop.
+
+    Usage:
+        python data/files/read_mpp.py movie.mpp --repeats 5
+
+    Args:
+        argv (list, optional): Arguments to parse; None uses sys.argv.
+
+    Returns:
+        int: 0 if all readers returned identical frames, 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the .mpp readers on a file.")
+    parser.add_argument("file_name", help="Path to the .mpp file.")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of timed runs of each reader (default: 3).")
+    args = parser.parse_args(argv)
     try:
-        result = read_mpp_file(file_name)
-        print(result['header_length'])
+        result = read_mpp_file(args.file_name)
+        print(f"frames: {len(result['data'])}, header length: {result['header_length']}")
+        timings = benchmark_read_mpp(args.file_name, args.repeats)
+        print(f"struct loop: {timings['struct_loop']:.3f} s")
+        print(f"np.fromfile: {timings['fromfile']:.3f} s")
+        print(f"np.memmap:   {timings['memmap']:.3f} s")
+        print(f"identical:   {timings['identical']}")
+        return 0 if timings["identical"] else 1
     except Exception as e:
         print(f"Error: {e}")
+        return 1
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -59,20 +59,65 @@ FORMAT_STRING = "<hhhhiffffffhhffffhh"
 # The size (in bytes) of the binary data structure
 NUMBER_OF_BYTES = struct.calcsize(FORMAT_STRING)
 
+# Raw image counts are stored as little-endian 16-bit integers
+S94_DATA_TYPE = np.dtype('<i2')
+
+# Conversion of raw counts: value = (S94_SCALE_NUMERATOR * counts) / S94_SCALE_DENOMINATOR
+S94_SCALE_NUMERATOR = 20
+S94_SCALE_DENOMINATOR = 65536
+
 logger = logging.getLogger(__name__)
 if not logger.hasHandlers():
     logging.basicConfig(level=logging.DEBUG,  # Set default logging level to DEBUG
                         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-def read_s94_file(file_name):
+def scale_s94_counts(counts, dtype=np.float64):
+    """
+    Convert raw .s94 counts into image values.
+
+    The product with the numerator is evaluated in the floating point type of the result.
+    The original per-pixel conversion evaluated it in int16, which wrapped around for
+    |counts| > 1638 and gave wrong heights for the higher parts of real images. Both steps
+    are exact in float32 and float64, since the divisor is a power of two.
+
+    Args:
+        counts (numpy.ndarray): Raw 16-bit counts.
+        dtype (numpy.dtype): Floating point type of the result (float64 or float32).
+
+    Returns:
+        numpy.ndarray: Scaled image values.
+    """
+    return np.multiply(counts, S94_SCALE_NUMERATOR, dtype=dtype) / np.asarray(S94_SCALE_DENOMINATOR, dtype=dtype)
+
+def scale_s94_item_data(item, dtype=np.float64):
+    """
+    Get the heights of a file read with read_s94_file, scaling raw counts if needed.
+
+    Args:
+        item (dict): The content of the file, as returned by read_s94_file.
+        dtype (numpy.dtype): Floating point type of heights scaled from raw counts.
+
+    Returns:
+        numpy.ndarray: The heights.
+    """
+    if item.get("raw_counts"):
+        return scale_s94_counts(item["data"], dtype=dtype)
+    return item["data"]
+
+def read_s94_file(file_name, dtype=np.float64, raw=False):
     """
     Read data from a .s94 file.
 
     Args:
         file_name (str): The path to the .s94 file.
+        dtype (numpy.dtype): Floating point type of the scaled data (float64 or float32).
+        raw (bool): If True, the data is a zero-copy, memory-mapped int16 view of the raw counts
+                    in image orientation, scaled only when the data models are created
+                    (see scale_s94_item_data).
 
     Returns:
-        dict: A dictionary containing the file name, header information, and data array.
+        dict: A dictionary containing the file name, header information, data array, a flag
+              telling whether the data holds raw counts, and the factor converting counts into heights.
 
     Raises:
         ValueError: If the file is invalid or contains incorrect data.
@@ -95,13 +140,11 @@ def read_s94_file(file_name):
             x_points, y_points, Swapped, image_mode, Image_Number, x_size, y_size, x_offset, y_offset, Scan_Speed, \
                 Bias_Voltage, z_gain, Section, Kp, Tn, Tv, It, Scan_Angle, z_Flag = struct.unpack(FORMAT_STRING, data)
 
-            current = []
-            image_data = np.fromfile(file, dtype=np.int16, count=x_points * y_points).reshape((x_points, y_points))
-            for i in reversed(range(x_points)):
-                for j in reversed(range(y_points)):
-                    current.append((20 * image_data[i][j]) / 65536)
+        # The image is stored rotated by 180 degrees; flipping both axes gives a view, not a copy
+        image_data = np.memmap(file_name, dtype=S94_DATA_TYPE, mode='r', offset=NUMBER_OF_BYTES, shape=(x_points, y_points))
+        counts = image_data[::-1, ::-1]
 
-            current = np.reshape(current,(x_points, y_points))
+        current = counts if raw else scale_s94_counts(counts, dtype=dtype)
 
         # Construct header information dictionary
         header_info = {
@@ -130,7 +173,9 @@ def read_s94_file(file_name):
         result = {
             "file_name": file_name,
             "header_info": header_info,
-            "data": current
+            "data": current,
+            "raw_counts": raw,
+            "scale": S94_SCALE_NUMERATOR / S94_SCALE_DENOMINATOR
         }
 
         # Return dictionary
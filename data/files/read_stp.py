@@ -17,6 +17,9 @@ import numpy as np
 
 import logging
 
+# Data points are stored as little-endian double precision floats
+STP_DATA_TYPE = np.dtype('<f8')
+
 logger = logging.getLogger(__name__)
 if not logger.hasHandlers():
     logging.basicConfig(level=logging.DEBUG,  # Set default logging level to DEBUG
@@ -42,13 +45,15 @@ def read_stp_file(file_name):
         logger.error(msg)
         raise ValueError(msg)
     try:
-        data = []
         header_info = {}
 
         with open(file_name, "rb") as file:
             # Skip header lines until the end of the header section
             while True:
-                line = file.readline().decode().strip()
+                raw_line = file.readline()
+                if not raw_line:
+                    raise ValueError("Missing '[Header end]' marker.")
+                line = raw_line.decode().strip()
                 if line == "[Header end]":
                     break
                 elif ":" in line:
@@ -56,24 +61,28 @@ def read_stp_file(file_name):
                     key = key.strip()
                     value = value.strip()
                     header_info[key] = value
-                
-            num_columns = int(header_info.get("Number of columns", 0))
-            num_rows = int(header_info.get("Number of rows", 0))
 
-            if num_columns == 0 or num_rows == 0:
-                msg = "read_stp_file: Missing or invalid 'Number of columns' or 'Number of rows' in header."
-                logger.error(msg)
-                raise ValueError(msg)
+            # Byte offset of the first data point, right after the header end marker
+            data_offset = file.tell()
 
-            # Read data points
-            while True:
-                raw_data = file.read(8)  # Assuming double precision floating-point data
-                if not raw_data:
-                    break
-                value = struct.unpack('d', raw_data)[0]
-                data.append(value)
-        
-            data_array = np.array(data).reshape((num_rows, num_columns))
+        num_columns = int(header_info.get("Number of columns", 0))
+        num_rows = int(header_info.get("Number of rows", 0))
+
+        if num_columns == 0 or num_rows == 0:
+            msg = "read_stp_file: Missing or invalid 'Number of columns' or 'Number of rows' in header."
+            logger.error(msg)
+            raise ValueError(msg)
+
+        # Read data points in a single call, validating the count against the header
+        count = num_rows * num_columns
+        available = (os.path.getsize(file_name) - data_offset) // STP_DATA_TYPE.itemsize
+        if available < count:
+            raise ValueError(f"File holds {available} values, header declares {count}.")
+        if available > count:
+            logger.warning(f"read_stp_file: Ignoring {available - count} trailing values in '{file_name}'.")
+
+        data_array = np.fromfile(file_name, dtype=STP_DATA_TYPE, count=count, offset=data_offset)
+        data_array = data_array.reshape((num_rows, num_columns))
 
         # Construct dictionary with relevant information
         result = {
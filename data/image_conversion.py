@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Conversions between float height images and displayable images.
+
+In the float precision pipeline mode an operation chain starts from the measured heights
+(`FileDataModel.data`) as a single float32 array and every preprocessing operation returns a
+float32 array, so values are never quantized to 8 bits between steps. Images are quantized only
+when they are displayed, with the same min-max mapping as the greyscale conversion of the data.
+
+Operations that are only defined for integer images, or for intensities in [0, 1], map the float
+image onto that range and the result back onto the range of the input.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+FLOAT_IMAGE_DTYPE = np.float32
+
+def to_float_image(data):
+    """
+    Convert height data into a float image for the float precision pipeline.
+
+    Args:
+        data (numpy.ndarray): 2D array of heights.
+
+    Returns:
+        numpy.ndarray: The heights as a contiguous float32 array; the data itself if it already is one.
+    """
+    return np.ascontiguousarray(data, dtype=FLOAT_IMAGE_DTYPE)
+
+def is_float_image(img):
+    """
+    Check whether an image belongs to the float precision pipeline.
+
+    Args:
+        img (PIL.Image.Image or numpy.ndarray): The image.
+
+    Returns:
+        bool: True for a float32 array.
+    """
+    return isinstance(img, np.ndarray) and img.dtype == FLOAT_IMAGE_DTYPE
+
+def to_unit_range(img):
+    """
+    Map an image linearly onto [0, 1].
+
+    Args:
+        img (numpy.ndarray): The image.
+
+    Returns:
+        tuple: The mapped float32 image, and the minimum and maximum of the input.
+    """
+    low, high = float(np.min(img)), float(np.max(img))
+    scale = 1.0 / (high - low) if high > low else 1.0
+    return ((img - low) * scale).astype(FLOAT_IMAGE_DTYPE, copy=False), low, high
+
+def from_unit_range(img, low, high):
+    """
+    Map an image from [0, 1] back onto the range [low, high].
+
+    Args:
+        img (numpy.ndarray): The image in [0, 1], of any numeric type.
+        low (float): Minimum of the range.
+        high (float): Maximum of the range.
+
+    Returns:
+        numpy.ndarray: The float32 image.
+    """
+    return (np.asarray(img, dtype=FLOAT_IMAGE_DTYPE) * (high - low) + low).astype(FLOAT_IMAGE_DTYPE, copy=False)
+
+def image_size(img):
+    """
+    Get the size of an image.
+
+    Args:
+        img (PIL.Image.Image or numpy.ndarray): The image.
+
+    Returns:
+        tuple: Width and height.
+    """
+    if isinstance(img, Image.Image):
+        return img.size
+    return img.shape[1], img.shape[0]
+
+def resize_image(img, size, resample=Image.BILINEAR):
+    """
+    Resize a PIL image, a float image or a boolean array.
+
+    Boolean arrays are always resized with nearest neighbor interpolation, so they stay binary.
+
+    Args:
+        img (PIL.Image.Image or numpy.ndarray): The image.
+        size (tuple): Width and height of the result.
+        resample (int): Image.NEAREST or Image.BILINEAR.
+
+    Returns:
+        PIL.Image.Image or numpy.ndarray: The resized image, of the type of the input.
+    """
+    if isinstance(img, Image.Image):
+        return img.resize(size, resample)
+    interpolation = cv2.INTER_NEAREST if resample == Image.NEAREST else cv2.INTER_LINEAR
+    if img.dtype == bool:
+        # OpenCV cannot resize boolean arrays, e.g. the results of binary operations
+        return cv2.resize(img.view(np.uint8), size, interpolation=cv2.INTER_NEAREST).astype(bool)
+    return cv2.resize(img, size, interpolation=interpolation)
+
+def to_display_image(img):
+    """
+    Quantize an image for display.
+
+    Float images are mapped linearly from [min, max] to [0, 255], like the greyscale conversion
+    of the data; other images are only converted to PIL images.
+
+    Args:
+        img (PIL.Image.Image or numpy.ndarray): The image.
+
+    Returns:
+        PIL.Image.Image: The displayable image.
+    """
+    if isinstance(img, Image.Image):
+        return img
+    if np.issubdtype(img.dtype, np.floating):
+        low, high = float(np.min(img)), float(np.max(img))
+        if high == low:
+            high += 1
+        return Image.fromarray(((img - low) * (255 / (high - low))).astype(np.uint8))
+    return Image.fromarray(img)
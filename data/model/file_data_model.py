@@ -13,6 +13,10 @@ import os, sys
 sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
 
 from data.observer.observable import Observable
+from data.detection.overlay_rendering import render_label_overlays, SelectionOverlay
+from data.image_conversion import to_float_image
+
+from PIL import Image
 
 class FileDataModel(Observable):
     """
@@ -36,16 +40,24 @@ class FileDataModel(Observable):
         self._operations = []
         self._image_for_analisys = None
         self._labeled_image = None
+        self._centroids = None
         self._labeled_overlays = None
         self._labeled_overlays_white = None
+        self._selection_overlay = None
         self._areas = None
         self._labels_names = None
         self._nearest_neighbor_distance = None
         self._nearest_neighbor_name = None
+        self._morphometrics = None
+        self._spatial_statistics = None
+        self._radial_statistics = None
         self._currently_processing_image = None
         self._area_px_nm_coefficient = None
         self._x_px_nm_coefficient = None
         self._y_px_nm_coefficient = None
+        self._frame_proxy = None
+        self._analysis_generation = 0
+        self._analyzed_state = None
 
     # Getters
     @property
@@ -76,12 +88,20 @@ class FileDataModel(Observable):
     def labeled_image(self):
         return self._labeled_image
     
+    @property
+    def centroids(self):
+        return self._centroids
+
     @property
     def labeled_overlays(self):
+        if self._labeled_overlays is None:
+            self.render_overlays()
         return self._labeled_overlays
     
     @property
     def labeled_overlays_white(self):
+        if self._labeled_overlays_white is None:
+            self.render_overlays()
         return self._labeled_overlays_white
     
     @property
@@ -100,6 +120,18 @@ class FileDataModel(Observable):
     def nearest_neighbor_name(self):
         return self._nearest_neighbor_name
 
+    @property
+    def morphometrics(self):
+        return self._morphometrics
+
+    @property
+    def spatial_statistics(self):
+        return self._spatial_statistics
+
+    @property
+    def radial_statistics(self):
+        return self._radial_statistics
+
     @property
     def data_name(self):
         return self._data_name
@@ -118,16 +150,36 @@ class FileDataModel(Observable):
 
     @property
     def data(self):
+        if self._data is None and self._frame_proxy is not None:
+            return self._frame_proxy.load_data()
         return self._data
 
     @property
     def original_image(self):
+        if self._original_image is None and self._frame_proxy is not None:
+            return self._frame_proxy.load_image()
         return self._original_image
 
+    @property
+    def frame_proxy(self):
+        return self._frame_proxy
+
+    @property
+    def is_lazy(self):
+        return self._frame_proxy is not None and self._data is None
+
     @property
     def operations(self):
         return self._operations
 
+    @property
+    def analysis_generation(self):
+        return self._analysis_generation
+
+    @property
+    def analysis_settings(self):
+        return self._analyzed_state[1] if self._analyzed_state is not None else None
+
     # Property Setters with Notification
     @area_px_nm_coefficient.setter
     def area_px_nm_coefficient(self, value):
@@ -154,11 +206,19 @@ class FileDataModel(Observable):
     @image_for_analisys.setter
     def image_for_analisys(self, value):
         self._image_for_analisys = value
+        self._analysis_generation += 1
         self.notify_observers()
 
     @labeled_image.setter
     def labeled_image(self, value):
         self._labeled_image = value
+        self.clear_overlays()
+        self.notify_observers()
+
+    @centroids.setter
+    def centroids(self, value):
+        self._centroids = value
+        self.clear_overlays()
         self.notify_observers()
 
     @labeled_overlays.setter
@@ -179,6 +239,7 @@ class FileDataModel(Observable):
     @labels_names.setter
     def labels_names(self, value):
         self._labels_names = value
+        self.clear_overlays()
         self.notify_observers()
 
     @nearest_neighbor_distance.setter
@@ -191,6 +252,21 @@ class FileDataModel(Observable):
         self._nearest_neighbor_name = value
         self.notify_observers()
 
+    @morphometrics.setter
+    def morphometrics(self, value):
+        self._morphometrics = value
+        self.notify_observers()
+
+    @spatial_statistics.setter
+    def spatial_statistics(self, value):
+        self._spatial_statistics = value
+        self.notify_observers()
+
+    @radial_statistics.setter
+    def radial_statistics(self, value):
+        self._radial_statistics = value
+        self.notify_observers()
+
     @data_name.setter
     def data_name(self, value):
         self._data_name = value
@@ -221,6 +297,11 @@ class FileDataModel(Observable):
         self._original_image = value
         self.notify_observers()
 
+    @frame_proxy.setter
+    def frame_proxy(self, value):
+        self._frame_proxy = value
+        self.notify_observers()
+
     # Operations methods with Notification
     def clear_operations(self):
         self._operations.clear()
@@ -256,7 +337,114 @@ class FileDataModel(Observable):
             list: A list of all operations.
         """
         return self._operations[:]
-    
+
+    def set_operations(self, operations):
+        """
+        Replace all operations, notifying observers once.
+
+        Args:
+            operations (list): List of OperationModel instances.
+        """
+        self._operations = list(operations)
+        self.notify_observers()
+
+    def get_pipeline(self):
+        """
+        Get the operation chain applied to the data, in a serializable form.
+
+        Operations recorded without a function key or needing user input cannot be replayed and are skipped.
+
+        Returns:
+            list: List of dictionaries with 'name' and 'params' keys.
+        """
+        return [operation.to_dict() for operation in self._operations if operation.is_replayable]
+
+    def get_pipeline_input(self, float_precision=False):
+        """
+        Get the image an operation chain starts from.
+
+        Args:
+            float_precision (bool): Whether to start from the heights as a float image instead of the greyscale image.
+
+        Returns:
+            PIL.Image.Image or numpy.ndarray: The greyscale image, or the float32 heights.
+        """
+        if float_precision:
+            return to_float_image(self.data)
+        return self.original_image
+
+    def clear_overlays(self):
+        """
+        Drop the rendered overlays; they are rendered again when next requested.
+        """
+        self._labeled_overlays = None
+        self._labeled_overlays_white = None
+        self._selection_overlay = None
+
+    def render_overlays(self):
+        """
+        Render both overlay variants from the analysis results, if there are any.
+
+        Both variants share the contour and label masks, so they are always rendered together.
+        """
+        if self._labeled_image is None or self._labels_names is None or self._centroids is None:
+            return
+        overlays = render_label_overlays(self.original_image, self._labeled_image, self._labels_names, self._centroids)
+        self._labeled_overlays = Image.fromarray(overlays["black"])
+        self._labeled_overlays_white = Image.fromarray(overlays["white"])
+
+    def get_overlay_images(self):
+        """
+        Get both overlay variants without storing them on the item.
+
+        Overlays rendered earlier are reused, missing ones are rendered for the caller only, so this
+        can be called from worker threads, e.g. while exporting.
+
+        Returns:
+            dict: PIL Image of the 'black' and 'white' variants, or None if the item has not been analyzed.
+        """
+        black, white = self._labeled_overlays, self._labeled_overlays_white
+        if black is not None and white is not None:
+            return {"black": black, "white": white}
+        if self._labeled_image is None or self._labels_names is None or self._centroids is None:
+            return None
+        overlays = render_label_overlays(self.original_image, self._labeled_image, self._labels_names, self._centroids)
+        return {variant: Image.fromarray(overlay) for variant, overlay in overlays.items()}
+
+    def get_selection_overlay(self):
+        """
+        Get the overlay used to highlight a selected label, prepared on first use.
+
+        Returns:
+            SelectionOverlay: The overlay, or None if the item has not been analyzed.
+        """
+        if self._selection_overlay is None:
+            if self._labeled_image is None or self._labels_names is None or self._centroids is None:
+                return None
+            self._selection_overlay = SelectionOverlay(self.original_image, self._labeled_image, self._labels_names, self._centroids)
+        return self._selection_overlay
+
+    def is_analysis_stale(self, settings=None):
+        """
+        Check whether the analysis results are out of date.
+
+        Args:
+            settings (hashable, optional): Analysis settings the results must have been computed with.
+
+        Returns:
+            bool: True if the image for analysis changed or the settings differ since the last analysis.
+        """
+        return self._analyzed_state != (self._analysis_generation, settings)
+
+    def mark_analyzed(self, settings=None):
+        """
+        Record that the analysis results match the current image for analysis.
+
+        Args:
+            settings (hashable, optional): Analysis settings the results were computed with.
+        """
+        self._analyzed_state = (self._analysis_generation, settings)
+
     def get_header_string(self):
         """
         Generate a header string based on the file type.
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy frame access for large STM movies.
+
+This module defines the `FrameProxy` class, which stands in for a single frame stored in a file
+and decodes it only on first access, and the `FrameCache` class, a bounded LRU of decoded frames
+that keeps the memory used by lazily loaded movies under a configurable ceiling.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default number of decoded entries (raw frames and greyscale images) kept in memory
+DEFAULT_CACHE_SIZE = 64
+
+class FrameCache:
+    """
+    Bounded least-recently-used cache of decoded frames.
+
+    Attributes:
+        max_items (int): Maximum number of decoded entries kept in memory.
+    """
+    def __init__(self, max_items=DEFAULT_CACHE_SIZE):
+        """
+        Initialize the cache.
+
+        Args:
+            max_items (int): Maximum number of decoded entries kept in memory.
+        """
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_items = max(1, int(max_items))
+
+    @property
+    def max_items(self):
+        return self._max_items
+
+    @max_items.setter
+    def max_items(self, value):
+        with self._lock:
+            self._max_items = max(1, int(value))
+            self._trim()
+
+    def get(self, key, loader):
+        """
+        Return the cached entry for the key, decoding it with the loader on a miss.
+
+        Args:
+            key (hashable): Key identifying the entry.
+            loader (callable): Function without arguments returning the decoded entry.
+
+        Returns:
+            object: The decoded entry.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = loader()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._trim()
+        return value
+
+    def clear(self):
+        """
+        Drop all decoded entries.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _trim(self):
+        while len(self._entries) > self._max_items:
+            self._entries.popitem(last=False)
+
+class FrameProxy:
+    """
+    Placeholder for a frame stored in a file, decoded only when first accessed.
+
+    Attributes:
+        file_name (str): The path to the file holding the frame.
+        frame_index (int): Zero-based index of the frame in the file.
+        offset (int): Byte offset of the frame in the file.
+        shape (tuple): Shape of the frame (rows, cols).
+        dtype (numpy.dtype): Data type of the stored values.
+    """
+    def __init__(self, file_name, frame_index, offset, shape, dtype):
+        """
+        Initialize the FrameProxy instance.
+
+        Args:
+            file_name (str): The path to the file holding the frame.
+            frame_index (int): Zero-based index of the frame in the file.
+            offset (int): Byte offset of the frame in the file.
+            shape (tuple): Shape of the frame (rows, cols).
+            dtype (numpy.dtype): Data type of the stored values.
+        """
+        self.file_name = file_name
+        self.frame_index = frame_index
+        self.offset = offset
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._cache = None
+        self._converter = None
+
+    def bind(self, cache, converter):
+        """
+        Attach the cache holding decoded entries and the greyscale converter.
+
+        Args:
+            cache (FrameCache): Cache shared by all proxies of the data set.
+            converter (callable): Function converting raw frame data into a PIL image.
+        """
+        self._cache = cache
+        self._converter = converter
+
+    def read_data(self):
+        """
+        Decode the frame directly from the file, bypassing the cache.
+
+        Returns:
+            numpy.ndarray: The frame data.
+        """
+        count = int(np.prod(self.shape))
+        data = np.fromfile(self.file_name, dtype=self.dtype, count=count, offset=self.offset)
+        if data.size != count:
+            msg = f"FrameProxy: Frame {self.frame_index} of '{self.file_name}' is truncated."
+            logger.error(msg)
+            raise ValueError(msg)
+        return data.reshape(self.shape)
+
+    def load_data(self):
+        """
+        Return the frame data, decoding it on first access.
+
+        Returns:
+            numpy.ndarray: The frame data.
+        """
+        if self._cache is None:
+            return self.read_data()
+        return self._cache.get((self.file_name, self.frame_index, "data"), self.read_data)
+
+    def load_image(self):
+        """
+        Return the greyscale image of the frame, converting it on first access.
+
+        Returns:
+            PIL.Image.Image: The greyscale image.
+
+        Raises:
+            ValueError: If no converter was bound to the proxy.
+        """
+        if self._converter is None:
+            msg = "FrameProxy: No greyscale converter bound."
+            logger.error(msg)
+            raise ValueError(msg)
+        if self._cache is None:
+            return self._converter(self.read_data())
+        return self._cache.get(
+            (self.file_name, self.frame_index, "image"),
+            lambda: self._converter(self.load_data())
+        )
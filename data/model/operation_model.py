@@ -12,6 +12,8 @@ import os, sys
 
 sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
 
+from data.operation_registry import get_operation
+
 class OperationModel:
     """
     Represents a data model for STM files.
@@ -19,17 +21,23 @@ class OperationModel:
     Attributes:
         process_name (str): The name of the process associated with the STM data.
         image (numpy.ndarray): The image data associated with the STM data.
+        function_key (str): The name of the operation in the `operation_registry`.
+        params (dict): The parameters the operation was applied with.
     """
-    def __init__(self, process_name, image):
+    def __init__(self, process_name, image, function_key=None, params=None):
         """
         Initialize the OperationModel instance.
 
         Args:
             process_name (str): The name of the process.
             image (numpy.ndarray): The image data.
+            function_key (str, optional): The operation name used to look up the operation function.
+            params (dict, optional): The parameters of the operation.
         """
         self._process_name = process_name
         self._image = image
+        self._function_key = function_key
+        self._params = dict(params) if params is not None else {}
 
     @property
     def process_name(self):
@@ -45,4 +53,43 @@ class OperationModel:
 
     @image.setter
     def image(self, value):
-        self._image = value
\ No newline at end of file
+        self._image = value
+
+    @property
+    def function_key(self):
+        return self._function_key
+
+    @function_key.setter
+    def function_key(self, value):
+        self._function_key = value
+
+    @property
+    def params(self):
+        return self._params
+
+    @params.setter
+    def params(self, value):
+        self._params = dict(value) if value is not None else {}
+
+    @property
+    def is_replayable(self):
+        """
+        Whether the operation can be applied again from its function key and parameters alone.
+
+        Operations without a function key, with an unknown one or needing user input are not replayable.
+        """
+        if self._function_key is None:
+            return False
+        try:
+            return not get_operation(self._function_key).interactive
+        except ValueError:
+            return False
+
+    def to_dict(self):
+        """
+        Describe the operation as an entry of a serializable operation chain.
+
+        Returns:
+            dict: Dictionary with the operation 'name' and its 'params'.
+        """
+        return {"name": self._function_key, "params": dict(self._params)}
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed cache of operation results.
+
+This module defines the `OperationCache` class, a singleton holding the results of preprocessing
+and processing operations keyed by a hash of the input image, the operation name and its parameters.
+Results are kept in memory under a least-recently-used policy with a byte budget; entries evicted
+from memory can optionally be spilled to an on-disk store and read back on a later request.
+
+Cached results are returned by identity: every caller gets the same (process_name, image) tuple
+and the same image object, so the images must be treated as read-only.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default memory budget for cached results
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+def compute_operation_key(name, params, img):
+    """
+    Compute the cache key of an operation applied to an image.
+
+    Args:
+        name (str): The operation name.
+        params (dict): Parameters of the operation.
+        img (PIL.Image.Image or numpy.ndarray): The input image.
+
+    Returns:
+        str: Hexadecimal digest identifying the input image, operation and parameters.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    if isinstance(img, Image.Image):
+        digest.update(f"{img.mode}{img.size}".encode())
+    array = np.ascontiguousarray(img)
+    digest.update(f"{array.dtype.str}{array.shape}".encode())
+    digest.update(array.data)
+    digest.update(name.encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+class OperationCache:
+    """
+    Singleton cache of operation results.
+
+    A hit returns the stored result itself, not a copy; callers that modify a result image in place
+    would modify it for every other holder of the result and for later hits.
+
+    Attributes:
+        enabled (bool): If False, operations are always computed.
+        max_bytes (int): Memory budget of the cached results.
+        disk_dir (str): Folder of the on-disk store; None keeps results only in memory.
+        write_through (bool): If True, computed results are written to the on-disk store immediately
+            instead of only when evicted from memory.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        """
+        Create a new instance if it doesn't exist, otherwise return the existing instance.
+        """
+        if cls._instance is None:
+            cls._instance = super(OperationCache, cls).__new__(cls, *args, **kwargs)
+        return cls._instance
+
+    def __init__(self):
+        """
+        Initialize the cache with an empty memory store. Ensures initialization is only done once.
+        """
+        if not hasattr(self, 'initialized'):
+            self._entries = OrderedDict()
+            self._lock = threading.Lock()
+            self._bytes = 0
+            self.enabled = True
+            self.max_bytes = DEFAULT_MAX_BYTES
+            self.disk_dir = None
+            self.write_through = False
+            self.hits = 0
+            self.misses = 0
+            self.initialized = True
+
+    def configure(self, max_bytes=None, disk_dir=None, enabled=None, write_through=None):
+        """
+        Change the cache settings.
+
+        Args:
+            max_bytes (int, optional): Memory budget of the cached results.
+            disk_dir (str, optional): Folder of the on-disk store; an empty string disables it.
+            enabled (bool, optional): Enable or disable the cache.
+            write_through (bool, optional): Write computed results to the on-disk store immediately.
+        """
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max(0, int(max_bytes))
+            if disk_dir is not None:
+                self.disk_dir = disk_dir or None
+                if self.disk_dir:
+                    os.makedirs(self.disk_dir, exist_ok=True)
+            if enabled is not None:
+                self.enabled = enabled
+            if write_through is not None:
+                self.write_through = write_through
+            evicted = self._trim()
+        self._spill(evicted)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """
+        Drop all results held in memory. The on-disk store is left untouched.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_or_compute(self, name, params, img, compute):
+        """
+        Return the cached result of the operation, computing it on a miss.
+
+        The returned tuple and image are shared with the cache and with other callers and must not be modified.
+
+        Args:
+            name (str): The operation name.
+            params (dict): Parameters of the operation.
+            img (PIL.Image.Image): The input image.
+            compute (callable): Function without arguments returning (process_name, image).
+
+        Returns:
+            tuple: Process name and the resulting image.
+        """
+        if not self.enabled:
+            return compute()
+
+        key = compute_operation_key(name, params, img)
+        result = self._lookup(key)
+        if result is None:
+            result = compute()
+            self._add_computed(key, result)
+        return result
+
+    def get_or_compute_many(self, name, params, images, compute_many):
+        """
+        Return the cached results of the operation for several images, computing the misses together.
+
+        As in get_or_compute, the returned results are shared and must not be modified.
+
+        Args:
+            name (str): The operation name.
+            params (dict): Parameters of the operation.
+            images (list): The input images.
+            compute_many (callable): Function taking the list of images that missed the cache and
+                returning a list of (process_name, image), one per image.
+
+        Returns:
+            list: Process name and resulting image for each input image.
+        """
+        if not self.enabled:
+            return compute_many(images)
+
+        keys = [compute_operation_key(name, params, img) for img in images]
+        results = [self._lookup(key) for key in keys]
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            for index, result in zip(missing, compute_many([images[index] for index in missing])):
+                results[index] = result
+                self._add_computed(keys[index], result)
+        return results
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+
+        result = self._read_from_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if result is not None:
+            self._store(key, result)
+        return result
+
+    def _add_computed(self, key, result):
+        if self.write_through:
+            self._write_to_disk(key, result)
+        self._store(key, result)
+
+    def _store(self, key, result):
+        size = _result_size(result[1])
+        with self._lock:
+            if key in self._entries:
+                return
+            if size > self.max_bytes:
+                evicted = [(key, result)]
+            else:
+                self._entries[key] = (result, size)
+                self._bytes += size
+                evicted = self._trim()
+        # Disk writes happen outside the lock so that they don't block the other workers
+        self._spill(evicted)
+
+    def _trim(self):
+        # Called with the lock held; returns the evicted entries for _spill
+        evicted = []
+        while self._bytes > self.max_bytes and self._entries:
+            key, (result, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            evicted.append((key, result))
+        return evicted
+
+    def _spill(self, entries):
+        for key, result in entries:
+            self._write_to_disk(key, result)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.npz")
+
+    def _write_to_disk(self, key, result):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        process_name, image = result
+        mode = image.mode if isinstance(image, Image.Image) else ""
+        try:
+            # Written under a temporary name so that concurrent readers never see partial files
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                np.savez(file, image=np.asarray(image), mode=np.array(mode), process_name=np.array(process_name))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"OperationCache: Failed to write '{path}': {e}")
+
+    def _read_from_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as content:
+                image = content["image"]
+                mode = str(content["mode"])
+                process_name = str(content["process_name"])
+            if mode:
+                image = Image.fromarray(image)
+                if image.mode != mode:
+                    image = image.convert(mode)
+            return process_name, image
+        except Exception as e:
+            logger.error(f"OperationCache: Failed to read '{path}': {e}")
+            return None
+
+def _result_size(image):
+    return np.asarray(image).nbytes
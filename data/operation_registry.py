@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+"""
+Registry of the preprocessing and processing operations.
+
+Every operation offered in the operations dropdown, in saved pipelines and in the batch mode is
+declared here once. An operation declares:
+
+- its typed parameters, with their default values, labels and slider ranges in the UI;
+- the data types of the images it accepts and the data type of the images it returns;
+- its kind: 'pointwise' (every pixel is mapped on its own), 'separable' (a filter applied along the
+  rows and the columns), 'local' (any other filter over a neighborhood) or 'global' (the result
+  depends on the whole image, e.g. through a histogram or a fitted surface);
+- optionally a batched implementation, processing a stack of frames of shape (N, H, W) in one call.
+
+The operations UI, the pipeline engine and the batch mode dispatch through this registry; the
+default parameters and the UI configuration in `options_config` are derived from it.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import numpy as np
+from PIL import Image
+
+from data.preprocessing.preprocessing_operations import (
+    perform_gaussian_blur,
+    perform_gaussian_filter,
+    perform_non_local_denoising,
+    perform_erosion,
+    perform_binary_greyscale_erosion,
+    perform_binary_greyscale_dilation,
+    perform_binary_greyscale_opening,
+    perform_binary_greyscale_closing,
+    perform_gamma_adjustment,
+    perform_contrast_stretching,
+    perform_adaptive_equalization,
+    perform_region_leveling,
+    perform_three_point_leveling,
+    perform_gaussian_sharpening,
+    perform_propagation,
+    perform_polynomial_leveling,
+    perform_adaptive_leveling,
+    perform_local_median_filter,
+    perform_black_top_hat,
+    perform_white_top_hat,
+    perform_gaussian_filter_batch,
+    perform_gamma_adjustment_batch
+)
+
+from data.processing.processing_operations import (
+    perform_otsu_threshold,
+    perform_local_threshold,
+    perform_niblack_threshold,
+    perform_sauvola_threshold,
+    perform_yen_threshold,
+    perform_isodata_threshold,
+    perform_binary_erosion,
+    perform_binary_dilation,
+    perform_binary_opening,
+    perform_binary_closing,
+    perform_removing_small_holes,
+    perform_removing_small_objects,
+    perform_manual_white_remove,
+    perform_binary_threshold,
+    perform_binary_threshold_batch
+)
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Categories of the operations dropdown, in display order
+OPERATION_CATEGORIES = ("Preprocessing", "Thresholding", "Binary Process")
+
+OPERATION_KINDS = ("pointwise", "separable", "local", "global")
+
+# Data types of the pixels of PIL images, by mode
+IMAGE_MODE_DTYPES = {
+    "1": np.dtype(bool),
+    "L": np.dtype(np.uint8),
+    "I;16": np.dtype(np.uint16),
+    "I": np.dtype(np.int32),
+    "F": np.dtype(np.float32)
+}
+
+GREYSCALE_DTYPES = (np.uint8, np.float32)
+BINARY_DTYPES = (bool, np.uint8)
+
+def image_dtype(img):
+    """
+    Get the data type of the pixels of an image.
+
+    Args:
+        img (PIL.Image.Image or numpy.ndarray): The image.
+
+    Returns:
+        numpy.dtype: The data type of the image as an array.
+    """
+    if isinstance(img, Image.Image):
+        dtype = IMAGE_MODE_DTYPES.get(img.mode)
+        return dtype if dtype is not None else np.asarray(img).dtype
+    return np.asarray(img).dtype
+
+class OperationParam:
+    """
+    A typed parameter of an operation.
+
+    Attributes:
+        name (str): Key of the parameter in the parameters dictionary.
+        label (str): Label of the parameter in the UI.
+        type (type): int, float or str.
+        default: The default value.
+        minimum (float): Lower end of the slider in the UI; None for parameters with choices.
+        maximum (float): Upper end of the slider in the UI.
+        resolution (float): Step of the slider in the UI.
+        choices (list): Tuples (label, value) of the allowed values; None for numeric parameters.
+        odd (bool): Whether the value must be odd; even values are rounded up.
+    """
+    def __init__(self, name, label, type, default, minimum=None, maximum=None, resolution=1, choices=None, odd=False):
+        """
+        Initialize the parameter.
+
+        Args:
+            name (str): Key of the parameter in the parameters dictionary.
+            label (str): Label of the parameter in the UI.
+            type (type): int, float or str.
+            default: The default value.
+            minimum (float, optional): Lower end of the slider in the UI.
+            maximum (float, optional): Upper end of the slider in the UI.
+            resolution (float): Step of the slider in the UI.
+            choices (list, optional): Tuples (label, value) of the allowed values, shown as radio buttons.
+            odd (bool): Whether the value must be odd.
+        """
+        self.name = name
+        self.label = label
+        self.type = type
+        self.minimum = minimum
+        self.maximum = maximum
+        self.resolution = resolution
+        self.choices = choices
+        self.odd = odd
+        self.default = self.coerce(default)
+
+    @property
+    def is_choice(self):
+        return self.choices is not None
+
+    def coerce(self, value):
+        """
+        Convert a value, e.g. read from a slider or a JSON file, to the type of the parameter.
+
+        Args:
+            value: The value.
+
+        Returns:
+            The value as the type of the parameter; odd parameters are rounded up to an odd value.
+
+        Raises:
+            ValueError: If the value cannot be converted or is not one of the choices.
+        """
+        if self.choices is not None:
+            if value not in [choice for _, choice in self.choices]:
+                raise ValueError(f"Parameter '{self.name}' must be one of {[choice for _, choice in self.choices]}, got {value!r}.")
+            return value
+
+        try:
+            if self.type is int:
+                number = float(value)
+                if not number.is_integer():
+                    raise ValueError
+                value = int(number)
+            else:
+                value = self.type(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Parameter '{self.name}' must be of type {self.type.__name__}, got {value!r}.")
+
+        if self.odd and value % 2 == 0:
+            value += 1
+        return value
+
+class Operation:
+    """
+    An operation of the registry.
+
+    Attributes:
+        name (str): The operation name, as used in the operations dropdown and in pipelines.
+        category (str): One of OPERATION_CATEGORIES.
+        function (callable): The perform_* function taking (params, img) and returning (process name, image).
+        process_name (str): Name of the operation in the operations list of an item.
+        params (tuple): The OperationParam instances, in display order.
+        kind (str): One of OPERATION_KINDS.
+        input_dtypes (tuple): Data types of the images the operation accepts.
+        output_dtype (numpy.dtype): Data type of the result; None if it is the type of the input.
+        batched (callable): Function taking (params, stack) for a stack of shape (N, H, W) and returning
+                            the stack of results; None if the operation is only applied frame by frame.
+        batched_dtypes (tuple): Data types of the stacks the batched function accepts.
+        interactive (bool): Whether the operation asks the user for input, so it cannot run unattended.
+    """
+    def __init__(self, name, category, function, params=(), kind="local", input_dtypes=GREYSCALE_DTYPES,
+                 output_dtype=None, batched=None, batched_dtypes=None, process_name=None, interactive=False):
+        """
+        Initialize the operation; see the class attributes for the arguments.
+
+        Raises:
+            ValueError: If the category or the kind is unknown.
+        """
+        if category not in OPERATION_CATEGORIES:
+            raise ValueError(f"Unknown operation category '{category}'.")
+        if kind not in OPERATION_KINDS:
+            raise ValueError(f"Unknown operation kind '{kind}'.")
+        self.name = name
+        self.category = category
+        self.function = function
+        self.process_name = process_name or name
+        self.params = tuple(params)
+        self.kind = kind
+        self.input_dtypes = tuple(np.dtype(dtype) for dtype in input_dtypes)
+        self.output_dtype = np.dtype(output_dtype) if output_dtype is not None else None
+        self.batched = batched
+        self.batched_dtypes = tuple(np.dtype(dtype) for dtype in batched_dtypes) if batched_dtypes is not None else self.input_dtypes
+        self.interactive = interactive
+
+    def get_param(self, name):
+        """
+        Get a parameter by its key; None if the operation has no such parameter.
+        """
+        return next((param for param in self.params if param.name == name), None)
+
+    def default_params(self):
+        """
+        Get the default parameters.
+
+        Returns:
+            dict: A new dictionary of the default values.
+        """
+        return {param.name: param.default for param in self.params}
+
+    def coerce_params(self, params):
+        """
+        Complete parameters with their defaults and convert them to their types.
+
+        Args:
+            params (dict): The parameters; keys the operation does not declare are kept as they are.
+
+        Returns:
+            dict: A new dictionary with every declared parameter.
+
+        Raises:
+            ValueError: If a value cannot be converted.
+        """
+        coerced = self.default_params()
+        for name, value in (params or {}).items():
+            param = self.get_param(name)
+            coerced[name] = param.coerce(value) if param is not None else value
+        return coerced
+
+    def accepts(self, dtype):
+        """
+        Check whether the operation accepts images of a data type.
+        """
+        return np.dtype(dtype) in self.input_dtypes
+
+    def can_batch(self, dtype):
+        """
+        Check whether stacks of a data type can be processed by the batched implementation.
+        """
+        return self.batched is not None and np.dtype(dtype) in self.batched_dtypes
+
+_operations = {}
+
+def register_operation(operation):
+    """
+    Add an operation to the registry.
+
+    Args:
+        operation (Operation): The operation.
+
+    Raises:
+        ValueError: If an operation with the same name is already registered.
+    """
+    if operation.name in _operations:
+        raise ValueError(f"Operation '{operation.name}' is already registered.")
+    _operations[operation.name] = operation
+
+def get_operation(name):
+    """
+    Get a registered operation.
+
+    Args:
+        name (str): The operation name.
+
+    Returns:
+        Operation: The operation.
+
+    Raises:
+        ValueError: If the operation is unknown.
+    """
+    operation = _operations.get(name)
+    if operation is None:
+        msg = f"Unknown operation: {name}"
+        logger.error(msg)
+        raise ValueError(msg)
+    return operation
+
+def get_operations(category=None):
+    """
+    Get the registered operations in registration order.
+
+    Args:
+        category (str, optional): Only the operations of this category; None for all.
+
+    Returns:
+        list: The Operation instances.
+    """
+    return [operation for operation in _operations.values() if category is None or operation.category == category]
+
+KERNEL_TYPE_CHOICES = [("Rectangle", "re"), ("Ellipse", "el"), ("Cross", "cr")]
+SELEM_TYPE_CHOICES = [("Disk", "disk"), ("Square", "square"), ("Diamond", "diamond"), ("Star", "star")]
+FOOTPRINT_TYPE_CHOICES = [("Disk", "disk"), ("Square", "square"), ("Star", "star"), ("Diamond", "diamond")]
+
+def _kernel_params(default_size):
+    return (
+        OperationParam("kernel_type", "Kernel Type", str, "re", choices=KERNEL_TYPE_CHOICES),
+        OperationParam("kernel_size", "Kernel Size", int, default_size, 3, 21, 1, odd=True)
+    )
+
+def _selem_params():
+    return (
+        OperationParam("selem_type", "Selem Type", str, "disk", choices=SELEM_TYPE_CHOICES),
+        OperationParam("selem_size", "Selem Size", int, 12, 2, 30, 1)
+    )
+
+def _footprint_params():
+    return (
+        OperationParam("footprint_type", "Footprint Type", str, "disk", choices=FOOTPRINT_TYPE_CHOICES),
+        OperationParam("footprint_size", "Footprint Size", int, 2, 1, 50, 1)
+    )
+
+# Preprocessing: greyscale in, greyscale of the same type out
+for operation in (
+    Operation("Gaussian Blur", "Preprocessing", perform_gaussian_blur, kind="separable", process_name="GaussianBlur", params=(
+        OperationParam("sigmaY", "sigmaY", int, 5, 3, 21, 2, odd=True),
+        OperationParam("sigmaX", "sigmaX", int, 5, 3, 21, 2, odd=True)
+    )),
+    Operation("Non-local Mean Denoising", "Preprocessing", perform_non_local_denoising, kind="local", params=(
+        OperationParam("h", "h", float, 3, 0.1, 10.0, 0.1),
+        OperationParam("templateWindowSize", "Template Window Size", int, 7, 3, 21, 1),
+        OperationParam("searchWindowSize", "Search Window Size", int, 21, 3, 51, 1, odd=True)
+    )),
+    Operation("GaussianFilter", "Preprocessing", perform_gaussian_filter, kind="separable",
+              batched=perform_gaussian_filter_batch, params=(
+        OperationParam("sigma", "sigma", float, 4, 0.1, 4.0, 0.05),
+    )),
+    Operation("Erosion", "Preprocessing", perform_erosion, kind="local", params=(
+        OperationParam("kernel_type", "Kernel Type", str, "re", choices=KERNEL_TYPE_CHOICES),
+        OperationParam("kernel_size", "Kernel Size", int, 5, 3, 21, 1, odd=True),
+        OperationParam("iterations", "Iterations", int, 1, 1, 5, 1)
+    )),
+    Operation("Binary Greyscale Erosion", "Preprocessing", perform_binary_greyscale_erosion, kind="local", params=_kernel_params(3)),
+    Operation("Binary Greyscale Dilation", "Preprocessing", perform_binary_greyscale_dilation, kind="local", params=_kernel_params(3)),
+    Operation("Binary Greyscale Opening", "Preprocessing", perform_binary_greyscale_opening, kind="local", params=_kernel_params(3)),
+    Operation("Binary Greyscale Closing", "Preprocessing", perform_binary_greyscale_closing, kind="local", params=_kernel_params(3)),
+    # Float images are mapped onto [0, 1] with their own range, so only 8-bit stacks are batched
+    Operation("Gamma Adjustment", "Preprocessing", perform_gamma_adjustment, kind="pointwise",
+              batched=perform_gamma_adjustment_batch, batched_dtypes=(np.uint8,), params=(
+        OperationParam("gamma", "gamma", float, 3.5, 0.1, 10.0, 0.05),
+    )),
+    Operation("Contrast Stretching", "Preprocessing", perform_contrast_stretching, kind="global", params=(
+        OperationParam("min", "min", int, 2, 1, 99, 1),
+        OperationParam("max", "max", int, 98, 1, 99, 1)
+    )),
+    Operation("Adaptive Equalization", "Preprocessing", perform_adaptive_equalization, kind="local", params=(
+        OperationParam("limit", "limit", float, 0.03, 0.01, 0.20, 0.005),
+    )),
+    Operation("Region Leveling", "Preprocessing", perform_region_leveling, kind="global", interactive=True),
+    Operation("Three Point Leveling", "Preprocessing", perform_three_point_leveling, kind="global", interactive=True),
+    Operation("Gaussian Sharpening", "Preprocessing", perform_gaussian_sharpening, kind="separable", params=(
+        OperationParam("radius", "Radius", float, 1.0, 0.1, 10.0, 0.05),
+        OperationParam("amount", "Amount", float, 1.0, 0.1, 10.0, 0.05)
+    )),
+    Operation("Propagation", "Preprocessing", perform_propagation, kind="global", params=(
+        OperationParam("type", "Type", str, "dilation", choices=[("Dilation", "dilation"), ("Erosion", "erosion")]),
+        OperationParam("marker_value", "Marker value", float, 0.3, 0.05, 0.95, 0.05)
+    )),
+    Operation("Polynomial Leveling", "Preprocessing", perform_polynomial_leveling, kind="global", params=(
+        OperationParam("order", "Order", int, 3, 2, 20, 1),
+    )),
+    Operation("Adaptive Leveling", "Preprocessing", perform_adaptive_leveling, kind="local", params=(
+        OperationParam("disk_size", "Disk size", int, 5, 2, 50, 1),
+    )),
+    Operation("Local Median Filter", "Preprocessing", perform_local_median_filter, kind="local", params=(
+        OperationParam("size", "Size", int, 5, 2, 20, 1),
+    )),
+    Operation("White Top Hat", "Preprocessing", perform_white_top_hat, kind="local", params=_selem_params()),
+    Operation("Black Top Hat", "Preprocessing", perform_black_top_hat, kind="local", params=_selem_params())
+):
+    register_operation(operation)
+
+# Thresholding: greyscale in, binary out
+for operation in (
+    Operation("Otsu Threshold", "Thresholding", perform_otsu_threshold, kind="global", output_dtype=bool),
+    Operation("Local Threshold", "Thresholding", perform_local_threshold, kind="local", output_dtype=bool, params=(
+        OperationParam("method", "Method", str, "gaussian", choices=[("Gaussian", "gaussian"), ("Mean", "mean"), ("Median", "median")]),
+        OperationParam("block_size", "Block Size", int, 3, 3, 21, 2, odd=True),
+        OperationParam("offset", "Offset", float, 10, 1, 30, 1)
+    )),
+    Operation("Niblack Threshold", "Thresholding", perform_niblack_threshold, kind="local", output_dtype=bool, params=(
+        OperationParam("window_size", "Window size", int, 5, 3, 51, 2, odd=True),
+        OperationParam("k", "k", float, 0.8, -5.0, 5.0, 0.05)
+    )),
+    Operation("Sauvola Threshold", "Thresholding", perform_sauvola_threshold, kind="local", output_dtype=bool, params=(
+        OperationParam("window_size", "Window size", int, 5, 3, 51, 2, odd=True),
+        OperationParam("k", "k", float, 0.8, -5.0, 5.0, 0.05),
+        OperationParam("r", "r", float, 128, 32, 512, 32)
+    )),
+    Operation("Yen Threshold", "Thresholding", perform_yen_threshold, kind="global", output_dtype=bool),
+    Operation("ISODATA Threshold", "Thresholding", perform_isodata_threshold, kind="global", output_dtype=bool),
+    # Float images are quantized with their own range first, so only 8-bit stacks are batched
+    Operation("Binary Threshold", "Thresholding", perform_binary_threshold, kind="pointwise", output_dtype=np.uint8,
+              batched=perform_binary_threshold_batch, batched_dtypes=(np.uint8,), params=(
+        OperationParam("threshold", "Threshold", int, 127, 1, 254, 1),
+    ))
+):
+    register_operation(operation)
+
+# Binary processing: binary in, binary out
+for operation in (
+    Operation("Binary Erosion", "Binary Process", perform_binary_erosion, kind="local", input_dtypes=BINARY_DTYPES, output_dtype=bool, params=_footprint_params()),
+    Operation("Binary Dilation", "Binary Process", perform_binary_dilation, kind="local", input_dtypes=BINARY_DTYPES, output_dtype=bool, params=_footprint_params()),
+    Operation("Binary Opening", "Binary Process", perform_binary_opening, kind="local", input_dtypes=BINARY_DTYPES, output_dtype=bool, params=_footprint_params()),
+    Operation("Binary Closing", "Binary Process", perform_binary_closing, kind="local", input_dtypes=BINARY_DTYPES, output_dtype=bool, params=_footprint_params()),
+    Operation("Remove Small Holes", "Binary Process", perform_removing_small_holes, kind="global", input_dtypes=BINARY_DTYPES, output_dtype=bool, params=(
+        OperationParam("area_threshold", "Area threshold", int, 64, 1, 256, 1),
+        OperationParam("connectivity", "Connectivity", int, 1, 1, 256, 1)
+    )),
+    Operation("Remove Small Objects", "Binary Process", perform_removing_small_objects, kind="global", input_dtypes=BINARY_DTYPES, output_dtype=bool, params=(
+        OperationParam("min_size", "Min size", int, 64, 1, 256, 1),
+        OperationParam("connectivity", "Connectivity", int, 1, 1, 256, 1)
+    )),
+    Operation("Manual Erase", "Binary Process", perform_manual_white_remove, kind="global", input_dtypes=BINARY_DTYPES,
+              process_name="Manual Edit", interactive=True)
+):
+    register_operation(operation)
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Export of the labeled overlay images.
+
+This module saves the black and white label overlays of analyzed frames as losslessly compressed
+PNG or TIFF files, or as one multi-page TIFF stack per variant. Rendering and encoding run on a pool
+of threads; the overlay renderer, OpenCV and the Pillow encoders release the GIL while they work, so
+the frames are processed in parallel. The pages of a stack are appended to its file by one writer
+thread per variant as soon as they are rendered, so the stack is never held in memory.
+
+Overlay formats:
+- 'png': One PNG file per frame and variant.
+- 'tiff': One Deflate-compressed TIFF file per frame and variant.
+- 'tiff_stack': One multi-page TIFF file per variant, with the frames as pages.
+- 'bmp': One uncompressed BMP file per frame and variant.
+- 'none': Overlays are not saved.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, TiffImagePlugin
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+OVERLAY_FORMATS = ("png", "tiff", "tiff_stack", "bmp", "none")
+
+# Folder and file name suffix of each overlay variant
+OVERLAY_VARIANTS = {
+    "black": ("labeled_overlays", "overlays"),
+    "white": ("labeled_overlays_white", "overlays_white")
+}
+
+# File extension and lossless encoder options of each format
+OVERLAY_FILE_FORMATS = {
+    "png": ("png", {"compress_level": 1}),
+    "tiff": ("tif", {"compression": "tiff_adobe_deflate"}),
+    "tiff_stack": ("tif", {"compression": "tiff_adobe_deflate"}),
+    "bmp": ("bmp", {})
+}
+
+def to_pil_image(image):
+    """
+    Convert an image to a PIL Image suitable for saving.
+
+    Args:
+        image (numpy.ndarray or PIL.Image.Image): A numpy array (grayscale or RGB/RGBA) or a PIL Image.
+
+    Returns:
+        PIL.Image.Image: The image.
+
+    Raises:
+        TypeError: If the image type is not supported.
+        ValueError: If the image is None or if the image shape is unsupported.
+    """
+    if image is None:
+        raise ValueError("Image is None.")
+
+    if isinstance(image, Image.Image):
+        return image
+    if not isinstance(image, np.ndarray):
+        raise TypeError(f"Unsupported image type: {type(image)}")
+
+    # Convert dtype to uint8 if necessary
+    if image.dtype == np.int64:
+        image = np.clip(image, 0, 255).astype(np.uint8)
+    elif image.dtype == np.float32 or image.dtype == np.float64:
+        # Float values are expected in the range [0, 1]
+        image = (255 * np.clip(image, 0, 1)).astype(np.uint8)
+    elif image.dtype != np.uint8:
+        raise TypeError(f"Unsupported dtype: {image.dtype}")
+
+    if image.ndim == 2:  # Grayscale image
+        return Image.fromarray(image, mode='L')
+    if image.ndim == 3 and image.shape[2] in [3, 4]:  # RGB or RGBA image
+        return Image.fromarray(image, mode='RGB' if image.shape[2] == 3 else 'RGBA')
+    raise ValueError(f"Unsupported image shape: {image.shape}")
+
+def get_overlay_path(folder_path, variant, name, overlay_format):
+    """
+    Get the path of the overlay file of a frame.
+
+    Args:
+        folder_path (str): The export folder.
+        variant (str): The overlay variant, a key of OVERLAY_VARIANTS.
+        name (str): Name of the frame; None for the stack of all frames.
+        overlay_format (str): The overlay format.
+
+    Returns:
+        str: Path of the file.
+    """
+    folder, suffix = OVERLAY_VARIANTS[variant]
+    extension = OVERLAY_FILE_FORMATS[overlay_format][0]
+    if name is None:
+        return os.path.join(folder_path, f"{folder}.{extension}")
+    return os.path.join(folder_path, folder, f"{name}_{suffix}.{extension}")
+
+def save_frame_overlays(item, folder_path, overlay_format):
+    """
+    Render the overlays of a frame and save them, or convert them for a stack.
+
+    Args:
+        item (FileDataModel): The analyzed frame.
+        folder_path (str): The export folder.
+        overlay_format (str): The overlay format, one of OVERLAY_FORMATS except 'none'.
+
+    Returns:
+        dict: For 'tiff_stack', the PIL Image of each variant; for the other formats, an empty dictionary.
+
+    Raises:
+        ValueError: If the frame has not been analyzed.
+    """
+    # Rendered without caching them on the item, which is shared with the UI thread
+    overlays = item.get_overlay_images()
+    if overlays is None:
+        raise ValueError("The frame has not been analyzed.")
+    images = {}
+    for variant in OVERLAY_VARIANTS:
+        image = to_pil_image(overlays[variant])
+        if overlay_format == "tiff_stack":
+            images[variant] = image
+        else:
+            image.save(get_overlay_path(folder_path, variant, item.data_name, overlay_format), **OVERLAY_FILE_FORMATS[overlay_format][1])
+    return images
+
+class TiffStackWriter:
+    """
+    Appends the pages of a multi-page TIFF file on a background thread, in the order they were added.
+
+    At most `window` pages wait to be written at a time; add blocks until a slot is free.
+
+    Attributes:
+        path (str): Path of the TIFF file.
+        variant (str): The overlay variant written, a key of OVERLAY_VARIANTS.
+        failed (list): Tuples (frame name, error message) of the pages that were not written.
+    """
+    def __init__(self, path, variant, window, options=None):
+        """
+        Start the writer thread.
+
+        Args:
+            path (str): Path of the TIFF file.
+            variant (str): The overlay variant written, a key of OVERLAY_VARIANTS.
+            window (int): Maximum number of pages waiting to be written.
+            options (dict, optional): Options of the Pillow TIFF encoder.
+        """
+        self.path = path
+        self.variant = variant
+        self.failed = []
+        self._options = options or {}
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(window)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, name, future):
+        """
+        Queue the page of a frame.
+
+        Args:
+            name (str): Name of the frame.
+            future (concurrent.futures.Future): Future of save_frame_overlays for the frame.
+        """
+        self._slots.acquire()
+        self._queue.put((name, future))
+
+    def close(self):
+        """
+        Write the queued pages and close the file.
+
+        Returns:
+            list: Tuples (frame name, error message) of the pages that were not written.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        return self.failed
+
+    def _run(self):
+        file = tiff = None
+        open_error = None
+        pages = 0
+        try:
+            file = open(self.path, "w+b")
+            tiff = TiffImagePlugin.AppendingTiffWriter(file)
+        except Exception as e:
+            logger.error(f"Failed to create '{self.path}': {e}")
+            open_error = e
+
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            name, future = entry
+            try:
+                image = future.result()[self.variant]
+                if open_error is not None:
+                    raise open_error
+                image.save(tiff, format="TIFF", **self._options)
+                tiff.newFrame()
+                pages += 1
+            except Exception as e:
+                self.failed.append((name, str(e)))
+            finally:
+                # Drop the page before taking the next one
+                entry = future = image = None
+                self._slots.release()
+
+        if tiff is not None:
+            tiff.close()
+        if file is not None:
+            file.close()
+            if not pages:
+                os.remove(self.path)
+
+class OverlayExporter:
+    """
+    Saves the overlays of frames on a thread pool while the caller goes on with other work.
+
+    Frames are submitted with add_frame; close waits for them. The pages of a stack are written while
+    the frames are submitted, in the order they were added.
+    """
+    def __init__(self, folder_path, overlay_format="png", max_workers=None):
+        """
+        Create the output folders and start the thread pool.
+
+        Args:
+            folder_path (str): The export folder.
+            overlay_format (str): The overlay format, one of OVERLAY_FORMATS.
+            max_workers (int, optional): Number of threads; None uses all cores.
+
+        Raises:
+            ValueError: If the overlay format is unknown.
+        """
+        if overlay_format not in OVERLAY_FORMATS:
+            raise ValueError(f"Unknown overlay format '{overlay_format}', expected one of {OVERLAY_FORMATS}.")
+        self.folder_path = folder_path
+        self.overlay_format = overlay_format
+        self.failed = []
+        self._futures = []
+        self._executor = None
+        self._stack_writers = {}
+
+        if overlay_format != "none":
+            workers = max_workers or os.cpu_count() or 1
+            if overlay_format == "tiff_stack":
+                for variant in OVERLAY_VARIANTS:
+                    path = get_overlay_path(folder_path, variant, None, overlay_format)
+                    self._stack_writers[variant] = TiffStackWriter(path, variant, 2 * workers, OVERLAY_FILE_FORMATS[overlay_format][1])
+            else:
+                for folder, _ in OVERLAY_VARIANTS.values():
+                    os.makedirs(os.path.join(folder_path, folder), exist_ok=True)
+            self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def add_frame(self, item):
+        """
+        Submit the overlays of a frame for saving.
+
+        Args:
+            item (FileDataModel): The analyzed frame.
+        """
+        if self._executor is None:
+            return
+        future = self._executor.submit(save_frame_overlays, item, self.folder_path, self.overlay_format)
+        if self._stack_writers:
+            for writer in self._stack_writers.values():
+                writer.add(item.data_name, future)
+        else:
+            self._futures.append((item.data_name, future))
+
+    def close(self):
+        """
+        Wait for the submitted frames and write the stacks.
+
+        Returns:
+            list: Tuples (frame name, error message) of the frames whose overlays were not saved.
+        """
+        if self._executor is None:
+            return self.failed
+
+        for name, future in self._futures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Failed to save overlays of {name}: {e}")
+                self.failed.append((name, str(e)))
+        for writer in self._stack_writers.values():
+            # A frame that failed to render is reported by every variant, only once here
+            for name, error in writer.close():
+                if (name, error) not in self.failed:
+                    logger.error(f"Failed to save overlays of {name}: {error}")
+                    self.failed.append((name, error))
+        self._executor.shutdown()
+        self._executor = None
+        self._futures = []
+        self._stack_writers = {}
+        return self.failed
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+"""
+Operation chains for preprocessing and processing images.
+
+An operation chain is a list of operations, each described by the name of an operation of the
+`operation_registry` and a dictionary of its parameters, e.g.:
+
+    {"operations": [
+        {"name": "Gaussian Blur", "params": {"sigmaX": 5, "sigmaY": 5}},
+        {"name": "Otsu Threshold", "params": {}}
+    ]}
+
+This module loads and saves such chains as JSON and applies them to images without any UI,
+either one image at a time or to many images in parallel with `PipelineRunner`. Frames of the
+same size can also be processed as a stack: operations with a batched implementation then filter all
+of them in one call, the others are still applied frame by frame.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import json
+import threading
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from data.model.operation_model import OperationModel
+from data.operation_cache import OperationCache
+import numpy as np
+from PIL import Image
+
+from data.image_conversion import FLOAT_IMAGE_DTYPE, is_float_image
+from data.operation_registry import get_operation, image_dtype
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Number of frames a PipelineRunner worker processes together in the UI and in the batch mode
+DEFAULT_BATCH_SIZE = 8
+
+def get_operation_function(name):
+    """
+    Get the function performing the operation with the given name.
+
+    Args:
+        name (str): The operation name, as used in the operations dropdown.
+
+    Returns:
+        callable: The perform_* function taking (params, img).
+
+    Raises:
+        ValueError: If the operation is unknown.
+    """
+    return get_operation(name).function
+
+def get_default_params(name):
+    """
+    Get a copy of the default parameters of the operation.
+
+    Args:
+        name (str): The operation name.
+
+    Returns:
+        dict: The default parameters, empty if none are defined.
+
+    Raises:
+        ValueError: If the operation is unknown.
+    """
+    return get_operation(name).default_params()
+
+def normalize_operations(operations):
+    """
+    Validate an operation chain, complete missing parameters with their defaults and convert
+    the parameters to their declared types.
+
+    Args:
+        operations (list): List of dictionaries with 'name' and optional 'params' keys.
+
+    Returns:
+        list: List of dictionaries with 'name' and complete 'params'.
+
+    Raises:
+        ValueError: If an entry has no name, names an unknown or an interactive operation
+            or has an invalid parameter.
+    """
+    normalized = []
+    for entry in operations:
+        name = entry.get("name")
+        if not name:
+            raise ValueError(f"Operation without a name: {entry}")
+        operation = get_operation(name)
+        if operation.interactive:
+            raise ValueError(f"Operation '{name}' needs user input and cannot be replayed.")
+        try:
+            params = operation.coerce_params(entry.get("params"))
+        except ValueError as e:
+            raise ValueError(f"Invalid operation '{name}': {e}")
+        normalized.append({"name": name, "params": params})
+    return normalized
+
+def load_pipeline(path):
+    """
+    Load an operation chain from a JSON file.
+
+    Args:
+        path (str): Path to the JSON file; it holds either a list of operations
+            or a dictionary with an 'operations' list.
+
+    Returns:
+        list: The normalized operation chain.
+
+    Raises:
+        ValueError: If the file does not describe a valid operation chain.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        content = json.load(file)
+
+    operations = content.get("operations") if isinstance(content, dict) else content
+    if not isinstance(operations, list):
+        msg = f"load_pipeline: '{path}' does not contain a list of operations."
+        logger.error(msg)
+        raise ValueError(msg)
+    return normalize_operations(operations)
+
+def save_pipeline(path, operations):
+    """
+    Save an operation chain to a JSON file.
+
+    Args:
+        path (str): Path to the JSON file.
+        operations (list): List of dictionaries with 'name' and 'params' keys.
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"operations": normalize_operations(operations)}, file, indent=4)
+
+def apply_operation(name, params, img, cache=True):
+    """
+    Apply a single operation to an image.
+
+    Results are served from the OperationCache when the same operation with the same
+    parameters was already applied to an identical image. Interactive operations are never
+    cached, since their result depends on the user input and not only on the parameters.
+
+    Args:
+        name (str): The operation name.
+        params (dict): Parameters of the operation.
+        img (PIL.Image.Image): The input image.
+        cache (bool): Whether the result is looked up in and stored to the OperationCache.
+
+    Returns:
+        tuple: Process name and the resulting image.
+    """
+    operation = get_operation(name)
+    if not operation.accepts(image_dtype(img)):
+        logger.warning(f"{name} does not expect images of type {image_dtype(img)}.")
+    if not cache or operation.interactive:
+        return operation.function(params, img)
+    return OperationCache().get_or_compute(name, params, img, lambda: operation.function(params, img))
+
+def apply_operation_batch(name, params, images):
+    """
+    Apply a single operation to several images.
+
+    Images of the same size and type are stacked and processed by the batched implementation of
+    the operation, if it has one for their type; the other images are processed one by one.
+    Results are served from the OperationCache like in apply_operation, except for interactive operations.
+
+    Args:
+        name (str): The operation name.
+        params (dict): Parameters of the operation.
+        images (list): The input images.
+
+    Returns:
+        list: Process name and resulting image for each input image.
+    """
+    operation = get_operation(name)
+
+    def compute_many(images):
+        results = [None] * len(images)
+        groups = {}
+        for index, img in enumerate(images):
+            dtype = image_dtype(img)
+            if operation.can_batch(dtype):
+                groups.setdefault((type(img), dtype, np.shape(img)), []).append(index)
+
+        for indices in groups.values():
+            if len(indices) < 2:
+                continue
+            try:
+                stack = operation.batched(params, np.stack([np.asarray(images[index]) for index in indices]))
+            except Exception as e:
+                # Not fatal, the frames are processed one by one below
+                logger.error(f"Error in batched {name}: {e}")
+                continue
+            for index, result_image in zip(indices, stack):
+                results[index] = (operation.process_name, _to_batch_result_image(operation, result_image, images[index]))
+
+        for index, img in enumerate(images):
+            if results[index] is None:
+                results[index] = operation.function(params, img)
+        return results
+
+    if operation.interactive:
+        return compute_many(images)
+    return OperationCache().get_or_compute_many(name, params, images, compute_many)
+
+def _to_batch_result_image(operation, result_image, img):
+    # Same conversion as the perform_* functions: float images stay float unless the type changes
+    if is_float_image(img) and operation.output_dtype is None:
+        return result_image.astype(FLOAT_IMAGE_DTYPE, copy=False)
+    return Image.fromarray(result_image)
+
+def apply_pipeline(img, operations):
+    """
+    Apply an operation chain to an image.
+
+    Args:
+        img (PIL.Image.Image): The input image.
+        operations (list): List of dictionaries with 'name' and 'params' keys.
+
+    Returns:
+        tuple: The final image and a list of (process_name, image) pairs, one per operation.
+    """
+    steps = []
+    for operation in operations:
+        process_name, img = apply_operation(operation["name"], operation["params"], img)
+        steps.append((process_name, img))
+    return img, steps
+
+def run_pipeline(img, operations):
+    """
+    Apply an operation chain to an image and return all intermediate results.
+
+    This is the unit of work executed by the PipelineRunner workers.
+
+    Args:
+        img (PIL.Image.Image): The input image.
+        operations (list): List of dictionaries with 'name' and 'params' keys.
+
+    Returns:
+        list: List of (process_name, image) pairs, one per operation.
+    """
+    _, steps = apply_pipeline(img, operations)
+    return steps
+
+def apply_pipeline_batch(images, operations):
+    """
+    Apply an operation chain to several images, one operation at a time over all of them.
+
+    Args:
+        images (list): The input images.
+        operations (list): List of dictionaries with 'name' and 'params' keys.
+
+    Returns:
+        tuple: The final images and, for each image, a list of (process_name, image) pairs, one per operation.
+    """
+    images = list(images)
+    steps = [[] for _ in images]
+    for operation in operations:
+        results = apply_operation_batch(operation["name"], operation["params"], images)
+        for image_steps, result in zip(steps, results):
+            image_steps.append(result)
+        images = [image for _, image in results]
+    return images, steps
+
+def run_pipeline_batch(images, operations):
+    """
+    Apply an operation chain to several images and return all intermediate results.
+
+    This is the unit of work executed by the PipelineRunner workers when the images are batched.
+
+    Args:
+        images (list): The input images.
+        operations (list): List of dictionaries with 'name' and 'params' keys.
+
+    Returns:
+        list: For each image, a list of (process_name, image) pairs, one per operation.
+    """
+    _, steps = apply_pipeline_batch(images, operations)
+    return steps
+
+def record_pipeline_steps(item, operations, steps):
+    """
+    Store the results of an operation chain in a data model.
+
+    The operations of the item are replaced by the replayed chain and its last image
+    becomes the image for processing and for analysis.
+
+    Args:
+        item (FileDataModel): The data model the chain was applied to.
+        operations (list): List of dictionaries with 'name' and 'params' keys.
+        steps (list): List of (process_name, image) pairs returned by run_pipeline.
+    """
+    item.set_operations([
+        OperationModel(process_name, image, operation["name"], operation["params"])
+        for operation, (process_name, image) in zip(operations, steps)
+    ])
+    item.currently_processing_image = None
+    if steps:
+        item.image_for_processing = steps[-1][1]
+        item.image_for_analisys = steps[-1][1]
+
+class PipelineRunner:
+    """
+    Applies an operation chain to many images in parallel, streaming the results back in input order.
+
+    Attributes:
+        max_workers (int): Number of workers; None uses all cores.
+        use_processes (bool): If True a process pool is used, otherwise a thread pool.
+        batch_size (int): Number of images a worker processes together with run_pipeline_batch;
+                          1 applies the chain to every image on its own.
+    """
+    def __init__(self, max_workers=None, use_processes=True, batch_size=1):
+        """
+        Initialize the runner.
+
+        Args:
+            max_workers (int, optional): Number of workers; None uses all cores.
+            use_processes (bool): If True a process pool is used, otherwise a thread pool.
+            batch_size (int): Number of images a worker processes together.
+        """
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.batch_size = max(1, int(batch_size))
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """
+        Request cancellation; images not yet started are skipped.
+        """
+        self._cancel_event.set()
+
+    def run(self, images, operations, on_result, on_progress=None, on_error=None, total=None):
+        """
+        Apply the chain to the images, calling on_result for each image in input order.
+
+        Images are pulled from the iterable only when a worker slot frees up, so lazily
+        decoded frames are not all held in memory at once. With a batch size above 1 each worker
+        gets a chunk of consecutive images; if a chunk fails, on_error is called for each of its images.
+
+        Args:
+            images (iterable): The input images.
+            operations (list): List of dictionaries with 'name' and 'params' keys.
+            on_result (callable): Called with (index, steps) for each image, steps as returned by run_pipeline.
+            on_progress (callable, optional): Called with (done, total) after each image.
+            on_error (callable, optional): Called with (index, exception) for images that failed.
+            total (int, optional): Number of images, reported to on_progress when images is a generator.
+
+        Returns:
+            int: Number of images processed (successfully or not) before completion or cancellation.
+        """
+        if hasattr(images, "__len__"):
+            total = len(images)
+        done = 0
+
+        executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        workers = self.max_workers or os.cpu_count() or 1
+        executor = executor_class(max_workers=workers)
+        window = 2 * workers
+        pending = deque()
+        remaining = enumerate(images)
+
+        def submit_next():
+            chunk = list(islice(remaining, self.batch_size))
+            if not chunk:
+                return False
+            indices = [index for index, _ in chunk]
+            if self.batch_size == 1:
+                future = executor.submit(run_pipeline, chunk[0][1], operations)
+            else:
+                future = executor.submit(run_pipeline_batch, [img for _, img in chunk], operations)
+            pending.append((indices, future))
+            return True
+
+        try:
+            while len(pending) < window and submit_next():
+                pass
+
+            while pending and not self.cancelled:
+                indices, future = pending.popleft()
+                try:
+                    results = future.result()
+                    if self.batch_size == 1:
+                        results = [results]
+                except Exception as e:
+                    results = [e] * len(indices)
+
+                for index, steps in zip(indices, results):
+                    try:
+                        if isinstance(steps, Exception):
+                            raise steps
+                        on_result(index, steps)
+                    except Exception as e:
+                        logger.error(f"Error applying operations to image {index}: {e}")
+                        if on_error:
+                            on_error(index, e)
+
+                    done += 1
+                    if on_progress:
+                        on_progress(done, total)
+
+                if not self.cancelled:
+                    submit_next()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        return done
@@ -18,6 +18,8 @@ from sklearn.preprocessing import PolynomialFeatures
 from sklearn.linear_model import LinearRegression
 from skimage.morphology import disk, opening
 
+from data.image_conversion import to_display_image
+
 import logging
 
 logger = logging.getLogger(__name__)
@@ -82,12 +84,13 @@ def fit_plane(image, region=None):
         logger.error(f"Error in fit_plane: {e}")
         raise
 
-def RegionLeveling(img):
+def RegionLeveling(img, normalize=True):
     """
     Perform image leveling by fitting and subtracting a plane from a selected region.
 
     Parameters:
     - img: 2D numpy array representing the image.
+    - normalize: Whether to normalize the result to 8 bits; if False the float result is returned.
 
     Returns:
     - leveled_image_normalized: 2D numpy array representing the leveled image.
@@ -96,8 +99,9 @@ def RegionLeveling(img):
         image = np.array(img)
 
         # Display the original image for ROI selection
-        cv2.imshow("Select ROI", image)
-        roi = cv2.selectROI("Select ROI", image, fromCenter=False, showCrosshair=True)
+        image_display = np.array(to_display_image(image))
+        cv2.imshow("Select ROI", image_display)
+        roi = cv2.selectROI("Select ROI", image_display, fromCenter=False, showCrosshair=True)
         cv2.destroyAllWindows()
 
         # Check if ROI is selected, if not use the whole image
@@ -111,6 +115,8 @@ def RegionLeveling(img):
 
         # Subtract the fitted plane from the original image
         leveled_image = image - fitted_plane
+        if not normalize:
+            return leveled_image
         leveled_image_normalized = cv2.normalize(leveled_image, None, 0, 255, cv2.NORM_MINMAX)
         leveled_image_normalized = leveled_image_normalized.astype(np.uint8)
 
@@ -120,12 +126,13 @@ def RegionLeveling(img):
         logger.error(f"Error in RegionLeveling: {e}")
         raise
 
-def ThreePointLeveling(img):
+def ThreePointLeveling(img, normalize=True):
     """
     Perform image leveling by fitting and subtracting a plane defined by three user-selected points.
 
     Parameters:
     - img: 2D numpy array representing the image.
+    - normalize: Whether to normalize the result to 8 bits; if False the float result is returned.
 
     Returns:
     - leveled_image_normalized: 2D numpy array representing the leveled image.
@@ -142,7 +149,7 @@ def ThreePointLeveling(img):
                 if len(points) == 3:
                     cv2.destroyAllWindows()
 
-        image_display = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        image_display = cv2.cvtColor(np.array(to_display_image(image)), cv2.COLOR_GRAY2BGR)
 
         # Display the image and set up the callback for capturing points
         points = []
@@ -179,6 +186,9 @@ def ThreePointLeveling(img):
         # Subtract the fitted plane from the original image
         leveled_image = image - fitted_plane
 
+        if not normalize:
+            return leveled_image
+
         leveled_image_normalized = cv2.normalize(leveled_image, None, 0, 255, cv2.NORM_MINMAX)
         leveled_image_normalized = leveled_image_normalized.astype(np.uint8)
 
@@ -240,13 +250,14 @@ def level_image_polynomial(image, order):
         logger.error(f"Error in level_image_polynomial: {e}")
         raise
 
-def PolynomialLeveling(img, order):
+def PolynomialLeveling(img, order, normalize=True):
     """
     Perform image leveling by fitting and subtracting a polynomial surface.
 
     Parameters:
     - img: 2D numpy array representing the image.
     - order: Integer specifying the order of the polynomial.
+    - normalize: Whether to normalize the result to 8 bits; if False the float result is returned.
 
     Returns:
     - leveled_image_normalized: 2D numpy array representing the leveled image.
@@ -257,6 +268,9 @@ def PolynomialLeveling(img, order):
         # Level the image using polynomial fitting
         leveled_image = level_image_polynomial(image, order=order)
 
+        if not normalize:
+            return leveled_image
+
         leveled_image_normalized = cv2.normalize(leveled_image, None, 0, 255, cv2.NORM_MINMAX)
         leveled_image_normalized = leveled_image_normalized.astype(np.uint8)
 
@@ -266,13 +280,14 @@ def PolynomialLeveling(img, order):
         logger.error(f"Error in PolynomialLeveling: {e}")
         raise
 
-def AdaptiveLeveling(img, disk_size=50):
+def AdaptiveLeveling(img, disk_size=50, normalize=True):
     """
     Perform adaptive leveling using morphological opening.
 
     Parameters:
     - img: 2D numpy array representing the image.
     - disk_size: Integer specifying the size of the morphological structuring element.
+    - normalize: Whether to normalize the result to 8 bits; if False the float result is returned.
 
     Returns:
     - leveled_image_normalized: 2D numpy array representing the leveled image.
@@ -281,6 +296,8 @@ def AdaptiveLeveling(img, disk_size=50):
         selem = disk(disk_size)
         background = opening(img, selem)
         leveled_image = img - background
+        if not normalize:
+            return leveled_image
         leveled_image_normalized = cv2.normalize(leveled_image, None, 0, 255, cv2.NORM_MINMAX)
         leveled_image_normalized = leveled_image_normalized.astype(np.uint8)
         return leveled_image_normalized
@@ -243,7 +243,7 @@ def Propagation(img, type, marker_value):
         logger.error(f"Error in Propagation: {e}")
         raise
 
-def WhiteTopHatTransformation(img, selem_type, selem_size):
+def WhiteTopHatTransformation(img, selem_type, selem_size, normalize=True):
     """
     Perform white top-hat transformation on an image.
 
@@ -251,6 +251,7 @@ def WhiteTopHatTransformation(img, selem_type, selem_size):
     - img: Input image as a numpy array.
     - selem_type: Type of structuring element ("disk", "square", "diamond", "star").
     - selem_size: Size of the structuring element.
+    - normalize: Whether to normalize the result to 8 bits; if False the float result is returned.
 
     Returns:
     - leveled_image_normalized: Image after white top-hat transformation, normalized to 8-bit.
@@ -262,6 +263,9 @@ def WhiteTopHatTransformation(img, selem_type, selem_size):
         # Apply top-hat transformation
         tophat_image = white_tophat(image, selem)
 
+        if not normalize:
+            return tophat_image
+
         leveled_image_normalized = cv2.normalize(tophat_image, None, 0, 255, cv2.NORM_MINMAX)
         leveled_image_normalized = leveled_image_normalized.astype(np.uint8)
 
@@ -271,7 +275,7 @@ def WhiteTopHatTransformation(img, selem_type, selem_size):
         logger.error(f"Error in WhiteTopHatTransformation: {e}")
         raise
 
-def BlackTopHatTransformation(img, selem_type, selem_size):
+def BlackTopHatTransformation(img, selem_type, selem_size, normalize=True):
     """
     Perform black top-hat transformation on an image.
 
@@ -279,6 +283,7 @@ def BlackTopHatTransformation(img, selem_type, selem_size):
     - img: Input image as a numpy array.
     - selem_type: Type of structuring element ("disk", "square", "diamond", "star").
     - selem_size: Size of the structuring element.
+    - normalize: Whether to normalize the result to 8 bits; if False the float result is returned.
 
     Returns:
     - leveled_image_normalized: Image after black top-hat transformation, normalized to 8-bit.
@@ -290,6 +295,9 @@ def BlackTopHatTransformation(img, selem_type, selem_size):
         # Apply top-hat transformation
         tophat_image = black_tophat(image, selem)
 
+        if not normalize:
+            return tophat_image
+
         leveled_image_normalized = cv2.normalize(tophat_image, None, 0, 255, cv2.NORM_MINMAX)
         leveled_image_normalized = leveled_image_normalized.astype(np.uint8)
 
@@ -11,6 +11,7 @@ import os, sys
 sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
 
 import cv2
+import numpy as np
 
 import logging
 
@@ -25,8 +26,8 @@ def NlMeansDenois(img, h=3, searchWinwowSize=21, templateWindowSize=7):
     Apply Non-Local Means Denoising to the input image.
 
     Args:
-        img (numpy.ndarray): Input image.
-        h (float, optional): Parameter regulating filter strength. Higher h value removes noise better, but removes details of image also. Defaults to 3.
+        img (numpy.ndarray): Input image, 8-bit or 16-bit.
+        h (float, optional): Parameter regulating filter strength, in 8-bit intensity units. Higher h value removes noise better, but removes details of image also. Defaults to 3.
         searchWinwowSize (int, optional): Size in pixels of the window to be used for searching matches. Larger value implies that farther pixels will influence each other. Defaults to 21.
         templateWindowSize (int, optional): Size in pixels of the window to be used for gathering pixel values. Defaults to 7.
 
@@ -34,6 +35,16 @@ def NlMeansDenois(img, h=3, searchWinwowSize=21, templateWindowSize=7):
         numpy.ndarray: Denoised image.
     """
     try:
+        if img.dtype == np.uint16:
+            # 16-bit images are only supported with the L1 norm; h is scaled to the 16-bit range
+            denoised_image = cv2.fastNlMeansDenoising(
+                img,
+                h=[h * 257],
+                searchWindowSize=searchWinwowSize,
+                templateWindowSize=templateWindowSize,
+                normType=cv2.NORM_L1
+            )
+            return denoised_image
         denoised_image = cv2.fastNlMeansDenoising(
             img, None,
             h=h,
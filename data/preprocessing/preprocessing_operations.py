@@ -6,6 +6,10 @@ This module provides functions to apply various preprocessing techniques to imag
 such as Gaussian blur, denoising, morphological operations, intensity adjustments, 
 and more.
 
+Every function accepts a PIL image or a float32 array. A float32 array is processed in the float
+precision pipeline mode: the result is again a float32 array, never quantized to 8 bits, and the
+input is used without copying it (see data.image_conversion).
+
 @author
 Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
 """
@@ -25,6 +29,13 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG,  # Set to DEBUG level for detailed logging
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+from data.image_conversion import (
+    FLOAT_IMAGE_DTYPE,
+    is_float_image,
+    to_unit_range,
+    from_unit_range
+)
+
 from data.preprocessing.smoothing import (
     GaussianBlur,
     GaussianFilter,
@@ -67,6 +78,33 @@ from data.preprocessing.leveling import (
     AdaptiveLeveling
 )
 
+def to_array(img):
+    """
+    Get the pixels of an input image as an array.
+
+    Args:
+        img (PIL.Image.Image or numpy.ndarray): The input image.
+
+    Returns:
+        numpy.ndarray: The array; an array input is returned as is.
+    """
+    return img if isinstance(img, np.ndarray) else np.array(img)
+
+def to_result_image(result_image, img):
+    """
+    Convert the result of an operation to the type of its input image.
+
+    Args:
+        result_image (numpy.ndarray): The result.
+        img (PIL.Image.Image or numpy.ndarray): The input image.
+
+    Returns:
+        numpy.ndarray or PIL.Image.Image: A float32 array for a float input, otherwise a PIL image.
+    """
+    if is_float_image(img):
+        return result_image.astype(FLOAT_IMAGE_DTYPE, copy=False)
+    return Image.fromarray(result_image)
+
 def perform_gaussian_blur(params, img):
     """
     Apply Gaussian blur to an image.
@@ -81,12 +119,12 @@ def perform_gaussian_blur(params, img):
     try:
         process_name = "GaussianBlur"
         result_image = GaussianBlur(
-                img=np.array(img), 
+                img=to_array(img), 
                 sigmaX=params['sigmaX'],
                 sigmaY=params['sigmaY']
                 )
         
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -105,13 +143,23 @@ def perform_non_local_denoising(params, img):
     """
     try:
         process_name = "Non-local Mean Denoising"
+        if is_float_image(img):
+            # The denoising is only defined for integer images; 16 bits keep the precision
+            unit_image, low, high = to_unit_range(img)
+            result_image = NlMeansDenois(
+                    img=np.round(unit_image * 65535).astype(np.uint16),
+                    h=params['h'],
+                    searchWinwowSize=params['searchWindowSize'],
+                    templateWindowSize=params['templateWindowSize']
+                    )
+            return process_name, from_unit_range(result_image / 65535, low, high)
         result_image = NlMeansDenois(
-                img=np.array(img),
+                img=to_array(img),
                 h=params['h'],
                 searchWinwowSize=params['searchWindowSize'],
                 templateWindowSize=params['templateWindowSize']
                 )
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -131,11 +179,11 @@ def perform_gaussian_filter(params, img):
     try:
         process_name = "GaussianFilter"
         result_image = GaussianFilter(
-                img=np.array(img),
+                img=to_array(img),
                 sigma=params['sigma']
             )
         
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -155,13 +203,13 @@ def perform_erosion(params, img):
     try:
         process_name = "Erosion"
         result_image = Erosion(
-                img=np.array(img),
+                img=to_array(img),
                 kernel_type=params['kernel_type'],
                 kernel_size=params['kernel_size'],
                 iterations=params['iterations']
             )
         
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -181,12 +229,12 @@ def perform_binary_greyscale_erosion(params, img):
     try:
         process_name = "Binary Greyscale Erosion"
         result_image = BinaryGreyscaleErosion(
-            img=np.array(img),
+            img=to_array(img),
             kernel_type=params['kernel_type'],
             kernel_size=params['kernel_size']
         )
 
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -206,12 +254,12 @@ def perform_gaussian_greyscale_erosion(params, img):
     try:
         process_name = "Gaussian Greyscale Erosion"
         result_image = GaussianGreyscaleErosion(
-            img=np.array(img),
+            img=to_array(img),
             mask_size=params['mask_size'],
             sigma=params['sigma']
         )
 
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -231,12 +279,12 @@ def perform_binary_greyscale_dilation(params, img):
     try:
         process_name = "Binary Greyscale Dilation"
         result_image = BinaryGreyscaleDilation(
-            img=np.array(img),
+            img=to_array(img),
             kernel_type=params['kernel_type'],
             kernel_size=params['kernel_size']
         )
 
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -256,12 +304,12 @@ def perform_gaussian_greyscale_dilation(params, img):
     try:
         process_name = "Gaussian Greyscale Dilation"
         result_image = GaussianGreyscaleDilation(
-            img=np.array(img),
+            img=to_array(img),
             mask_size=params['mask_size'],
             sigma=params['sigma']
         )
 
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -281,12 +329,12 @@ def perform_binary_greyscale_opening(params, img):
     try:
         process_name = "Binary Greyscale Opening"
         result_image = BinaryGreyscaleOpening(
-            img=np.array(img),
+            img=to_array(img),
             kernel_type=params['kernel_type'],
             kernel_size=params['kernel_size']
         )
 
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -306,12 +354,12 @@ def perform_gaussian_greyscale_opening(params, img):
     try:
         process_name = "Gaussian Greyscale Opening"
         result_image = GaussianGreyscaleOpening(
-            img=np.array(img),
+            img=to_array(img),
             mask_size=params['mask_size'],
             sigma=params['sigma']
         )
 
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -330,12 +378,12 @@ def perform_binary_greyscale_closing(params, img):
     try:
         process_name = "Binary Greyscale Closing"
         result_image = BinaryGreyscaleClosing(
-            img=np.array(img),
+            img=to_array(img),
             kernel_type=params['kernel_type'],
             kernel_size=params['kernel_size']
         )
 
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -355,12 +403,12 @@ def perform_gaussian_greyscale_closing(params, img):
     try:
         process_name = "Gaussian Greyscale Closing"
         result_image = GaussianGreyscaleClosing(
-            img=np.array(img),
+            img=to_array(img),
             mask_size=params['mask_size'],
             sigma=params['sigma']
         )
 
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -379,12 +427,20 @@ def perform_gamma_adjustment(params, img):
     """
     try:
         process_name = "Gamma Adjustment"
+        if is_float_image(img):
+            # Gamma is defined for intensities in [0, 1]
+            unit_image, low, high = to_unit_range(img)
+            result_image = GammaAdjustment(
+                img=unit_image,
+                gamma=params['gamma']
+            )
+            return process_name, from_unit_range(result_image, low, high)
         result_image = GammaAdjustment(
-            img=np.array(img),
+            img=to_array(img),
             gamma=params['gamma']
         )
 
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -403,12 +459,21 @@ def perform_contrast_stretching(params, img):
     """
     try:
         process_name = "Contrast Stretching"
+        if is_float_image(img):
+            # Float results are in [0, 1]
+            unit_image, low, high = to_unit_range(img)
+            result_image = ContrastStretching(
+                img=unit_image,
+                min=params['min'],
+                max=params['max']
+            )
+            return process_name, from_unit_range(result_image, low, high)
         result_image = ContrastStretching(
-            img=np.array(img),
+            img=to_array(img),
             min=params['min'],
             max=params['max']
         )
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -427,8 +492,16 @@ def perform_adaptive_equalization(params, img):
     """
     try:
         process_name = "Adaptive Equalization"
+        if is_float_image(img):
+            # Float images must be in [0, 1]
+            unit_image, low, high = to_unit_range(img)
+            result_image = AdaptiveEqualization(
+                img=unit_image,
+                limit=params['limit']
+            )
+            return process_name, from_unit_range(result_image, low, high)
         result_image = AdaptiveEqualization(
-            img=np.array(img),
+            img=to_array(img),
             limit=params['limit']
         )
         image_uint8 = (result_image * 255).astype(np.uint8)
@@ -451,8 +524,8 @@ def perform_region_leveling(params, img):
     """
     try:
         process_name = "Region Leveling"
-        result_image = RegionLeveling(img)
-        return process_name, Image.fromarray(result_image)
+        result_image = RegionLeveling(to_array(img), normalize=not is_float_image(img))
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -471,8 +544,8 @@ def perform_three_point_leveling(params, img):
     """
     try:
         process_name = "Three Point Leveling"
-        result_image = ThreePointLeveling(img)
-        return process_name, Image.fromarray(result_image)
+        result_image = ThreePointLeveling(to_array(img), normalize=not is_float_image(img))
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -492,10 +565,13 @@ def perform_gaussian_sharpening(params, img):
     try:
         process_name = "Gaussian Sharpening"
         result_image = GaussianSharpening(
-            img=np.array(img),
+            img=to_array(img),
             radius=params['radius'],
-            amount=params['amount']
+            amount=params['amount'],
+            preserve_range=is_float_image(img)
         )
+        if is_float_image(img):
+            return process_name, to_result_image(result_image, img)
         image_uint8 = (result_image * 255).astype(np.uint8)
         return process_name, Image.fromarray(image_uint8)
     
@@ -516,8 +592,17 @@ def perform_propagation(params, img):
     """
     try:
         process_name = "Propagation"
+        if is_float_image(img):
+            # The marker value is an intensity in [0, 1], as for 8-bit images
+            unit_image, low, high = to_unit_range(img)
+            result_image = Propagation(
+                img=unit_image,
+                type=params['type'],
+                marker_value=params['marker_value']
+            )
+            return process_name, from_unit_range(result_image, low, high)
         result_image = Propagation(
-            img=np.array(img),
+            img=to_array(img),
             type=params['type'],
             marker_value=params['marker_value']
         )
@@ -542,10 +627,11 @@ def perform_polynomial_leveling(params, img):
     try:
         process_name = "Polynomial Leveling"
         result_image = PolynomialLeveling(
-            img=np.array(img),
-            order=params['order']
+            img=to_array(img),
+            order=params['order'],
+            normalize=not is_float_image(img)
         )
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -565,10 +651,11 @@ def perform_adaptive_leveling(params, img):
     try:
         process_name = "Adaptive Leveling"
         result_image = AdaptiveLeveling(
-            img=np.array(img),
-            disk_size=params['disk_size']
+            img=to_array(img),
+            disk_size=params['disk_size'],
+            normalize=not is_float_image(img)
         )
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -588,10 +675,11 @@ def perform_local_median_filter(params, img):
     try:
         process_name = "Local Median Filter"
         result_image = LocalMedianFilter(
-            image=np.array(img),
-            size=params['size']
+            image=to_array(img),
+            size=params['size'],
+            normalize=not is_float_image(img)
         )
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -611,11 +699,12 @@ def perform_white_top_hat(params, img):
     try:
         process_name = "White Top Hat"
         result_image = WhiteTopHatTransformation(
-            img=np.array(img),
+            img=to_array(img),
             selem_type=params['selem_type'],
-            selem_size=params['selem_size']
+            selem_size=params['selem_size'],
+            normalize=not is_float_image(img)
         )
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
@@ -635,12 +724,47 @@ def perform_black_top_hat(params, img):
     try:
         process_name = "Black Top Hat"
         result_image = BlackTopHatTransformation(
-            img=np.array(img),
+            img=to_array(img),
             selem_type=params['selem_type'],
-            selem_size=params['selem_size']
+            selem_size=params['selem_size'],
+            normalize=not is_float_image(img)
         )
-        return process_name, Image.fromarray(result_image)
+        return process_name, to_result_image(result_image, img)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
-        return process_name, img
\ No newline at end of file
+        return process_name, img
+
+def perform_gaussian_filter_batch(params, stack):
+    """
+    Apply a Gaussian filter to a stack of images in one call.
+
+    The frames are filtered independently; the stack is not smoothed along its first axis.
+
+    Args:
+        params (dict): Parameters for the Gaussian filter, should include 'sigma'.
+        stack (numpy.ndarray): The input images, of shape (N, H, W).
+
+    Returns:
+        numpy.ndarray: The filtered images, of the shape and type of the stack.
+    """
+    return GaussianFilter(
+            img=stack,
+            sigma=(0, params['sigma'], params['sigma'])
+        )
+
+def perform_gamma_adjustment_batch(params, stack):
+    """
+    Apply Gamma adjustment to a stack of 8-bit images in one call.
+
+    Args:
+        params (dict): Parameters for the gamma adjustment.
+        stack (numpy.ndarray): The input images, of shape (N, H, W).
+
+    Returns:
+        numpy.ndarray: The adjusted images.
+    """
+    return GammaAdjustment(
+        img=stack,
+        gamma=params['gamma']
+    )
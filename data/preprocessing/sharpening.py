@@ -24,7 +24,7 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG,  # Set to DEBUG level for detailed logging
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-def GaussianSharpening(img, radius=1.0, amount=1.0):
+def GaussianSharpening(img, radius=1.0, amount=1.0, preserve_range=False):
     """
     Apply Gaussian sharpening to an image using unsharp masking.
 
@@ -32,13 +32,14 @@ def GaussianSharpening(img, radius=1.0, amount=1.0):
         img (numpy.ndarray): The input image as a NumPy array.
         radius (float): The radius of the Gaussian blur used in the unsharp mask.
         amount (float): The amount by which the unsharp mask is applied.
+        preserve_range (bool): Whether to keep the range of the input; otherwise the result is in [0, 1].
 
     Returns:
         numpy.ndarray: The sharpened image.
     """
     try:
         # Apply unsharp masking
-        sharpened_image = unsharp_mask(img, radius=radius, amount=amount)
+        sharpened_image = unsharp_mask(img, radius=radius, amount=amount, preserve_range=preserve_range)
 
         return sharpened_image
     
@@ -84,13 +84,15 @@ def GaussianFilter(img, sigma=4):
         raise ValueError(msg)
     
 
-def LocalMedianFilter(image, size=5):
+def LocalMedianFilter(image, size=5, normalize=True):
     """
     Apply a local median filter to smooth the background of the image.
 
     Args:
         image (numpy.ndarray): Input image.
         size (int, optional): Size of the filter. Defaults to 5.
+        normalize (bool, optional): Whether to normalize the result to 8 bits; if False the
+            float result is returned. Defaults to True.
 
     Returns:
         numpy.ndarray: Smoothed and normalized image.
@@ -103,6 +105,9 @@ def LocalMedianFilter(image, size=5):
         """Apply median filter to smooth the background."""
         smoothed_image = median_filter(image, size=size)
 
+        if not normalize:
+            return smoothed_image
+
         leveled_image_normalized = cv2.normalize(smoothed_image, None, 0, 255, cv2.NORM_MINMAX)
         leveled_image_normalized = leveled_image_normalized.astype(np.uint8)
 
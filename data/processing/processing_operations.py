@@ -2,6 +2,9 @@
 """
 Functions for preprocessing
 
+Processing operations work on 8-bit images, so that threshold values keep their meaning; float
+images of the float precision pipeline are quantized first, like for display.
+
 @author
 Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
 """
@@ -13,6 +16,8 @@ sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
 import numpy as np
 from PIL import Image
 
+from data.image_conversion import to_display_image
+
 from data.processing.thresholding import (
     OtsuThreshold,
     LocalThreshold,
@@ -43,6 +48,18 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG,  # Set to DEBUG level for detailed logging
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+def to_array(img):
+    """
+    Get the pixels of an input image as an 8-bit array.
+
+    Args:
+        img (PIL.Image.Image or numpy.ndarray): The input image.
+
+    Returns:
+        numpy.ndarray: The array.
+    """
+    return np.array(to_display_image(img))
+
 def perform_otsu_threshold(params, img):
     """
     Apply Otsu Threshold to an image.
@@ -57,7 +74,7 @@ def perform_otsu_threshold(params, img):
     try:
         process_name = "Otsu Threshold"
         result_image = OtsuThreshold(
-                img=np.array(img)
+                img=to_array(img)
         )
         
         return process_name, Image.fromarray(result_image)
@@ -80,7 +97,7 @@ def perform_local_threshold(params, img):
     try:
         process_name = "Local Threshold"
         result_image = LocalThreshold(
-            img=np.array(img),
+            img=to_array(img),
             method=params['method'],
             block_size=params['block_size'],
             offset=params['offset']
@@ -105,7 +122,7 @@ def perform_niblack_threshold(params, img):
     try:
         process_name = "Niblack Threshold"
         result_image = NiblackThreshold(
-            img=np.array(img),
+            img=to_array(img),
             window_size=params['window_size'],
             k=params['k']
         )
@@ -129,7 +146,7 @@ def perform_sauvola_threshold(params, img):
     try:
         process_name = "Sauvola Threshold"
         result_image = SauvolaThreshold(
-            img=np.array(img),
+            img=to_array(img),
             window_size=params['window_size'],
             k=params['k'],
             r=params['r']
@@ -154,7 +171,7 @@ def perform_yen_threshold(params, img):
     try:
         process_name = "Yen Threshold"
         result_image = YenThreshold(
-            img=np.array(img)
+            img=to_array(img)
         )
         return process_name, Image.fromarray(result_image)
     
@@ -176,7 +193,7 @@ def perform_isodata_threshold(params, img):
     try:
         process_name = "ISODATA Threshold"
         result_image = IsodataThreshold(
-            img=np.array(img)
+            img=to_array(img)
         )
         return process_name, Image.fromarray(result_image)
     
@@ -198,7 +215,7 @@ def perform_binary_erosion(params, img):
     try:
         process_name = "Binary Erosion"
         result_image = BinaryErosion(
-            img=np.array(img),
+            img=to_array(img),
             footprint_type=params['footprint_type'],
             footprint_size=params['footprint_size']
         )
@@ -222,7 +239,7 @@ def perform_binary_dilation(params, img):
     try:
         process_name = "Binary Dilation"
         result_image = BinaryDilation(
-            img=np.array(img),
+            img=to_array(img),
             footprint_type=params['footprint_type'],
             footprint_size=params['footprint_size']
         )
@@ -246,7 +263,7 @@ def perform_binary_opening(params, img):
     try:
         process_name = "Binary Opening"
         result_image = BinaryOpening(
-            img=np.array(img),
+            img=to_array(img),
             footprint_type=params['footprint_type'],
             footprint_size=params['footprint_size']
         )
@@ -270,7 +287,7 @@ def perform_binary_closing(params, img):
     try:
         process_name = "Binary Closing"
         result_image = BinaryClosing(
-            img=np.array(img),
+            img=to_array(img),
             footprint_type=params['footprint_type'],
             footprint_size=params['footprint_size']
         )
@@ -294,7 +311,7 @@ def perform_removing_small_holes(params, img):
     try:
         process_name = "Remove Small Holes"
         result_image = RemoveSmallHoles(
-            img=np.array(img),
+            img=to_array(img),
             area_threshold=params['area_threshold'],
             connectivity=params['connectivity']
         )
@@ -318,7 +335,7 @@ def perform_removing_small_objects(params, img):
     try:
         process_name = "Remove Small Objects"
         result_image = RemoveSmallObjects(
-            img=np.array(img),
+            img=to_array(img),
             min_size=params['min_size'],
             connectivity=params['connectivity']
         )
@@ -341,7 +358,7 @@ def perform_manual_white_remove(params, img):
     """
     try:
         process_name = "Manual Edit"
-        result_image = ImageEditRemoveWhite(np.array(img))
+        result_image = ImageEditRemoveWhite(to_array(img))
         return process_name, Image.fromarray(result_image)
     
     except Exception as e:
@@ -362,11 +379,29 @@ def perform_binary_threshold(params, img):
     try:
         process_name = "Binary Threshold"
         result_image = BinaryThreshold(
-            img=np.array(img),
+            img=to_array(img),
             threshold=params['threshold']
         )
         return process_name, Image.fromarray(result_image)
     
     except Exception as e:
         logger.error(f"Error in {process_name}: {e}")
-        return process_name, img
\ No newline at end of file
+        return process_name, img
+
+def perform_binary_threshold_batch(params, stack):
+    """
+    Apply binary threshold to a stack of 8-bit images in one call.
+
+    Args:
+        params (dict): Parameters for binary threshold.
+        stack (numpy.ndarray): The input images, of shape (N, H, W).
+
+    Returns:
+        numpy.ndarray: The thresholded images.
+    """
+    # The threshold is applied to every pixel on its own, so the frames can be processed as one image
+    result_image = BinaryThreshold(
+        img=stack.reshape(-1, stack.shape[-1]),
+        threshold=params['threshold']
+    )
+    return result_image.reshape(stack.shape)
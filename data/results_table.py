@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar model of the measurement results table.
+
+This module defines the `ResultsTableModel` class, which holds the measured data of all frames as
+NumPy columns and maps the rows of a virtualized table view onto them: one header row per frame,
+followed by the spots of the frame if it is expanded. Sorting (within each frame) and filtering work
+on the columns themselves, and only the rows actually displayed are formatted as text.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import numpy as np
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ResultsTableModel:
+    """
+    Measured data of several frames, displayed as frame rows grouping spot rows.
+
+    Display rows are encoded in a single integer array: a negative value -(f + 1) is the header row of
+    frame f, a non-negative value is the index of a spot in the columns.
+    """
+    def __init__(self, frame_names, counts, columns, expanded=True):
+        """
+        Initialize the model.
+
+        Args:
+            frame_names (list): Names of the frames.
+            counts (list): Number of spots of each frame; the columns hold the spots frame by frame.
+            columns (dict): Column name to a 1D array with a value for every spot, in display order.
+            expanded (bool): Whether the frames start expanded.
+        """
+        self._frame_names = list(frame_names)
+        self._counts = np.asarray(counts, dtype=np.int64)
+        self._offsets = np.r_[0, np.cumsum(self._counts)]
+        self._frame_of_spot = np.repeat(np.arange(len(self._counts)), self._counts)
+        self._columns = {name: np.asarray(values) for name, values in columns.items()}
+        self._expanded = np.full(len(self._frame_names), bool(expanded))
+        self._sort_column = None
+        self._sort_descending = False
+        self._filter_mask = np.ones(len(self._frame_of_spot), dtype=bool)
+        self._order = np.arange(len(self._frame_of_spot))
+        self._rows = None
+        self._rebuild()
+
+    @property
+    def column_names(self):
+        return list(self._columns)
+
+    @property
+    def num_rows(self):
+        return len(self._rows)
+
+    @property
+    def sort_column(self):
+        return self._sort_column
+
+    @property
+    def sort_descending(self):
+        return self._sort_descending
+
+    def is_expanded(self, frame_index):
+        return bool(self._expanded[frame_index])
+
+    def toggle_frame(self, frame_index):
+        """
+        Expand a collapsed frame or collapse an expanded one.
+
+        Args:
+            frame_index (int): Index of the frame.
+        """
+        self._expanded[frame_index] = not self._expanded[frame_index]
+        self._rebuild()
+
+    def set_all_expanded(self, expanded):
+        """
+        Expand or collapse all frames.
+
+        Args:
+            expanded (bool): Whether the frames are expanded.
+        """
+        self._expanded[:] = expanded
+        self._rebuild()
+
+    def sort(self, column=None, descending=False):
+        """
+        Sort the spots of every frame by a column; frames keep their order.
+
+        Args:
+            column (str, optional): Name of the column; None restores the original order.
+            descending (bool): Whether to sort in descending order.
+
+        Raises:
+            KeyError: If the column does not exist.
+        """
+        if column is not None and column not in self._columns:
+            raise KeyError(f"Unknown column '{column}'.")
+        self._sort_column = column
+        self._sort_descending = descending
+
+        if column is None:
+            self._order = np.arange(len(self._frame_of_spot))
+        else:
+            values = self._columns[column]
+            if descending and np.issubdtype(values.dtype, np.number):
+                values = -values
+            elif descending:
+                # Text columns cannot be negated; sort on the negated rank instead
+                ranks = np.empty(len(values), dtype=np.int64)
+                ranks[np.argsort(values, kind="stable")] = np.arange(len(values))
+                values = -ranks
+            self._order = np.lexsort((values, self._frame_of_spot))
+        self._rebuild()
+
+    def set_filter(self, column=None, minimum=None, maximum=None):
+        """
+        Show only the spots whose value of a numeric column lies within a range.
+
+        Args:
+            column (str, optional): Name of the column; None removes the filter.
+            minimum (float, optional): Smallest value shown.
+            maximum (float, optional): Largest value shown.
+
+        Raises:
+            KeyError: If the column does not exist.
+        """
+        mask = np.ones(len(self._frame_of_spot), dtype=bool)
+        if column is not None:
+            values = self._columns[column].astype(np.float64)
+            # NaN values fail every comparison, so they are hidden by any bound
+            with np.errstate(invalid="ignore"):
+                if minimum is not None:
+                    mask &= values >= minimum
+                if maximum is not None:
+                    mask &= values <= maximum
+        self._filter_mask = mask
+        self._rebuild()
+
+    def get_row(self, row):
+        """
+        Describe a display row.
+
+        Args:
+            row (int): Index of the display row.
+
+        Returns:
+            tuple: ('frame', frame index) for a header row, or ('spot', frame index, index of the
+                   spot within its frame) for a spot row.
+        """
+        value = int(self._rows[row])
+        if value < 0:
+            return "frame", -value - 1
+        frame_index = int(self._frame_of_spot[value])
+        return "spot", frame_index, value - int(self._offsets[frame_index])
+
+    def find_row(self, frame_index, spot_index=None):
+        """
+        Find the display row of a frame header or a spot.
+
+        Args:
+            frame_index (int): Index of the frame.
+            spot_index (int, optional): Index of the spot within the frame; None for the header row.
+
+        Returns:
+            int: Index of the display row, or None if the row is hidden.
+        """
+        value = -(frame_index + 1) if spot_index is None else int(self._offsets[frame_index]) + spot_index
+        found = np.flatnonzero(self._rows == value)
+        return int(found[0]) if len(found) else None
+
+    def format_row(self, row):
+        """
+        Format a display row as the text of the tree column and the values of the other columns.
+
+        Args:
+            row (int): Index of the display row.
+
+        Returns:
+            tuple: The text and a tuple of column values.
+        """
+        value = int(self._rows[row])
+        if value < 0:
+            frame_index = -value - 1
+            shown = int(np.count_nonzero(self._filter_mask[self._offsets[frame_index]:self._offsets[frame_index + 1]]))
+            marker = "-" if self._expanded[frame_index] else "+"
+            return f"{marker} {self._frame_names[frame_index]} ({shown})", ()
+
+        values = []
+        for column in self._columns.values():
+            cell = column[value]
+            values.append(f"{cell:.3f}" if np.issubdtype(column.dtype, np.floating) else str(cell))
+        return "", tuple(values)
+
+    def _rebuild(self):
+        """
+        Recompute the display rows from the expansion state, the sorted order and the filter.
+        """
+        num_frames = len(self._frame_names)
+        order = self._order
+        order = order[self._filter_mask[order] & self._expanded[self._frame_of_spot[order]]]
+        shown_counts = np.bincount(self._frame_of_spot[order], minlength=num_frames)
+
+        # Every frame header is followed by the shown spots of the frame
+        rows = np.empty(num_frames + len(order), dtype=np.int64)
+        header_positions = np.arange(num_frames) + np.r_[0, np.cumsum(shown_counts)[:-1]] if num_frames else np.zeros(0, dtype=np.int64)
+        is_header = np.zeros(len(rows), dtype=bool)
+        is_header[header_positions] = True
+        rows[header_positions] = -(np.arange(num_frames) + 1)
+        rows[~is_header] = order
+        self._rows = rows
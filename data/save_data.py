@@ -2,13 +2,16 @@
 """
 This script handles the saving of image data and associated measurements.
 It performs the following tasks:
-1. Converts and saves images from numpy arrays or PIL Image objects to specified file paths.
-2. Organizes and saves measurement data into an Excel file, including associated images in designated folders.
+1. Converts and saves images from numpy arrays or PIL Image objects to specified file paths, and exports
+   the label overlays of all frames through `OverlayExporter`.
+2. Streams the measurement data of all frames into a single CSV/Parquet table on a background thread,
+   saves the associated images in designated folders and a per-frame summary into an Excel file.
 3. Utilizes the `DataManager` class to retrieve data for analysis.
 
 Functions:
 - `save_image(image, path)`: Converts and saves an image to the specified file path.
 - `save_measured_data(base_path)`: Saves measured data and associated images to the specified directory.
+- `MeasuredDataWriter`: Appends the measured data frame by frame to the output table on a background thread.
 
 Author:
 - Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
@@ -18,11 +21,25 @@ import os, sys
 
 sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
 
+import queue
+import threading
+
 import numpy as np
 import pandas as pd
-from PIL import Image
 from datetime import datetime
+
+# Parquet output is optional
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
 from data.data_manager import DataManager
+from data.overlay_export import OverlayExporter, to_pil_image
+from data.detection.morphometrics import MORPHOMETRICS_COLUMNS
+from data.detection.spatial_statistics import SPATIAL_COLUMNS
 
 import logging
 
@@ -31,6 +48,33 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG,  # Set to DEBUG level for detailed logging
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+EXPORT_FORMATS = ("csv", "parquet")
+
+# Number of frames waiting for the writer thread before write_frame blocks
+WRITER_QUEUE_SIZE = 16
+
+MEASURED_DATA_COLUMNS = [
+    'file',
+    'frame',
+    'label',
+    'area',
+    'nearest_neighbor_distance',
+    'nearest_neighbor_label',
+    *MORPHOMETRICS_COLUMNS,
+    *SPATIAL_COLUMNS
+]
+
+# Text columns of the measured data; all other columns are floats
+MEASURED_DATA_TEXT_COLUMNS = ('file', 'frame', 'label', 'nearest_neighbor_label')
+
+# Columns averaged in the per-frame summary
+SUMMARY_COLUMNS = ('area', 'nearest_neighbor_distance', 'knn_mean_distance_nm', 'voronoi_area_nm2')
+
+PARQUET_SCHEMA = pa.schema([
+    (column, pa.string() if column in MEASURED_DATA_TEXT_COLUMNS else pa.float64())
+    for column in MEASURED_DATA_COLUMNS
+]) if pa is not None else None
+
 def save_image(image, path):
     """
     Save an image to the specified path.
@@ -44,91 +88,202 @@ def save_image(image, path):
         ValueError: If the image data is None or if the image shape is unsupported.
     """
     try:
-        if image is not None:
-            if isinstance(image, np.ndarray):
-                # Convert dtype to uint8 if necessary
-                if image.dtype == np.int64:
-                    # Normalize and convert int64 to uint8
-                    image = np.clip(image, 0, 255).astype(np.uint8)
-                elif image.dtype == np.float32 or image.dtype == np.float64:
-                    # Normalize float values to the range [0, 255]
-                    image = (255 * np.clip(image, 0, 1)).astype(np.uint8)
-                elif image.dtype != np.uint8:
-                    raise TypeError(f"Unsupported dtype: {image.dtype}")
-
-                # Handle grayscale and RGB images
-                if image.ndim == 2:  # Grayscale image
-                    image = Image.fromarray(image, mode='L')
-                elif image.ndim == 3 and image.shape[2] in [3, 4]:  # RGB or RGBA image
-                    image = Image.fromarray(image, mode='RGB' if image.shape[2] == 3 else 'RGBA')
-                else:
-                    raise ValueError(f"Unsupported image shape: {image.shape}")
-
-            elif isinstance(image, Image.Image):
-                pass  # Image is already a PIL Image
-            else:
-                raise TypeError(f"Unsupported image type: {type(image)}")
-
-            # Save the image
-            image.save(path)
-        else:
-            raise ValueError("Image is None.")
+        to_pil_image(image).save(path)
     except Exception as e:
         logging.error(f"Failed to save image at {path}: {e}")
 
-def save_measured_data(base_path):
+def get_frame_columns(item):
+    """
+    Collect the measured data of a frame as columns.
+
+    Args:
+        item (FileDataModel): The analyzed frame.
+
+    Returns:
+        dict: Column name to a 1D array with a value for every spot, keyed by MEASURED_DATA_COLUMNS.
+    """
+    labels = np.asarray(item.labels_names if item.labels_names is not None else [], dtype=object)
+    count = len(labels)
+    columns = {
+        'file': np.full(count, os.path.basename(item.file_name or ""), dtype=object),
+        'frame': np.full(count, item.data_name, dtype=object),
+        'label': labels,
+        'area': np.asarray(item.areas if item.areas is not None else [], dtype=np.float64),
+        'nearest_neighbor_distance': np.asarray(item.nearest_neighbor_distances, dtype=np.float64),
+        'nearest_neighbor_label': np.asarray(item.nearest_neighbor_name, dtype=object)
+    }
+
+    # Morphometrics and spatial statistics are in the same order as the labels names
+    for records, names in ((item.morphometrics, MORPHOMETRICS_COLUMNS), (item.spatial_statistics, SPATIAL_COLUMNS)):
+        for column in names:
+            columns[column] = records[column].astype(np.float64) if records is not None else np.full(count, np.nan)
+
+    return columns
+
+def summarize_frame_columns(columns):
+    """
+    Summarize the measured data of a frame in one row.
+
+    Args:
+        columns (dict): Columns of the frame, as returned by get_frame_columns.
+
+    Returns:
+        dict: Number of spots and mean values of the main measurements.
+    """
+    summary = {
+        'file': columns['file'][0] if len(columns['label']) else "",
+        'frame': columns['frame'][0] if len(columns['label']) else "",
+        'spots': len(columns['label'])
+    }
+    with np.errstate(invalid="ignore"):
+        for column in SUMMARY_COLUMNS:
+            values = columns[column]
+            summary[f"mean_{column}"] = float(np.nanmean(values)) if np.any(~np.isnan(values)) else np.nan
+    return summary
+
+class MeasuredDataWriter:
+    """
+    Writes the measured data of frames to a single long-format table, one frame at a time.
+
+    Frames are handed over with write_frame and appended to the CSV file (and the Parquet file, if
+    pyarrow is installed) by a background thread, so the caller can go on with the next frame.
+    """
+    def __init__(self, base_path, formats=EXPORT_FORMATS):
+        """
+        Open the output files and start the writer thread.
+
+        Args:
+            base_path (str): Path of the output files without the extension.
+            formats (tuple): Formats to write, among EXPORT_FORMATS.
+        """
+        if "parquet" in formats and pq is None:
+            logger.warning("pyarrow is not installed, measured data is not saved to Parquet")
+            formats = tuple(format for format in formats if format != "parquet")
+
+        self.paths = {format: f"{base_path}.{format}" for format in formats}
+        self.error = None
+        self._queue = queue.Queue(maxsize=WRITER_QUEUE_SIZE)
+        self._csv_header_written = False
+        self._parquet_writer = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write_frame(self, columns):
+        """
+        Queue the columns of a frame for writing; blocks while the queue is full.
+
+        Args:
+            columns (dict): Columns of the frame, as returned by get_frame_columns.
+        """
+        self._queue.put(columns)
+
+    def close(self):
+        """
+        Write the remaining frames and close the files.
+
+        Raises:
+            ValueError: If writing failed.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise ValueError(f"Failed to write measured data: {self.error}")
+
+    def _run(self):
+        while True:
+            columns = self._queue.get()
+            if columns is None:
+                break
+            if self.error is not None:
+                continue  # Keep draining the queue so that producers never block
+            try:
+                self._write(columns)
+            except Exception as e:
+                logger.error(f"Error writing measured data: {e}")
+                self.error = e
+
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+    def _write(self, columns):
+        df = pd.DataFrame(columns, columns=MEASURED_DATA_COLUMNS)
+        if "csv" in self.paths:
+            df.to_csv(self.paths["csv"], mode="a" if self._csv_header_written else "w", header=not self._csv_header_written, index=False)
+            self._csv_header_written = True
+        if "parquet" in self.paths:
+            table = pa.Table.from_pandas(df, schema=PARQUET_SCHEMA, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.paths["parquet"], PARQUET_SCHEMA)
+            self._parquet_writer.write_table(table)
+
+def save_measured_data(base_path, formats=EXPORT_FORMATS, xlsx_summary=True, overlay_format="png", max_workers=None, on_progress=None):
     """
     Save measured data and associated images to a specified directory.
 
+    The measured data of all frames is streamed to a single table with one row per spot
+    (measured_data_<time>.csv / .parquet), written on a background thread, while the overlay images
+    are rendered and encoded on a thread pool. An Excel file with one summary row per frame is
+    written at the end. Frames that were not analyzed are skipped.
+
     Args:
         base_path (str): The base directory where the data should be saved.
+        formats (tuple): Formats of the measured data table, among EXPORT_FORMATS.
+        xlsx_summary (bool): Whether to write the per-frame summary to an Excel file.
+        overlay_format (str): Format of the overlay images, one of OVERLAY_FORMATS; 'none' skips them.
+        max_workers (int, optional): Number of threads saving the overlays; None lets the pool decide.
+        on_progress (callable, optional): Called with the number of saved frames after each frame.
 
-    Raises:
-        Exception: If there is an issue with saving the data or images.
+    Returns:
+        str: The folder the data was saved to, or None if saving failed.
     """
     try:
         manager = DataManager()
-        data = manager.data_for_analisys
+        data = list(manager.data_for_analisys)
         # Get the current date and time for the file name
         current_time = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
         folder_path = os.path.join(base_path, current_time)
 
-        # Create directories to save images
-        os.makedirs(os.path.join(folder_path, 'labeled_overlays'), exist_ok=True)
-        os.makedirs(os.path.join(folder_path, 'labeled_overlays_white'), exist_ok=True)
-        excel_file_path = os.path.join(folder_path, f"measured_data_{current_time}.xlsx")
-
-        # Create a dictionary to hold DataFrames for each sheet
-        sheet_data = {}
-
-        # Organize data by name
-        for item in data:
-            name = item.data_name
-
-            # Save images using the helper function
-            save_image(item.labeled_overlays, os.path.join(folder_path, f'labeled_overlays/{name}_overlays.bmp'))
-            save_image(item.labeled_overlays_white, os.path.join(folder_path, f'labeled_overlays_white/{name}_overlays_white.bmp'))
-            
-            # Prepare the row data using zip
-            rows = []
-            for label, area, distance, neighbor_name in zip(item.labels_names, item.areas, item.nearest_neighbor_distances, item.nearest_neighbor_name):
-                row = {
-                    'label': label,
-                    'area': area,
-                    'nearest_neighbor_distance': distance,
-                    'nearest_neighbor_label': neighbor_name
-                }
-                rows.append(row)
-
-            # Convert rows to DataFrame
-            df = pd.DataFrame(rows)
-
-            # Add DataFrame to the dictionary with the name as the key
-            sheet_data[name] = df
-
-        # Write all DataFrames to an Excel file with different sheets
-        with pd.ExcelWriter(excel_file_path, engine='xlsxwriter') as writer:
-            for sheet_name, df in sheet_data.items():
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
+        os.makedirs(os.path.join(folder_path, 'radial_statistics'), exist_ok=True)
+
+        overlays = OverlayExporter(folder_path, overlay_format, max_workers)
+        writer = MeasuredDataWriter(os.path.join(folder_path, f"measured_data_{current_time}"), formats)
+        summary_rows = []
+        try:
+            for done, item in enumerate(data, start=1):
+                name = item.data_name
+
+                if item.labels_names is None:
+                    # Not analyzed: no overlays and no measured data to save
+                    if on_progress is not None:
+                        on_progress(done)
+                    continue
+
+                overlays.add_frame(item)
+
+                columns = get_frame_columns(item)
+                writer.write_frame(columns)
+                summary_rows.append(summarize_frame_columns(columns))
+
+                # Radial statistics describe the whole frame and are saved separately
+                if item.radial_statistics is not None:
+                    pd.DataFrame(item.radial_statistics).to_csv(
+                        os.path.join(folder_path, f'radial_statistics/{name}_radial.csv'),
+                        index=False
+                    )
+
+                if on_progress is not None:
+                    on_progress(done)
+        finally:
+            writer.close()
+            overlays.close()
+
+        if xlsx_summary:
+            try:
+                pd.DataFrame(summary_rows).to_excel(os.path.join(folder_path, f"summary_{current_time}.xlsx"), index=False)
+            except ImportError as e:
+                logger.warning(f"Excel summary not saved, no Excel writer is installed: {e}")
+
+        return folder_path
     except Exception as e:
-        logging.error(f"Failed to save measured data: {e}")
\ No newline at end of file
+        logging.error(f"Failed to save measured data: {e}")
+        return None
@@ -5,6 +5,7 @@ import os, sys
 sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
 
 from data.observer.observable import Observable
+from data.data_manager import DataManager
 
 import logging
 
@@ -64,7 +65,7 @@ class SelectedItemManager(Observable):
         if self.selected_item:
             self.selected_item.remove_observer(self)  # Remove self as an observer of the old item
         self.selected_item = item
-        self.selected_item.image_for_processing = item.original_image
+        self.selected_item.image_for_processing = item.get_pipeline_input(DataManager().float_pipeline)
         if self.selected_item:
             self.selected_item.add_observer(self)  # Add self as an observer of the new item
         self.notify_observers()  # Notify observers of the selection change
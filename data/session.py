@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+Session snapshots.
+
+A session file stores the analyzed items of a working session: the raw data, the greyscale and
+intermediate images, the operation chains with their parameters, the label images and the
+measurement arrays, so that reopening it restores the session without reading the data files or
+running any operation again.
+
+The file is a ZIP archive of `.npy` members (readable with `numpy.load`) and a JSON manifest:
+
+- Raw data and images, the bulk of a session, are stored uncompressed at 64-byte aligned offsets.
+  Reopening maps the whole file into memory once and every such array is a copy-on-write view of
+  the mapping, so nothing is read until it is displayed or processed.
+- Label images and measurement arrays compress well and are stored Deflate-compressed, one member
+  per frame and quantity; they are decompressed when the session is opened.
+- Objects shared by several attributes (e.g. an original image that is also the image for
+  processing) are stored once and shared again after reopening.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import io
+import json
+import struct
+import zipfile
+import zlib
+
+import numpy as np
+from PIL import Image
+
+from data.model.file_data_model import FileDataModel
+from data.model.operation_model import OperationModel
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+SESSION_EXTENSION = ".nsa"
+SESSION_FORMAT_VERSION = 1
+
+MANIFEST_NAME = "session.json"
+
+# Alignment of the uncompressed arrays in the file
+ARRAY_ALIGNMENT = 64
+
+# Id of the ZIP extra field padding local headers to the alignment
+PADDING_EXTRA_ID = 0x4e53
+
+# Size of the fixed part of a ZIP local file header, and of its ZIP64 extra field
+ZIP_LOCAL_HEADER_SIZE = 30
+ZIP64_EXTRA_SIZE = 20
+
+# Attributes holding images, stored uncompressed and memory-mapped on reopening
+SESSION_IMAGE_ATTRIBUTES = (
+    "data",
+    "original_image",
+    "image_for_processing",
+    "image_for_analisys"
+)
+
+# Attributes holding analysis results, stored compressed
+SESSION_RESULT_ATTRIBUTES = (
+    "labeled_image",
+    "centroids",
+    "areas",
+    "labels_names",
+    "nearest_neighbor_distance",
+    "nearest_neighbor_name",
+    "morphometrics",
+    "spatial_statistics",
+    "radial_statistics"
+)
+
+def _json_default(value):
+    # Header values read from binary files are NumPy scalars
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, bytes):
+        return value.decode("latin-1")
+    raise TypeError(f"Object of type {type(value).__name__} cannot be stored in a session.")
+
+def _descr_from_json(descr):
+    """
+    Rebuild a dtype description stored as JSON, where tuples became lists.
+    """
+    if isinstance(descr, str):
+        return descr
+    fields = []
+    for field in descr:
+        name, field_descr = field[0], _descr_from_json(field[1])
+        fields.append((name, field_descr) if len(field) == 2 else (name, field_descr, tuple(field[2])))
+    return fields
+
+class SessionWriter:
+    """
+    Writes the members of a session file.
+
+    Every object is stored once: adding an object that was already added returns its existing reference.
+    """
+    def __init__(self, path, compress=True):
+        """
+        Create the session file.
+
+        Args:
+            path (str): Path of the session file.
+            compress (bool): Whether the analysis results are compressed.
+        """
+        self.compress = compress
+        self._zip = zipfile.ZipFile(path, "w", allowZip64=True)
+        self._stored = {}  # id of an added object -> (object, reference)
+
+    def add(self, value, compress=False):
+        """
+        Store an image, an array or a list of values.
+
+        Args:
+            value (PIL.Image.Image, numpy.ndarray or list): The object; None is not stored.
+            compress (bool): Whether the member is compressed; uncompressed members are memory-mapped on reopening.
+
+        Returns:
+            dict: Reference of the member in the manifest, or None for None.
+        """
+        if value is None:
+            return None
+        stored = self._stored.get(id(value))
+        if stored is not None:
+            return stored[1]
+
+        if isinstance(value, Image.Image):
+            kind = "image"
+        elif isinstance(value, (list, tuple)):
+            kind = "list"
+        else:
+            kind = "array"
+        array = np.ascontiguousarray(value)
+        if array.dtype.hasobject:
+            raise TypeError("Arrays of Python objects cannot be stored in a session.")
+
+        reference = {"member": f"arrays/{len(self._stored)}.npy", "kind": kind}
+        reference.update(self._write_array(reference["member"], array, compress and self.compress))
+        self._stored[id(value)] = (value, reference)
+        return reference
+
+    def close(self, manifest):
+        """
+        Write the manifest and close the file.
+
+        Args:
+            manifest (dict): The session description.
+        """
+        try:
+            self._zip.writestr(MANIFEST_NAME, json.dumps(manifest, default=_json_default), compress_type=zipfile.ZIP_DEFLATED)
+        finally:
+            self._zip.close()
+            self._stored.clear()
+
+    def _write_array(self, member, array, compress):
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, array, allow_pickle=False)
+        payload = buffer.getvalue()
+        info = zipfile.ZipInfo(member, date_time=(1980, 1, 1, 0, 0, 0))
+
+        header_offset = self._zip.fp.tell()
+        header_size = ZIP_LOCAL_HEADER_SIZE + len(member.encode("utf-8"))
+        if len(payload) * 1.05 > zipfile.ZIP64_LIMIT:
+            header_size += ZIP64_EXTRA_SIZE
+        if compress:
+            info.compress_type = zipfile.ZIP_DEFLATED
+        else:
+            # Pad the local header so that the member, and with it the array data, starts aligned
+            padding = -(header_offset + header_size + 4) % ARRAY_ALIGNMENT
+            info.extra = struct.pack("<HH", PADDING_EXTRA_ID, padding) + bytes(padding)
+            info.compress_type = zipfile.ZIP_STORED
+            header_size += len(info.extra)
+        self._zip.writestr(info, payload)
+
+        # The reader takes the arrays straight from the mapped file, so their positions are recorded
+        return {
+            "compressed": compress,
+            "offset": header_offset + header_size,
+            "size": info.compress_size,
+            "start": len(payload) - array.nbytes,
+            "dtype": np.lib.format.dtype_to_descr(array.dtype),
+            "shape": list(array.shape)
+        }
+
+class SessionReader:
+    """
+    Reads the members of a session file, memory-mapping the uncompressed ones.
+    """
+    def __init__(self, path):
+        """
+        Open the session file and read its manifest.
+
+        Args:
+            path (str): Path of the session file.
+
+        Raises:
+            ValueError: If the file is not a session or has an unsupported version.
+        """
+        with zipfile.ZipFile(path, "r") as archive:
+            if MANIFEST_NAME not in archive.namelist():
+                raise ValueError(f"'{path}' is not a session file.")
+            self.manifest = json.loads(archive.read(MANIFEST_NAME))
+        if self.manifest.get("version") != SESSION_FORMAT_VERSION:
+            raise ValueError(f"Unsupported session version {self.manifest.get('version')}.")
+
+        # Copy-on-write: arrays can be modified in memory without ever changing the file
+        self._mapping = np.memmap(path, dtype=np.uint8, mode="c") if os.path.getsize(path) else None
+        self._loaded = {}  # member name -> object
+
+    def get(self, reference):
+        """
+        Get the object a manifest reference points to.
+
+        Args:
+            reference (dict): The reference, as returned by SessionWriter.add; None gives None.
+
+        Returns:
+            object: The image, array or list; the same object for every reference to a member.
+        """
+        if reference is None:
+            return None
+        member = reference["member"]
+        value = self._loaded.get(member)
+        if value is None:
+            dtype = np.lib.format.descr_to_dtype(_descr_from_json(reference["dtype"]))
+            shape = tuple(reference["shape"])
+            offset = reference["offset"]
+            if reference["compressed"]:
+                # Raw Deflate stream of the member, decompressed without going through the archive
+                payload = bytearray(zlib.decompress(self._mapping[offset:offset + reference["size"]], -zlib.MAX_WBITS))
+                array = np.frombuffer(payload, dtype=dtype, count=int(np.prod(shape)), offset=reference["start"]).reshape(shape)
+            else:
+                start = offset + reference["start"]
+                array = self._mapping[start:start + int(np.prod(shape)) * dtype.itemsize].view(dtype).reshape(shape)
+
+            if reference["kind"] == "image":
+                value = Image.fromarray(array)
+            elif reference["kind"] == "list":
+                value = array.tolist()
+            else:
+                value = array
+            self._loaded[member] = value
+        return value
+
+    def close(self):
+        """
+        Forget the loaded objects; the memory-mapped arrays stay valid as long as they are used.
+        """
+        self._mapping = None
+        self._loaded.clear()
+
+def save_session(path, data_models, compress=True):
+    """
+    Save the items of a session to a session file.
+
+    Args:
+        path (str): Path of the session file.
+        data_models (list): FileDataModel instances to save.
+        compress (bool): Whether the analysis results are compressed.
+
+    Raises:
+        ValueError: If saving fails.
+    """
+    try:
+        writer = SessionWriter(path, compress)
+        items = []
+        try:
+            for data_model in data_models:
+                item = {
+                    "data_name": data_model.data_name,
+                    "file_name": data_model.file_name,
+                    "frame_number": data_model.frame_number,
+                    "header_info": data_model.header_info,
+                    "area_px_nm_coefficient": data_model.area_px_nm_coefficient,
+                    "x_px_nm_coefficient": data_model.x_px_nm_coefficient,
+                    "y_px_nm_coefficient": data_model.y_px_nm_coefficient,
+                    "arrays": {},
+                    "operations": []
+                }
+                for attribute in SESSION_IMAGE_ATTRIBUTES:
+                    item["arrays"][attribute] = writer.add(getattr(data_model, attribute, None))
+                for attribute in SESSION_RESULT_ATTRIBUTES:
+                    item["arrays"][attribute] = writer.add(getattr(data_model, attribute, None), compress=True)
+
+                for operation in data_model.operations:
+                    item["operations"].append({
+                        "process_name": operation.process_name,
+                        "function_key": operation.function_key,
+                        "params": operation.params,
+                        "image": writer.add(operation.image)
+                    })
+
+                # Results that are up to date stay up to date after reopening
+                item["analysis_settings"] = None
+                if not data_model.is_analysis_stale(data_model.analysis_settings):
+                    item["analysis_settings"] = [data_model.analysis_settings]
+                items.append(item)
+        finally:
+            writer.close({"version": SESSION_FORMAT_VERSION, "items": items})
+
+    except Exception as e:
+        logger.error(f"Error saving session to {path}: {e}")
+        raise ValueError(f"Failed to save session: {e}")
+
+def load_session(path):
+    """
+    Load the items of a session file.
+
+    Images are memory-mapped and read from the file when first used, so even large sessions open
+    quickly; the file must not be modified while the session is in use.
+
+    Args:
+        path (str): Path of the session file.
+
+    Returns:
+        list: FileDataModel instances, one per saved item.
+
+    Raises:
+        ValueError: If the file cannot be read.
+    """
+    try:
+        reader = SessionReader(path)
+        data_models = []
+        try:
+            for item in reader.manifest["items"]:
+                data_model = FileDataModel()
+                data_model.data_name = item["data_name"]
+                data_model.file_name = item["file_name"]
+                data_model.frame_number = item["frame_number"]
+                data_model.header_info = item["header_info"]
+                data_model.area_px_nm_coefficient = item["area_px_nm_coefficient"]
+                data_model.x_px_nm_coefficient = item["x_px_nm_coefficient"]
+                data_model.y_px_nm_coefficient = item["y_px_nm_coefficient"]
+
+                operations = [
+                    OperationModel(
+                        operation["process_name"],
+                        reader.get(operation["image"]),
+                        operation["function_key"],
+                        operation["params"]
+                    )
+                    for operation in item["operations"]
+                ]
+                data_model.set_operations(operations)
+
+                for attribute in SESSION_IMAGE_ATTRIBUTES + SESSION_RESULT_ATTRIBUTES:
+                    value = reader.get(item["arrays"].get(attribute))
+                    if value is not None:
+                        setattr(data_model, attribute, value)
+
+                if item["analysis_settings"] is not None:
+                    data_model.mark_analyzed(item["analysis_settings"][0])
+                data_models.append(data_model)
+        finally:
+            reader.close()
+        return data_models
+
+    except Exception as e:
+        logger.error(f"Error loading session from {path}: {e}")
+        raise ValueError(f"Failed to load session: {e}")
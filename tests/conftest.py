@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Test configuration: makes the packages of the repository importable.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the image conversions.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import numpy as np
+from PIL import Image
+
+from data.image_conversion import resize_image
+from ui.preview_worker import downscale_for_preview
+
+def test_boolean_arrays_stay_binary():
+    img = np.zeros((2000, 1000), dtype=bool)
+    img[:1000] = True
+
+    downscaled = downscale_for_preview(img)
+    assert downscaled.dtype == bool and downscaled.shape == (1024, 512)
+
+    restored = resize_image(downscaled, (1000, 2000), Image.BILINEAR)
+    assert restored.dtype == bool and restored.shape == (2000, 1000)
+    assert np.array_equal(restored, img)
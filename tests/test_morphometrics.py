@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the per-spot morphometrics.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import numpy as np
+from skimage.draw import disk, ellipse
+from skimage.measure import label, regionprops
+
+from data.detection.morphometrics import calculate_morphometrics
+
+def make_labeled_image():
+    labeled_image = np.zeros((120, 160), dtype=np.int64)
+    rr, cc = ellipse(40, 50, 15, 30, rotation=0.4, shape=labeled_image.shape)
+    labeled_image[rr, cc] = 1
+    rr, cc = disk((80, 110), 20, shape=labeled_image.shape)
+    labeled_image[rr, cc] = 2
+    # Touching the disk, and at the image border
+    rr, cc = disk((80, 131), 8, shape=labeled_image.shape)
+    labeled_image[rr, cc] = 3
+    labeled_image[0:5, 0:3] = 4
+    return labeled_image
+
+def test_perimeter_matches_regionprops():
+    for labeled_image in (make_labeled_image(), label(np.random.default_rng(0).random((60, 60)) > 0.6)):
+        expected = [region.perimeter for region in regionprops(labeled_image)]
+        assert np.allclose(calculate_morphometrics(labeled_image)["perimeter_nm"], expected)
+
+def test_perimeter_is_scaled_by_pixel_size():
+    labeled_image = make_labeled_image()
+    expected = [0.5 * region.perimeter for region in regionprops(labeled_image)]
+    assert np.allclose(calculate_morphometrics(labeled_image, x_coeff=0.5, y_coeff=0.5)["perimeter_nm"], expected)
+
+def test_perimeter_of_disk_with_non_square_pixels():
+    radius = 40
+    rows = np.arange(-60, 61)[:, None] * 2.0
+    cols = np.arange(-60, 61)[None, :] * 1.0
+    labeled_image = ((rows ** 2 + cols ** 2) < radius ** 2).astype(np.int64)
+    perimeter = calculate_morphometrics(labeled_image, x_coeff=1.0, y_coeff=2.0)["perimeter_nm"][0]
+    assert abs(perimeter - 2 * np.pi * radius) < 0.06 * 2 * np.pi * radius
+
+def test_eccentricity_and_orientation_match_regionprops():
+    labeled_image = make_labeled_image()
+    result = calculate_morphometrics(labeled_image)
+    regions = regionprops(labeled_image)
+    assert np.allclose(result["eccentricity"], [region.eccentricity for region in regions], atol=1e-6)
+    # The orientation of a disk is undefined
+    elongated = [0, 3]
+    assert np.allclose(result["orientation_deg"][elongated], [np.degrees(regions[index].orientation) for index in elongated])
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the overlay export.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import numpy as np
+from PIL import Image
+
+from data.overlay_export import OverlayExporter, get_overlay_path
+
+class OverlayItem:
+    """
+    Analyzed frame with cached overlay images, like FileDataModel.
+    """
+    def __init__(self, name, value):
+        self.data_name = name
+        self.labeled_overlays = Image.fromarray(np.full((8, 10, 3), value, dtype=np.uint8))
+        self.labeled_overlays_white = Image.fromarray(np.full((8, 10, 3), 255 - value, dtype=np.uint8))
+
+    def get_overlay_images(self):
+        return {"black": self.labeled_overlays, "white": self.labeled_overlays_white}
+
+def export(folder_path, items, overlay_format, max_workers=2):
+    exporter = OverlayExporter(folder_path, overlay_format, max_workers=max_workers)
+    for item in items:
+        exporter.add_frame(item)
+    return exporter.close()
+
+def test_png_then_tiff_stack(tmp_path):
+    items = [OverlayItem(f"frame{i}", 40 * i) for i in range(3)]
+
+    assert export(str(tmp_path / "png"), items, "png") == []
+    assert os.path.isfile(get_overlay_path(str(tmp_path / "png"), "black", "frame0", "png"))
+
+    # The same cached images, saved again as pages of a stack
+    folder_path = str(tmp_path / "stack")
+    os.makedirs(folder_path)
+    assert export(folder_path, items, "tiff_stack") == []
+    with Image.open(get_overlay_path(folder_path, "white", None, "tiff_stack")) as stack:
+        assert stack.n_frames == len(items)
+        for i, item in enumerate(items):
+            stack.seek(i)
+            assert np.array_equal(np.asarray(stack.convert("RGB")), np.asarray(item.labeled_overlays_white))
+
+def test_tiff_stack_pages_keep_the_frame_order(tmp_path):
+    # More frames than pages waiting to be written, with a frame that was not analyzed in the middle
+    items = [OverlayItem(f"frame{i}", 20 * i) for i in range(7)]
+    unanalyzed = OverlayItem("unanalyzed", 0)
+    unanalyzed.get_overlay_images = lambda: None
+    items.insert(3, unanalyzed)
+
+    failed = export(str(tmp_path), items, "tiff_stack", max_workers=1)
+    assert [name for name, _ in failed] == ["unanalyzed"]
+    items.remove(unanalyzed)
+    with Image.open(get_overlay_path(str(tmp_path), "black", None, "tiff_stack")) as stack:
+        assert stack.n_frames == len(items)
+        for i, item in enumerate(items):
+            stack.seek(i)
+            assert np.array_equal(np.asarray(stack.convert("RGB")), np.asarray(item.labeled_overlays))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the pipeline engine.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from data.operation_cache import DEFAULT_MAX_BYTES, OperationCache
+from data.operation_registry import get_operation
+from data.model.operation_model import OperationModel
+from data.pipeline import apply_operation, apply_operation_batch, normalize_operations
+
+@pytest.fixture
+def cache():
+    cache = OperationCache()
+    cache.configure(enabled=True)
+    cache.clear()
+    yield cache
+    cache.clear()
+
+@pytest.fixture
+def image():
+    return Image.fromarray(np.random.default_rng(0).integers(0, 256, (16, 16), dtype=np.uint8))
+
+def test_results_are_cached(cache, image):
+    first = apply_operation("Gamma Adjustment", {"gamma": 2.0}, image)
+    assert apply_operation("Gamma Adjustment", {"gamma": 2.0}, image) is first
+
+def test_uncached_results_are_not_stored(cache, image):
+    apply_operation("Gamma Adjustment", {"gamma": 2.0}, image, cache=False)
+    assert len(cache) == 0
+
+def test_interactive_operations_are_not_cached(cache, image, monkeypatch):
+    operation = get_operation("Manual Erase")
+    calls = []
+    monkeypatch.setattr(operation, "function", lambda params, img: calls.append(img) or (operation.process_name, img))
+
+    apply_operation("Manual Erase", {}, image)
+    apply_operation("Manual Erase", {}, image)
+    apply_operation_batch("Manual Erase", {}, [image, image])
+    assert len(calls) == 4
+    assert len(cache) == 0
+
+@pytest.mark.parametrize("name", ["Region Leveling", "Three Point Leveling", "Manual Erase"])
+def test_interactive_operations_are_not_replayed(name, image):
+    chain = [{"name": "Gamma Adjustment", "params": {"gamma": 2.0}}, {"name": name, "params": {}}]
+    with pytest.raises(ValueError, match="needs user input"):
+        normalize_operations(chain)
+    assert not OperationModel("process", image, name).is_replayable
+    assert OperationModel("process", image, "Gamma Adjustment").is_replayable
+
+def test_evicted_results_are_spilled_to_disk(cache, image, tmp_path):
+    cache.configure(max_bytes=image.width * image.height, disk_dir=str(tmp_path))
+    try:
+        apply_operation("Gamma Adjustment", {"gamma": 2.0}, image)
+        apply_operation("Gamma Adjustment", {"gamma": 3.0}, image)
+        assert len(cache) == 1
+        assert len(list(tmp_path.glob("*.npz"))) == 1
+
+        hits = cache.hits
+        _, spilled = apply_operation("Gamma Adjustment", {"gamma": 2.0}, image)
+        assert cache.hits == hits + 1
+        assert np.array_equal(np.asarray(spilled), np.asarray(get_operation("Gamma Adjustment").function({"gamma": 2.0}, image)[1]))
+    finally:
+        cache.configure(max_bytes=DEFAULT_MAX_BYTES, disk_dir="")
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the .mpp reader.
+
+The readers are compared on a synthetic movie; `python tests/test_read_mpp.py movie.mpp` runs the
+benchmark of `read_mpp` on a real file.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import numpy as np
+
+from data.files.read_mpp import benchmark_read_mpp, read_mpp_file, main
+
+def write_mpp_file(path, frames):
+    """
+    Write frames of shape (frames, rows, cols) as a minimal .mpp file.
+    """
+    num_frames, num_rows, num_columns = frames.shape
+    header = (
+        "[General Info]\n"
+        f"Number of columns: {num_columns}\n"
+        f"Number of rows: {num_rows}\n"
+        f"Number of Frames: {num_frames}\n"
+        "Image header size: 0\n"
+        "[Header end]\n"
+    )
+    with open(path, "wb") as file:
+        file.write(header.encode())
+        file.write(frames.astype("<f8").tobytes())
+
+def test_readers_return_identical_frames(tmp_path):
+    frames = np.random.default_rng(0).normal(size=(3, 8, 5))
+    path = str(tmp_path / "movie.mpp")
+    write_mpp_file(path, frames)
+
+    assert np.array_equal(read_mpp_file(path, mmap=False)["data"], frames)
+    assert np.array_equal(read_mpp_file(path)["data"], frames)
+    assert benchmark_read_mpp(path, repeats=1)["identical"]
+
+def test_main_takes_the_file_path(tmp_path, capsys):
+    path = str(tmp_path / "movie.mpp")
+    write_mpp_file(path, np.zeros((2, 4, 4)))
+
+    assert main([path, "--repeats", "1"]) == 0
+    assert "identical:   True" in capsys.readouterr().out
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the .s94 reader.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import struct
+
+import numpy as np
+import pytest
+
+from data.data_manager import create_data_models
+from data.files.read_s94 import FORMAT_STRING, NUMBER_OF_BYTES, read_s94_file, scale_s94_counts
+
+def write_s94_file(path, counts):
+    """
+    Write raw counts of shape (x_points, y_points) as a minimal .s94 file.
+    """
+    x_points, y_points = counts.shape
+    header = struct.pack(FORMAT_STRING, x_points, y_points, 0, 0, 1, 10.0, 10.0, 0, 0, 1, 1, 3, 2, 0, 0, 0, 0, 0, 0)
+    with open(path, "wb") as file:
+        file.write(header)
+        file.write(counts.astype("<i2").tobytes())
+
+def decode_s94_loop(file_name):
+    """
+    The original per-pixel decoder of read_s94_file, unchanged.
+
+    The product 20 * counts is evaluated in int16, so it wraps around for |counts| > 1638.
+    """
+    with open(file_name, 'rb') as file:
+        x_points, y_points = struct.unpack(FORMAT_STRING, file.read(NUMBER_OF_BYTES))[:2]
+        current = []
+        image_data = np.fromfile(file, dtype=np.int16, count=x_points * y_points).reshape((x_points, y_points))
+        for i in reversed(range(x_points)):
+            for j in reversed(range(y_points)):
+                current.append((20 * image_data[i][j]) / 65536)
+        current = np.reshape(current,(x_points, y_points))
+    return current
+
+@pytest.fixture
+def s94_file(tmp_path):
+    # Full int16 range, including the counts above 1638 where an int16 product wraps around
+    counts = np.random.default_rng(0).integers(-32768, 32768, size=(16, 12), dtype=np.int16)
+    counts[0, 0], counts[0, 1], counts[0, 2] = 5232, -32768, 32767
+    path = str(tmp_path / "image.s94")
+    write_s94_file(path, counts)
+    return path, counts
+
+# The original decoder overflows on purpose here
+@pytest.mark.filterwarnings("ignore:overflow encountered")
+def test_reader_matches_original_decoder_without_overflow(s94_file):
+    path, counts = s94_file
+    data = read_s94_file(path)["data"]
+    expected = decode_s94_loop(path)
+
+    # Intended change: the original decoder wrapped around beyond +-1638 counts, the reader does not
+    overflow = np.abs(counts[::-1, ::-1].astype(np.int64)) > 1638
+    assert overflow.any() and not overflow.all()
+    assert np.array_equal(data[~overflow], expected[~overflow])
+    assert not np.any(data[overflow] == expected[overflow])
+    assert np.array_equal(data[overflow], 20 * counts[::-1, ::-1][overflow].astype(np.float64) / 65536)
+
+def test_image_is_rotated_by_180_degrees(s94_file):
+    path, counts = s94_file
+    data = read_s94_file(path)["data"]
+    assert data[-1, -1] == 20 * 5232 / 65536
+    assert np.array_equal(data, 20 * counts[::-1, ::-1].astype(np.float64) / 65536)
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_scaling_does_not_wrap_around(dtype):
+    counts = np.array([-32768, -1639, 1639, 5232, 32767], dtype=np.int16)
+    scaled = scale_s94_counts(counts, dtype=dtype)
+    assert scaled.dtype == dtype
+    assert np.array_equal(scaled, np.array([20 * int(count) / 65536 for count in counts], dtype=dtype))
+
+def test_raw_counts_are_a_zero_copy_view(s94_file):
+    path, counts = s94_file
+    item = read_s94_file(path, raw=True)
+    assert item["raw_counts"] and item["data"].dtype == np.int16
+    assert isinstance(item["data"].base, np.memmap)
+    assert np.array_equal(item["data"], counts[::-1, ::-1])
+    assert np.array_equal(item["data"] * item["scale"], read_s94_file(path)["data"])
+
+def test_data_models_scale_raw_counts(s94_file):
+    path, _ = s94_file
+    data_model = create_data_models("s94", read_s94_file(path, raw=True))[0]
+    assert np.array_equal(data_model.data, read_s94_file(path)["data"])
+    assert np.array_equal(np.asarray(data_model.original_image), np.asarray(create_data_models("s94", read_s94_file(path))[0].original_image))
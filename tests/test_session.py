@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the session snapshots.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import io
+import json
+import zipfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from data.detection.morphometrics import MORPHOMETRICS_DTYPE
+from data.detection.spatial_statistics import RADIAL_STATS_DTYPE, SPATIAL_STATS_DTYPE
+from data.model.file_data_model import FileDataModel
+from data.model.operation_model import OperationModel
+from data.session import MANIFEST_NAME, load_session, save_session
+
+def make_structured(dtype, rows, rng):
+    array = np.zeros(rows, dtype=dtype)
+    for name in dtype.names:
+        array[name] = rng.integers(0, 100, rows) if array[name].dtype.kind == "i" else rng.random(rows)
+    return array
+
+def make_item(index, rng):
+    item = FileDataModel()
+    item.data_name = f"frame{index}"
+    item.file_name = "movie.s94"
+    item.frame_number = index
+    item.header_info = {"xres": np.int64(32), "comment": b"scan"}
+    item.area_px_nm_coefficient = 0.25
+    item.x_px_nm_coefficient = 0.5
+    item.y_px_nm_coefficient = 0.5
+    item.data = rng.normal(size=(24, 32))
+
+    # The original image is also the image for processing, and the binary image ends the operation chain
+    item.original_image = Image.fromarray(rng.integers(0, 256, (24, 32), dtype=np.uint8))
+    item.image_for_processing = item.original_image
+    blurred = Image.fromarray(rng.integers(0, 256, (24, 32), dtype=np.uint8))
+    binary = Image.fromarray(rng.random((24, 32)) > 0.5)
+    item.set_operations([
+        OperationModel("Gaussian Blur", blurred, "Gaussian Blur", {"sigmaX": 2, "sigmaY": 2}),
+        OperationModel("Otsu Threshold", binary, "Otsu Threshold", {})
+    ])
+    item.image_for_analisys = binary
+
+    spots = 4
+    item.labeled_image = rng.integers(0, spots + 1, (24, 32)).astype(np.int32)
+    item.centroids = rng.random((spots, 2)) * 24
+    item.areas = rng.random(spots)
+    item.labels_names = [f"{label}" for label in range(1, spots + 1)]
+    item.nearest_neighbor_distance = rng.random(spots)
+    item.nearest_neighbor_name = ["2", "1", "4", "3"]
+    item.morphometrics = make_structured(MORPHOMETRICS_DTYPE, spots, rng)
+    item.spatial_statistics = make_structured(SPATIAL_STATS_DTYPE, spots, rng)
+    item.radial_statistics = make_structured(RADIAL_STATS_DTYPE, 10, rng)
+    item.mark_analyzed("periodic")
+    return item
+
+@pytest.fixture
+def items():
+    rng = np.random.default_rng(0)
+    return [make_item(index, rng) for index in range(2)]
+
+def assert_images_equal(loaded, saved):
+    assert isinstance(loaded, Image.Image)
+    assert loaded.mode == saved.mode
+    assert loaded.size == saved.size
+    assert np.array_equal(np.asarray(loaded), np.asarray(saved))
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_session_round_trip(tmp_path, items, compress):
+    path = str(tmp_path / "session.nsa")
+    save_session(path, items, compress=compress)
+    loaded_items = load_session(path)
+
+    assert len(loaded_items) == len(items)
+    for loaded, item in zip(loaded_items, items):
+        assert loaded.data_name == item.data_name
+        assert loaded.frame_number == item.frame_number
+        assert loaded.header_info == {"xres": 32, "comment": "scan"}
+        assert loaded.x_px_nm_coefficient == item.x_px_nm_coefficient
+        assert np.array_equal(loaded.data, item.data)
+
+        assert_images_equal(loaded.original_image, item.original_image)
+        assert_images_equal(loaded.image_for_analisys, item.image_for_analisys)
+        assert loaded.image_for_analisys.mode == "1"
+
+        # Shared objects are shared again
+        assert loaded.image_for_processing is loaded.original_image
+        assert loaded.operations[-1].image is loaded.image_for_analisys
+
+        assert [operation.function_key for operation in loaded.operations] == ["Gaussian Blur", "Otsu Threshold"]
+        assert loaded.operations[0].params == {"sigmaX": 2, "sigmaY": 2}
+        assert_images_equal(loaded.operations[0].image, item.operations[0].image)
+        assert loaded.get_pipeline() == item.get_pipeline()
+
+        assert np.array_equal(loaded.labeled_image, item.labeled_image)
+        assert loaded.labeled_image.dtype == item.labeled_image.dtype
+        assert np.array_equal(loaded.centroids, item.centroids)
+        assert np.array_equal(loaded.areas, item.areas)
+        assert loaded.labels_names == item.labels_names
+        assert np.array_equal(loaded.nearest_neighbor_distance, item.nearest_neighbor_distance)
+        assert loaded.nearest_neighbor_name == item.nearest_neighbor_name
+        for attribute in ("morphometrics", "spatial_statistics", "radial_statistics"):
+            assert getattr(loaded, attribute).dtype == getattr(item, attribute).dtype
+            assert np.array_equal(getattr(loaded, attribute), getattr(item, attribute))
+
+        assert not loaded.is_analysis_stale("periodic")
+
+def test_session_file_is_a_zip_of_npy_members(tmp_path, items):
+    path = str(tmp_path / "session.nsa")
+    save_session(path, items)
+
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+        references = [
+            reference for item in manifest["items"] for reference in item["arrays"].values() if reference is not None
+        ]
+        assert references
+        for reference in references:
+            array = np.load(io.BytesIO(archive.read(reference["member"])), allow_pickle=False)
+            assert list(array.shape) == reference["shape"]
+
+        member = manifest["items"][0]["arrays"]["morphometrics"]["member"]
+        morphometrics = np.load(io.BytesIO(archive.read(member)), allow_pickle=False)
+        assert np.array_equal(morphometrics, items[0].morphometrics)
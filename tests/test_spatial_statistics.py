@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the spatial statistics of spot positions.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import numpy as np
+import pytest
+
+from data.detection.spatial_statistics import (
+    NEIGHBOR_BOUNDARY_MODES,
+    centroids_to_nm,
+    compute_nearest_neighbors,
+    image_size_nm,
+    knn_distances
+)
+
+# Non-square pixels, so that a swap of x and y would show
+IMAGE_SHAPE = (40, 60)
+X_COEFF, Y_COEFF = 0.5, 0.8
+
+@pytest.fixture
+def centroids():
+    rng = np.random.default_rng(1)
+    return rng.uniform(0, 1, (25, 2)) * (IMAGE_SHAPE[0] - 1, IMAGE_SHAPE[1] - 1)
+
+def brute_force_knn(points, k, bounds, boundary):
+    """
+    Distances and indices of the k nearest neighbors from the full distance matrix.
+    """
+    differences = np.abs(points[:, None, :] - points[None, :, :])
+    if boundary == "periodic":
+        differences = np.minimum(differences, np.asarray(bounds) - differences)
+    matrix = np.hypot(differences[..., 0], differences[..., 1])
+    np.fill_diagonal(matrix, np.inf)
+
+    indices = np.argsort(matrix, axis=1)[:, :k]
+    distances = np.take_along_axis(matrix, indices, axis=1)
+    if boundary == "exclude":
+        width, height = bounds
+        border = np.minimum.reduce([points[:, 0], width - points[:, 0], points[:, 1], height - points[:, 1]])
+        excluded = distances > border[:, None]
+        distances[excluded] = np.nan
+        indices[excluded] = -1
+    return distances, indices
+
+@pytest.mark.parametrize("boundary", NEIGHBOR_BOUNDARY_MODES)
+def test_knn_distances_match_brute_force(centroids, boundary):
+    points = centroids_to_nm(centroids, X_COEFF, Y_COEFF)
+    bounds = image_size_nm(IMAGE_SHAPE, X_COEFF, Y_COEFF)
+
+    distances, indices = knn_distances(points, 3, bounds=bounds, boundary=boundary)
+    expected_distances, expected_indices = brute_force_knn(points, 3, bounds, boundary)
+    np.testing.assert_allclose(distances, expected_distances)
+    assert np.array_equal(indices, expected_indices)
+    if boundary == "exclude":
+        assert np.isnan(distances).any()
+
+@pytest.mark.parametrize("boundary", NEIGHBOR_BOUNDARY_MODES)
+def test_nearest_neighbors_match_brute_force(centroids, boundary):
+    names = [f"spot{i}" for i in range(len(centroids))]
+    points = centroids_to_nm(centroids, X_COEFF, Y_COEFF)
+    expected_distances, expected_indices = brute_force_knn(points, 1, image_size_nm(IMAGE_SHAPE, X_COEFF, Y_COEFF), boundary)
+
+    distances, neighbor_names = compute_nearest_neighbors(centroids, names, IMAGE_SHAPE, X_COEFF, Y_COEFF, boundary)
+    np.testing.assert_allclose(distances, expected_distances[:, 0])
+    assert neighbor_names == [names[index] if index >= 0 else "" for index in expected_indices[:, 0]]
+
+def test_knn_distances_with_fewer_points_than_neighbors():
+    distances, indices = knn_distances([[0.0, 0.0], [3.0, 4.0]], 3)
+    np.testing.assert_allclose(distances, [[5.0, np.nan, np.nan], [5.0, np.nan, np.nan]])
+    assert np.array_equal(indices, [[1, -1, -1], [0, -1, -1]])
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the spot tracking.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import numpy as np
+import pytest
+
+from data.detection.tracking import calculate_track_statistics, track_spots_across_frames
+
+def to_movie(frames):
+    """
+    Flatten a list of per-frame position lists into positions, offsets and the frame of every spot.
+    """
+    positions = np.array([point for points in frames for point in points], dtype=np.float64).reshape(-1, 2)
+    offsets = np.r_[0, np.cumsum([len(points) for points in frames])]
+    frame_indices = np.repeat(np.arange(len(frames)), [len(points) for points in frames])
+    return positions, offsets, frame_indices
+
+def test_crossing_particles_keep_their_tracks():
+    # A moves right and B moves left on parallel lines 1 apart; they pass each other at frame 2,
+    # where they are closer to each other than the distance each one moves in a frame
+    frames = [[(x, 0.0), (-x, 1.0)] for x in np.arange(-4.0, 5.0, 2.0)]
+    positions, offsets, _ = to_movie(frames)
+
+    track_ids = track_spots_across_frames(positions, offsets, max_distance=3)
+    assert np.array_equal(track_ids[0::2], np.zeros(len(frames)))
+    assert np.array_equal(track_ids[1::2], np.ones(len(frames)))
+
+@pytest.mark.parametrize("max_gap, num_tracks", [(2, 1), (1, 2), (0, 2)])
+def test_gap_of_max_gap_frames_is_closed(max_gap, num_tracks):
+    # The spot is missed in frames 2 and 3
+    frames = [[(0.0, 0.0)], [(1.0, 0.0)], [], [], [(4.0, 0.0)], [(5.0, 0.0)]]
+    positions, offsets, _ = to_movie(frames)
+
+    track_ids = track_spots_across_frames(positions, offsets, max_distance=2, max_gap=max_gap)
+    assert len(np.unique(track_ids)) == num_tracks
+    assert np.array_equal(track_ids[:2], [0, 0])
+    assert np.array_equal(track_ids[2:], [num_tracks - 1] * 2)
+
+def test_spot_beyond_max_distance_starts_a_new_track():
+    frames = [[(0.0, 0.0)], [(1.0, 0.0), (20.0, 20.0)], [(2.0, 0.0), (6.0, 0.0)]]
+    positions, offsets, _ = to_movie(frames)
+
+    track_ids = track_spots_across_frames(positions, offsets, max_distance=3)
+    assert np.array_equal(track_ids, [0, 0, 1, 0, 2])
+
+def test_diffusion_coefficient_of_linear_drift():
+    # Constant velocity v: MSD(k frames) = |v|^2 k^2, fitted through the origin by MSD = 4 D t
+    velocity = np.array([3.0, 4.0])
+    frame_interval = 0.5
+    max_lag = 4
+    frames = [[tuple(velocity * frame)] for frame in range(10)]
+    positions, offsets, frame_indices = to_movie(frames)
+
+    track_ids = track_spots_across_frames(positions, offsets, max_distance=6)
+    stats = calculate_track_statistics(positions, frame_indices, track_ids, frame_interval, max_lag)
+
+    lags = np.arange(1, max_lag + 1)
+    expected = np.sum(velocity ** 2) * np.sum(lags ** 3) / (4 * frame_interval * np.sum(lags ** 2))
+    assert len(stats) == 1
+    assert stats["lifetime"][0] == len(frames)
+    assert stats["path_length"][0] == pytest.approx(5.0 * (len(frames) - 1))
+    assert stats["net_displacement"][0] == pytest.approx(5.0 * (len(frames) - 1))
+    assert stats["diffusion_coefficient"][0] == pytest.approx(expected)
@@ -15,6 +15,9 @@ import os, sys
 
 sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
 
+import queue
+import threading
+
 import tkinter as tk
 
 from tkinter import filedialog, messagebox
@@ -33,11 +36,17 @@ from ui.scaling_ui import create_scaling_ui
 from ui.navigation_ui import create_navigation_ui
 from ui.show_result_ui import create_show_result_ui
 from data.detection.spots_measurement import (
-    analyze_images,
-    overlay_labels_on_original,
-    overlay_selected_label
+    analyze_images
+)
+from data.detection.morphometrics import calculate_morphometrics
+from data.detection.spatial_statistics import (
+    compute_nearest_neighbors,
+    calculate_spatial_statistics,
+    calculate_radial_statistics
 )
 from data.save_data import save_measured_data
+from data.results_table import ResultsTableModel
+from data.image_conversion import to_display_image
 
 from PIL import Image, ImageTk
 
@@ -48,6 +57,68 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG,  # Set to DEBUG level for detailed logging
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+# Interval of checking whether saving the measured data has finished
+SAVE_POLL_MS = 100
+# Interval of checking whether the analysis has finished
+ANALYSIS_POLL_MS = 100
+
+def measure_items(items, images, boundary, max_workers=1):
+    """
+    Analyze the images of the given items and measure their spots.
+
+    This runs on the analysis worker thread: the results are returned, not stored on the items.
+
+    Args:
+        items (list): FileDataModel instances the images belong to.
+        images (list): The images for analysis of the items.
+        boundary (str): Boundary mode of the nearest neighbor distances.
+        max_workers (int): Number of worker processes of the segmentation.
+
+    Returns:
+        list: Dictionaries of the results of each item, keyed by the item attributes they are stored in.
+    """
+    all_centrodids, all_areas, all_labels_names, _, _, labeled_images, _ = analyze_images(images, max_workers=max_workers)
+    measurements = []
+    for i, item in enumerate(items):
+        nearest_neighbor_distances, nearest_neighbor_name = compute_nearest_neighbors(
+            all_centrodids[i],
+            all_labels_names[i],
+            labeled_images[i].shape,
+            item.x_px_nm_coefficient,
+            item.y_px_nm_coefficient,
+            boundary
+        )
+        measurements.append({
+            "labeled_image": labeled_images[i],
+            "areas": all_areas[i] * item.area_px_nm_coefficient,
+            "centroids": all_centrodids[i],
+            "labels_names": all_labels_names[i],
+            "nearest_neighbor_distances": nearest_neighbor_distances,
+            "nearest_neighbor_name": nearest_neighbor_name,
+            "morphometrics": calculate_morphometrics(
+                labeled_images[i],
+                item.data,
+                item.x_px_nm_coefficient,
+                item.y_px_nm_coefficient
+            ),
+            "spatial_statistics": calculate_spatial_statistics(
+                all_labels_names[i],
+                all_centrodids[i],
+                labeled_images[i].shape,
+                item.x_px_nm_coefficient,
+                item.y_px_nm_coefficient,
+                boundary=boundary
+            ),
+            "radial_statistics": calculate_radial_statistics(
+                all_centrodids[i],
+                labeled_images[i].shape,
+                item.x_px_nm_coefficient,
+                item.y_px_nm_coefficient,
+                boundary=boundary
+            )
+        })
+    return measurements
+
 class MainWindow(Observer):
     def __init__(self, root):
         """
@@ -95,95 +166,112 @@ class MainWindow(Observer):
             logger.error(f"Error binding callbacks: {e}")
 
     def find_button_onClick(self):
-        """Callback for the 'Find' button, triggers the analysis of images."""
+        """
+        Callback for the 'Find' button, triggers the analysis of images.
+
+        Only items whose image for analysis changed since their last analysis (or that were analyzed
+        with other settings) are analyzed again; the others keep their results and overlays.
+        The analysis runs on a worker thread so the window stays responsive; the button is disabled until it ends.
+        """
         try:
-            images = []
-            for item in self.data_manager.data_for_analisys:
-                images.append(item.image_for_analisys)
-            
-            all_centrodids, all_areas, all_labels_names, nearest_neighbor_distances_list, nearest_neighbor_names, labeled_images, all_labels_num = analyze_images(images)
-            original_images = []
-            labeled = []
-            labels_names = []
-            centroids = []
-            for i, item in enumerate(self.data_manager.data_for_analisys):
-                original_images.append(item.original_image)
-                labels_names.append(all_labels_names[i])
-                labeled.append(labeled_images[i])
-                centroids.append(all_centrodids[i])
-                item.labeled_image = labeled_images[i]
-                item.areas = all_areas[i] * item.area_px_nm_coefficient
-                item.centroids = all_centrodids[i]
-                item.labels_names = all_labels_names[i]
-                item.nearest_neighbor_distances = nearest_neighbor_distances_list[i] * item.x_px_nm_coefficient # zmienić
-                item.nearest_neighbor_name = nearest_neighbor_names[i]
-            
-            labeled_overlays = overlay_labels_on_original(original_images, labeled, labels_names, centroids)
-            labeled_overlays_white = overlay_labels_on_original(original_images, labeled, labels_names, centroids, 'white')
-
-            for i, item in enumerate(self.data_manager.data_for_analisys):
-                item.labeled_overlays = Image.fromarray(labeled_overlays[i])
-                item.labeled_overlays_white = Image.fromarray(labeled_overlays_white[i])
-            
-            self.load_data_to_treeview()
+            boundary = self.data_manager.neighbor_boundary
+            stale_items = [
+                item for item in self.data_manager.data_for_analisys
+                if item.is_analysis_stale(boundary)
+            ]
+
+            if not stale_items:
+                self.load_data_to_treeview()
+                return
+
+            images = [item.image_for_analisys for item in stale_items]
+            max_workers = self.data_manager.analysis_workers
+            results = queue.Queue()
+            self.find_button.config(state=tk.DISABLED)
+
+            def analyze():
+                try:
+                    results.put(measure_items(stale_items, images, boundary, max_workers))
+                except Exception as e:
+                    logger.error(f"Error during image analysis: {e}")
+                    results.put(None)
+
+            def poll_results():
+                try:
+                    measurements = results.get_nowait()
+                except queue.Empty:
+                    self.root.after(ANALYSIS_POLL_MS, poll_results)
+                    return
+                try:
+                    self.find_button.config(state=tk.NORMAL)
+                    if measurements is not None:
+                        self.store_measurements(stale_items, images, measurements, boundary)
+                    self.load_data_to_treeview()
+                except Exception as e:
+                    logger.error(f"Error storing analysis results: {e}")
+
+            threading.Thread(target=analyze, daemon=True).start()
+            poll_results()
 
         except Exception as e:
             logger.error(f"Error during image analysis: {e}")
-    
+
+    def store_measurements(self, items, images, measurements, boundary):
+        """
+        Store the results of measure_items on the items.
+
+        Items whose image for analysis changed while they were analyzed keep their old results
+        and stay stale, so the next analysis picks them up.
+
+        Args:
+            items (list): FileDataModel instances that were analyzed.
+            images (list): The images the items were analyzed with.
+            measurements (list): Results of each item, as returned by measure_items.
+            boundary (str): Boundary mode of the nearest neighbor distances.
+        """
+        for item, image, results in zip(items, images, measurements):
+            if item.image_for_analisys is not image:
+                continue
+            for attribute, value in results.items():
+                setattr(item, attribute, value)
+            # Overlays are rendered when first displayed or saved
+            item.mark_analyzed(boundary)
+
     def load_data_to_treeview(self):
-        """Loads the analyzed data into the Treeview widget."""
+        """Loads the analyzed data into the results table, as columns over all frames."""
         try:
-            # Clear the Treeview widget
-            for item in self.result_treeview.get_children():
-                self.result_treeview.delete(item)
-            # Insert data into the Treeview widget
-            for i, frame in enumerate(self.data_manager.data_for_analisys):
-                frame_id = self.result_treeview.insert("", "end", text=frame.data_name, open=True)
-                for name, area, distance, nname in zip(frame.labels_names, frame.areas, frame.nearest_neighbor_distances, frame.nearest_neighbor_name):
-                    formatted_area = f"{area:.3f}"
-                    formatted_distance = f"{distance:.3f}"
-                    self.result_treeview.insert(frame_id, "end", values=(name, formatted_area, formatted_distance, nname))
+            frames = [frame for frame in self.data_manager.data_for_analisys if frame.labels_names is not None]
+            counts = [len(frame.labels_names) for frame in frames]
+
+            def concatenate(values, dtype):
+                return np.concatenate([np.asarray(value, dtype=dtype) for value in values]) if values else np.zeros(0, dtype=dtype)
+
+            columns = {
+                "label": concatenate([frame.labels_names for frame in frames], str),
+                "area": concatenate([frame.areas for frame in frames], np.float64),
+                "distance": concatenate([frame.nearest_neighbor_distances for frame in frames], np.float64),
+                "neighbor": concatenate([frame.nearest_neighbor_name for frame in frames], str),
+                "knn": concatenate([frame.spatial_statistics["knn_mean_distance_nm"] for frame in frames], np.float64),
+                "voronoi": concatenate([frame.spatial_statistics["voronoi_area_nm2"] for frame in frames], np.float64)
+            }
+            self.result_frames = frames
+            self.result_treeview.set_model(ResultsTableModel([frame.data_name for frame in frames], counts, columns))
         except Exception as e:
             logger.error(f"Error loading data to Treeview: {e}")
     
     def treeview_onSelect(self, event=None):
-        """Callback for Treeview item selection."""
+        """Callback for results table selection, highlights the selected spot."""
         try:
-            # Callback function for when an item is selected
-            selected_item = self.result_treeview.selection()[0]
-            item = self.result_treeview.item(selected_item)
-            
-            # Navigate up to get the parent frame if a child item is selected
-            parent_item = self.result_treeview.parent(selected_item)
-            if parent_item:
-                frame_name = self.result_treeview.item(parent_item)['text']
-            else:
-                frame_name = item['text']
-
-            selected_data = []
-            
-            for data in self.data_manager.data_for_analisys:
-                if data.data_name == frame_name:
-                    selected_data = data
-            
-            if item['values']:
-                index = item['values'][0] - 1
-                original_image = selected_data.original_image
-                labeled_image = selected_data.labeled_image
-                lebels_names = selected_data.labels_names
-                centroids = selected_data.centroids
-
-                image_data = overlay_selected_label(
-                    original_image=np.array(original_image),
-                    labeled_image=labeled_image,
-                    label_names=lebels_names,
-                    centroids=centroids,
-                    index=index,
-                    label_colors=self.checkbox_color_var.get()
-                )
-
-                img = Image.fromarray(image_data)
-                self.handle_displaying_image_on_canvas(img)
+            selected = self.result_treeview.get_selected()
+            if selected is None:
+                return
+
+            frame_index, index = selected
+            selected_data = self.result_frames[frame_index]
+            image_data = selected_data.get_selection_overlay().render(index, self.checkbox_color_var.get())
+
+            img = Image.fromarray(image_data)
+            self.handle_displaying_image_on_canvas(img)
 
         except Exception as e:
             logger.error(f"Error selecting Treeview item")
@@ -212,7 +300,7 @@ class MainWindow(Observer):
         """Retrieve and return the current image based on user selection."""
         try:
             item = self.selected_item_manager.selected_item
-            if self.selected_item_manager.selected_item.currently_processing_image:
+            if self.selected_item_manager.selected_item.currently_processing_image is not None:
                 img = self.selected_item_manager.selected_item.currently_processing_image
             elif self.selected_measured_image.get() == "Selected":
                 img = item.image_for_analisys
@@ -230,8 +318,29 @@ class MainWindow(Observer):
         """Handle the save button click event to save measured data."""
         try:
             folder_selected = filedialog.askdirectory()
-            if folder_selected:
-                save_measured_data(folder_selected)
+            if not folder_selected:
+                return
+
+            # Saving runs on a worker thread so the window stays responsive; the button is disabled until it ends
+            results = queue.Queue()
+            overlay_format = self.data_manager.overlay_format
+            self.save_button.config(state=tk.DISABLED)
+
+            def save():
+                results.put(save_measured_data(folder_selected, overlay_format=overlay_format))
+
+            def poll_results():
+                try:
+                    folder_path = results.get_nowait()
+                except queue.Empty:
+                    self.root.after(SAVE_POLL_MS, poll_results)
+                    return
+                self.save_button.config(state=tk.NORMAL)
+                if folder_path is None:
+                    messagebox.showerror("Error", "Failed to save measured data. Please check the logs for more details.")
+
+            threading.Thread(target=save, daemon=True).start()
+            poll_results()
         except Exception as e:
             logger.error(f"An error occurred while saving data: {e}")
 
@@ -303,6 +412,7 @@ class MainWindow(Observer):
         self.checkbox_color_var = tk.IntVar()
         self.checkbox = None
         self.result_treeview = None
+        self.result_frames = []  # Frames shown in the results table, in table order
         self.save_button = None
 
     def setup_navigation_ui_elements(self):
@@ -353,7 +463,7 @@ class MainWindow(Observer):
                 self.selected_item_manager.insert_data(data_model)
                 self.navigation_slider.set(index + 1)
                 self.selected_item_manager.selected_item.currently_processing_image = None
-                self.selected_item_manager.selected_item.image_for_processing = self.selected_item_manager.selected_item.original_image
+                self.selected_item_manager.selected_item.image_for_processing = self.selected_item_manager.selected_item.get_pipeline_input(self.data_manager.float_pipeline)
         except Exception as e:
             logger.error(f"An error occurred while selecting data in listbox: {e}")
 
@@ -376,7 +486,7 @@ class MainWindow(Observer):
     def update_image_on_rescale_slider_change(self, event=None):
         """Update the displayed image based on changes in the rescale slider."""
         try:
-            if self.selected_item_manager.selected_item.currently_processing_image == None:
+            if self.selected_item_manager.selected_item.currently_processing_image is None:
                 img = self.selected_item_manager.selected_item.image_for_processing
             else:
                 img = self.selected_item_manager.selected_item.currently_processing_image
@@ -402,6 +512,8 @@ class MainWindow(Observer):
         self.canvas.delete("all")
         # Retrieve the scale factor
         scale_factor = self.scaling_factor_var.get()
+        # Float images of the float precision pipeline are quantized only here
+        img = to_display_image(img)
         # Resize the image
         img = img.resize((int(img.width * scale_factor), int(img.height * scale_factor)), Image.LANCZOS)
 
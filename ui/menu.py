@@ -1,13 +1,16 @@
 # -*- coding: utf-8 -*-
 """
-This module creates the top menu with File and About options.
+This module creates the top menu with File, Pipeline, Settings and About options.
 
 Author:
 - Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
 """
 
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
+
+import queue
+import threading
 
 import os, sys
 
@@ -16,11 +19,19 @@ sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
 from tkinterweb import HtmlFrame 
 import markdown
 
-from data.files.read_mpp import read_mpp_file
-from data.files.read_s94 import read_s94_file
-from data.files.read_stp import read_stp_file
+from data.files.parallel_loader import ParallelFileLoader, read_data_file
+from data.pipeline import (
+    DEFAULT_BATCH_SIZE,
+    PipelineRunner,
+    load_pipeline,
+    save_pipeline,
+    normalize_operations,
+    record_pipeline_steps
+)
 
 from data.data_manager import DataManager
+from data.session import SESSION_EXTENSION
+from data.selected_item_manager import SelectedItemManager
 
 import logging
 
@@ -29,9 +40,25 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG,  # Set to DEBUG level for detailed logging
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+# Menu labels of the nearest neighbor boundary modes
+NEIGHBOR_BOUNDARY_LABELS = {
+    "none": "Visible Spots Only",
+    "exclude": "Exclude Spots Near Border",
+    "periodic": "Periodic (Wrap Around)"
+}
+
+# Menu labels of the overlay image formats
+OVERLAY_FORMAT_LABELS = {
+    "png": "PNG",
+    "tiff": "TIFF",
+    "tiff_stack": "Multi-page TIFF",
+    "bmp": "BMP (Uncompressed)",
+    "none": "Don't Save Overlays"
+}
+
 def create_menu(root):
     """
-    Create the top menu with File and About options.
+    Create the top menu with File, Pipeline, Settings and About options.
 
     Args:
         root (tk.Tk): The root Tkinter window.
@@ -47,23 +74,72 @@ def create_menu(root):
 
     # Submenu for Select Folder
     select_folder_menu = tk.Menu(file_menu, tearoff=0)
-    select_folder_menu.add_command(label="mpp", command=lambda: select_folder('mpp'))
-    select_folder_menu.add_command(label="stp", command=lambda: select_folder('stp'))
-    select_folder_menu.add_command(label="s94", command=lambda: select_folder('s94'))
+    select_folder_menu.add_command(label="mpp", command=lambda: select_folder('mpp', root=root))
+    select_folder_menu.add_command(label="mpp (lazy)", command=lambda: select_folder('mpp', lazy=True))
+    select_folder_menu.add_command(label="stp", command=lambda: select_folder('stp', root=root))
+    select_folder_menu.add_command(label="s94", command=lambda: select_folder('s94', root=root))
     file_menu.add_cascade(label="Select Folder", menu=select_folder_menu)
 
     # Submenu for Open File
     open_file_menu = tk.Menu(file_menu, tearoff=0)
     open_file_menu.add_command(label="mpp", command=lambda: open_file('mpp'))
+    open_file_menu.add_command(label="mpp (lazy)", command=lambda: open_file('mpp', lazy=True))
     open_file_menu.add_command(label="stp", command=lambda: open_file('stp'))
     open_file_menu.add_command(label="s94", command=lambda: open_file('s94'))
     file_menu.add_cascade(label="Open Files", menu=open_file_menu)
 
+    # Session options
+    file_menu.add_separator()
+    file_menu.add_command(label="Open Session", command=open_session)
+    file_menu.add_command(label="Save Session", command=save_session)
+
     # Close option
     file_menu.add_separator()
     file_menu.add_command(label="Close", command=root.quit)
     menu_bar.add_cascade(label="File", menu=file_menu)
 
+    # Pipeline menu
+    pipeline_menu = tk.Menu(menu_bar, tearoff=0)
+    pipeline_menu.add_command(label="Save Pipeline", command=save_selected_pipeline)
+    pipeline_menu.add_command(label="Apply to All Items", command=lambda: apply_pipeline_to_all(root))
+    pipeline_menu.add_command(label="Load and Apply to All Items", command=lambda: load_and_apply_pipeline(root))
+    menu_bar.add_cascade(label="Pipeline", menu=pipeline_menu)
+
+    # Settings menu
+    settings_menu = tk.Menu(menu_bar, tearoff=0)
+    settings_menu.add_command(label="Analysis Workers", command=set_analysis_workers)
+
+    boundary_menu = tk.Menu(settings_menu, tearoff=0)
+    boundary_var = tk.StringVar(root, value=DataManager().neighbor_boundary)
+    for boundary, label in NEIGHBOR_BOUNDARY_LABELS.items():
+        boundary_menu.add_radiobutton(
+            label=label,
+            value=boundary,
+            variable=boundary_var,
+            command=lambda: DataManager().set_neighbor_boundary(boundary_var.get())
+        )
+    settings_menu.add_cascade(label="Neighbor Boundary", menu=boundary_menu)
+
+    overlay_format_menu = tk.Menu(settings_menu, tearoff=0)
+    overlay_format_var = tk.StringVar(root, value=DataManager().overlay_format)
+    for overlay_format, label in OVERLAY_FORMAT_LABELS.items():
+        overlay_format_menu.add_radiobutton(
+            label=label,
+            value=overlay_format,
+            variable=overlay_format_var,
+            command=lambda: DataManager().set_overlay_format(overlay_format_var.get())
+        )
+    settings_menu.add_cascade(label="Overlay Export", menu=overlay_format_menu)
+
+    # Takes effect for the items selected and the chains applied afterwards
+    float_pipeline_var = tk.BooleanVar(root, value=DataManager().float_pipeline)
+    settings_menu.add_checkbutton(
+        label="Float Precision Pipeline",
+        variable=float_pipeline_var,
+        command=lambda: DataManager().set_float_pipeline(float_pipeline_var.get())
+    )
+    menu_bar.add_cascade(label="Settings", menu=settings_menu)
+
     # About menu
     about_menu = tk.Menu(menu_bar, tearoff=0)
     about_menu.add_command(label="About", command=show_about)
@@ -73,44 +149,330 @@ def create_menu(root):
     # Configure the menu bar
     root.config(menu=menu_bar)
 
-def select_folder(filetype):
+def select_folder(filetype, lazy=False, root=None):
     """
     Handle the 'Select Folder' action for different file types.
 
+    Unless lazy loading is requested, files are read in parallel in the background
+    while a progress dialog is shown.
+
     Args:
         filetype (str): The type of file to filter for selection (e.g., 'mpp', 'stp', 's94').
+        lazy (bool): If True, mpp frames are decoded only when first accessed.
+        root (tk.Tk, optional): The root Tkinter window; required for the parallel import.
     """
     data_manager = DataManager()
     folder_selected = filedialog.askdirectory(title=f"Select Folder for {filetype} files")
+    if not folder_selected:
+        return
     data_manager.clear_data()
-    files = [os.path.join(folder_selected, f) for f in os.listdir(folder_selected) 
+    files = [os.path.join(folder_selected, f) for f in sorted(os.listdir(folder_selected))
                 if f.endswith(filetype.lower()) or f.endswith(filetype.upper())]
+    if root is not None and not lazy:
+        import_files_in_background(root, files, filetype)
+        return
     for path in files:
-        item = read_file(path, filetype)
+        item = read_file(path, filetype, lazy)
         data_manager.insert_data(
             file_ext=filetype,
             item=item
         )
 
-def open_file(filetype):
+def open_file(filetype, lazy=False):
     """
     Handle the 'Open File' action for different file types.
 
     Args:
         filetype (str): The type of file to filter for opening (e.g., 'mpp', 'stp', 's94').
+        lazy (bool): If True, mpp frames are decoded only when first accessed.
     """
     data_manager = DataManager()
     file_types = [(f"{filetype.upper()} Files", f"*.{filetype}"), ("All Files", "*.*")]
     files_selected = filedialog.askopenfilenames(title=f"Open {filetype.upper()} File(s)", filetypes=file_types)
     data_manager.clear_data()
     for path in files_selected:
-        item = read_file(path, filetype)
+        item = read_file(path, filetype, lazy)
         data_manager.insert_data(
             file_ext=filetype,
             item=item
         )
 
 
+def open_session():
+    """
+    Replace the current items with the items of a session file.
+    """
+    path = filedialog.askopenfilename(
+        title="Open Session",
+        filetypes=[("Session Files", f"*{SESSION_EXTENSION}"), ("All Files", "*.*")]
+    )
+    if not path:
+        return
+    try:
+        DataManager().open_session(path)
+    except Exception as e:
+        logger.error(f"Error opening session: {e}")
+        messagebox.showerror("Error", f"Failed to open session: {e}")
+
+def save_session():
+    """
+    Save the current items, with their operations and analysis results, to a session file.
+    """
+    data_manager = DataManager()
+    if not data_manager.data_for_analisys:
+        messagebox.showinfo("Session", "There are no items to save.")
+        return
+    path = filedialog.asksaveasfilename(
+        title="Save Session",
+        defaultextension=SESSION_EXTENSION,
+        filetypes=[("Session Files", f"*{SESSION_EXTENSION}"), ("All Files", "*.*")]
+    )
+    if not path:
+        return
+    try:
+        data_manager.save_session(path)
+    except Exception as e:
+        logger.error(f"Error saving session: {e}")
+        messagebox.showerror("Error", f"Failed to save session: {e}")
+
+def create_progress_dialog(root, title, total, on_cancel):
+    """
+    Create a dialog with a progress bar and a cancel button.
+
+    Args:
+        root (tk.Tk): The root Tkinter window.
+        title (str): The dialog title.
+        total (int): Number of steps of the task.
+        on_cancel (callable): Called when the cancel button is pressed or the dialog is closed.
+
+    Returns:
+        tuple: The dialog window and a function setting the number of finished steps.
+    """
+    dialog = tk.Toplevel(root)
+    dialog.title(title)
+    dialog.transient(root)
+    progress_label = tk.Label(dialog, text=f"0 / {total}", width=40)
+    progress_label.grid(row=0, column=0, padx=10, pady=5)
+    progress_bar = ttk.Progressbar(dialog, orient=tk.HORIZONTAL, length=300, mode="determinate", maximum=max(total, 1))
+    progress_bar.grid(row=1, column=0, padx=10, pady=5)
+    cancel_button = tk.Button(dialog, text="Cancel", command=on_cancel)
+    cancel_button.grid(row=2, column=0, padx=10, pady=5)
+    dialog.protocol("WM_DELETE_WINDOW", on_cancel)
+
+    def set_progress(done):
+        progress_bar["value"] = done
+        progress_label.config(text=f"{done} / {total}")
+
+    return dialog, set_progress
+
+def import_files_in_background(root, files, filetype):
+    """
+    Import files with a ParallelFileLoader while showing a progress dialog.
+
+    Loading runs on a background thread; loaded items are handed over through a queue
+    and inserted into the DataManager on the Tk main thread, in file order.
+
+    Args:
+        root (tk.Tk): The root Tkinter window.
+        files (list): Paths of the files to import.
+        filetype (str): The type of the files ('mpp', 'stp', 's94').
+    """
+    data_manager = DataManager()
+    loader = ParallelFileLoader()
+    results = queue.Queue()
+    failed = []
+
+    dialog, set_progress = create_progress_dialog(root, f"Importing {filetype} files", len(files), loader.cancel)
+
+    def load():
+        try:
+            loader.load(
+                files,
+                filetype,
+                on_item=lambda item: results.put(("item", item)),
+                on_progress=lambda done, total: results.put(("progress", done)),
+                on_error=lambda path, e: results.put(("error", (path, e)))
+            )
+        except Exception as e:
+            logger.error(f"Error importing {filetype} files: {e}")
+            results.put(("error", (None, e)))
+        finally:
+            results.put(("done", None))
+
+    def poll_results():
+        inserted = False
+        finished = False
+        try:
+            while True:
+                kind, value = results.get_nowait()
+                if kind == "item":
+                    data_manager.insert_data(file_ext=filetype, item=value, notify=False)
+                    inserted = True
+                elif kind == "progress":
+                    set_progress(value)
+                elif kind == "error":
+                    failed.append(value)
+                elif kind == "done":
+                    finished = True
+                    break
+        except queue.Empty:
+            pass
+
+        # Observers are notified once per batch rather than once per file
+        if inserted:
+            data_manager.notify_observers()
+
+        if finished:
+            dialog.destroy()
+            if failed:
+                names = ", ".join(os.path.basename(path) for path, _ in failed if path)
+                messagebox.showerror("Error", f"Failed to read {len(failed)} {filetype} file(s): {names}")
+        else:
+            root.after(50, poll_results)
+
+    threading.Thread(target=load, daemon=True).start()
+    poll_results()
+
+def save_selected_pipeline():
+    """
+    Save the operation chain of the selected item to a JSON file.
+    """
+    selected_item = SelectedItemManager().selected_item
+    operations = selected_item.get_pipeline() if selected_item else []
+    if not operations:
+        messagebox.showinfo("Pipeline", "The selected item has no operations to save.")
+        return
+    path = filedialog.asksaveasfilename(
+        title="Save Pipeline",
+        defaultextension=".json",
+        filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")]
+    )
+    if not path:
+        return
+    try:
+        save_pipeline(path, operations)
+    except Exception as e:
+        logger.error(f"Error saving pipeline: {e}")
+        messagebox.showerror("Error", f"Failed to save pipeline: {e}")
+
+def load_and_apply_pipeline(root):
+    """
+    Load an operation chain from a JSON file and apply it to all items.
+
+    Args:
+        root (tk.Tk): The root Tkinter window.
+    """
+    path = filedialog.askopenfilename(
+        title="Load Pipeline",
+        filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")]
+    )
+    if not path:
+        return
+    try:
+        operations = load_pipeline(path)
+    except Exception as e:
+        logger.error(f"Error loading pipeline: {e}")
+        messagebox.showerror("Error", f"Failed to load pipeline: {e}")
+        return
+    apply_pipeline_to_all(root, operations)
+
+def apply_pipeline_to_all(root, operations=None):
+    """
+    Apply an operation chain to the original image of every item in the DataManager, or to its
+    float heights in the float precision pipeline mode.
+
+    The chain runs in parallel on a background thread while a progress dialog is shown;
+    the results are recorded on the Tk main thread as they arrive, replacing the operations of each item.
+
+    Args:
+        root (tk.Tk): The root Tkinter window.
+        operations (list, optional): List of dictionaries with 'name' and 'params' keys;
+            the chain of the selected item is used if not given.
+    """
+    if operations is None:
+        selected_item = SelectedItemManager().selected_item
+        operations = selected_item.get_pipeline() if selected_item else []
+    if not operations:
+        messagebox.showinfo("Pipeline", "There are no operations to apply.")
+        return
+
+    try:
+        operations = normalize_operations(operations)
+    except Exception as e:
+        logger.error(f"Invalid pipeline: {e}")
+        messagebox.showerror("Error", f"Invalid pipeline: {e}")
+        return
+
+    # A snapshot, so that items removed in the meantime don't shift the indexes
+    items = list(DataManager().data_for_analisys)
+    float_pipeline = DataManager().float_pipeline
+    runner = PipelineRunner(batch_size=DEFAULT_BATCH_SIZE)
+    results = queue.Queue()
+    failed = []
+
+    dialog, set_progress = create_progress_dialog(root, "Applying pipeline", len(items), runner.cancel)
+
+    def run():
+        try:
+            runner.run(
+                (item.get_pipeline_input(float_pipeline) for item in items),
+                operations,
+                on_result=lambda index, steps: results.put(("result", (index, steps))),
+                on_progress=lambda done, total: results.put(("progress", done)),
+                on_error=lambda index, e: results.put(("error", (index, e))),
+                total=len(items)
+            )
+        except Exception as e:
+            logger.error(f"Error applying pipeline: {e}")
+            results.put(("error", (None, e)))
+        finally:
+            results.put(("done", None))
+
+    def poll_results():
+        finished = False
+        try:
+            while True:
+                kind, value = results.get_nowait()
+                if kind == "result":
+                    index, steps = value
+                    record_pipeline_steps(items[index], operations, steps)
+                elif kind == "progress":
+                    set_progress(value)
+                elif kind == "error":
+                    failed.append(value)
+                elif kind == "done":
+                    finished = True
+                    break
+        except queue.Empty:
+            pass
+
+        if finished:
+            dialog.destroy()
+            if failed:
+                names = ", ".join(items[index].data_name for index, _ in failed if index is not None)
+                messagebox.showerror("Error", f"Failed to apply pipeline to {len(failed)} item(s): {names}")
+        else:
+            root.after(50, poll_results)
+
+    threading.Thread(target=run, daemon=True).start()
+    poll_results()
+
+def set_analysis_workers():
+    """
+    Ask for the number of worker processes used by spot analysis.
+    """
+    data_manager = DataManager()
+    current = data_manager.analysis_workers or os.cpu_count() or 1
+    workers = simpledialog.askinteger(
+        "Analysis Workers",
+        "Number of worker processes used by spot analysis:",
+        initialvalue=current,
+        minvalue=1,
+        maxvalue=max(os.cpu_count() or 1, current)
+    )
+    if workers is not None:
+        data_manager.set_analysis_workers(workers)
+
 def show_about():
     """
     Show information about the application.
@@ -140,27 +502,20 @@ def show_docs(root):
     # Load the HTML content into the HtmlFrame
     html_frame.load_html(html_content)
 
-def read_file(file_path, file_type):
+def read_file(file_path, file_type, lazy=False):
     """
     Read the file based on its type.
 
     Args:
         file_path (str): The path to the file to be read.
         file_type (str): The type of the file ('s94', 'stp', 'mpp').
+        lazy (bool): If True, mpp frames are returned as proxies decoded on first access.
 
     Returns:
         Object: The content of the file based on its type.
     """
     try:
-        if file_type == "s94":
-            return read_s94_file(file_path)
-        elif file_type == "stp":
-            return read_stp_file(file_path)
-        elif file_type == "mpp":
-            return read_mpp_file(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_type}")
-        
+        return read_data_file(file_path, file_type, lazy=lazy)
     except Exception as e:
         logger.error(f"Error reading {file_type} file: {e}")
         messagebox.showerror("Error", f"Failed to read {file_type} file: {e}")
@@ -14,12 +14,13 @@ sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
 import tkinter as tk
 
 from tkinter import ttk
+from PIL import Image
 from ui.custom_dropdown import CustomDropdownMenu
 
-from data.preprocessing.preprocess_params_default import preprocess_params
-from data.processing.process_params_default import threshold_params, process_params
-from data.options_config import options_config
-from data.options_config import preprocess_operations, process_operations
+from data.operation_registry import OPERATION_CATEGORIES, get_operation, get_operations
+from data.pipeline import apply_operation
+from ui.preview_worker import PreviewWorker, downscale_for_preview
+from data.image_conversion import image_size, resize_image
 
 from data.selected_item_manager import SelectedItemManager
 from data.model.operation_model import OperationModel
@@ -31,6 +32,11 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG,  # Set to DEBUG level for detailed logging
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+# Slider events arriving within this interval (ms) are merged into a single preview
+PREVIEW_DELAY_MS = 150
+# Interval (ms) of checking whether the background preview has finished
+PREVIEW_POLL_MS = 30
+
 def create_operations_ui(
         root,
         selected_operation
@@ -50,24 +56,24 @@ def create_operations_ui(
     operations_ui_section = ttk.Frame(root, padding="5")
     operations_ui_section.grid(row=0, column=1, padx=5, pady=2, sticky="nsew")
 
-    preprocessing_options = list(preprocess_params.keys())
-    threshold_options = list(threshold_params.keys())
-    processing_options = list(process_params.keys())
-
     categories = {
-        "Preprocessing": preprocessing_options,
-        "Thresholding": threshold_options,
-        "Binary Process": processing_options
+        category: [operation.name for operation in get_operations(category)]
+        for category in OPERATION_CATEGORIES
     }
 
     parameter_process_entries = {}
     parameter_process_labels = {}
     parameter_process_buttons = []
-    parameter_process_sliders = []
+    parameter_process_sliders = {}
+    parameter_process_choices = {}
     parameter_process_radio = []
     parameter_process_dropdown = []
 
-    selected_option_var = tk.StringVar()
+    preview_worker = PreviewWorker()
+    preview_state = {"after_id": None, "poll_id": None, "source": None, "downscaled": None}
+    # Apply runs on its own worker, so that previews requested meanwhile never supersede it
+    apply_worker = PreviewWorker()
+    apply_state = {"poll_id": None}
 
     def choose_process_options_dropdownOnChange(selected_option):
         """
@@ -79,7 +85,7 @@ def create_operations_ui(
             for widget in [*parameter_process_entries.values(),
                         *parameter_process_labels.values(),
                         *parameter_process_buttons,
-                        *parameter_process_sliders,
+                        *parameter_process_sliders.values(),
                         *parameter_process_radio,
                         *parameter_process_dropdown]:
                 widget.destroy()
@@ -89,57 +95,38 @@ def create_operations_ui(
             parameter_process_labels.clear()
             parameter_process_buttons.clear()
             parameter_process_sliders.clear()
+            parameter_process_choices.clear()
             parameter_process_radio.clear()
             parameter_process_dropdown.clear()
 
-            # options_config
-
-            config = options_config.get(selected_option, {})
+            operation = get_operation(selected_option)
             row = 1 # Initialize row for layout
 
-            # Handle radio buttons
-            if "radio_buttons" in config:
-                selected_option_var.set(config["radio_buttons"][0][1])  # Set default value
-                
-                for text, value in config["radio_buttons"]:
-                    radio = tk.Radiobutton(operations_ui_section, text=text, variable=selected_option_var, value=value, command=process_and_display_image)
-                    radio.grid(row=row, column=0, padx=5, pady=1, sticky="w")
-                    parameter_process_radio.append(radio)
-                    row += 1
-
-            # Handle labels and sliders
-            if "labels" in config:
-                for label_text, default_value in config["labels"]:
-                    label = tk.Label(operations_ui_section, text=label_text, width=20)
+            for param in operation.params:
+                if param.is_choice:
+                    # Radio buttons, one per allowed value
+                    choice_var = tk.StringVar(value=param.default)
+                    parameter_process_choices[param.name] = choice_var
+                    for text, value in param.choices:
+                        radio = tk.Radiobutton(operations_ui_section, text=text, variable=choice_var, value=value, command=schedule_preview)
+                        radio.grid(row=row, column=0, padx=5, pady=1, sticky="w")
+                        parameter_process_radio.append(radio)
+                        row += 1
+                else:
+                    # Label and slider
+                    label = tk.Label(operations_ui_section, text=param.label, width=20)
                     label.grid(row=row, column=0, padx=5, pady=1, sticky="w")
-                    parameter_process_labels[label_text] = label
-                    
-                    slider_config = next((item for item in config.get("sliders", []) if item.get("value") == default_value), {})
-                    if slider_config:
-                        slider = tk.Scale(operations_ui_section, from_=slider_config.get("from_", 0), to=slider_config.get("to", 100), resolution=slider_config.get("resolution", 1), orient=tk.HORIZONTAL, command=update_sliders_onChange, length=150)
-                        slider.set(default_value)
-                        slider.grid(row=row + 1, column=0, padx=5, pady=2, sticky="w")
-                        parameter_process_sliders.append(slider)
-                    
-                    row += 2
+                    parameter_process_labels[param.name] = label
 
-            # Handle single slider configurations
-            if "slider_config" in config:
-                label_text = config["label_text"]
-                default_value = config["slider_config"].get("value")
-                label = tk.Label(operations_ui_section, text=label_text, width=20)
-                label.grid(row=row, column=0, padx=5, pady=1, sticky="w")
-                parameter_process_labels[label_text] = label
-                
-                slider = tk.Scale(operations_ui_section, from_=config["slider_config"].get("from_", 0), to=config["slider_config"].get("to", 100), resolution=config["slider_config"].get("resolution", 1), orient=tk.HORIZONTAL, command=update_sliders_onChange, length=150)
-                slider.set(default_value)
-                slider.grid(row=row + 1, column=0, padx=5, pady=2, sticky="w")
-                parameter_process_sliders.append(slider)
-                
-                row += 2
+                    slider = tk.Scale(operations_ui_section, from_=param.minimum, to=param.maximum, resolution=param.resolution, orient=tk.HORIZONTAL, command=update_sliders_onChange, length=150)
+                    slider.set(param.default)
+                    slider.grid(row=row + 1, column=0, padx=5, pady=2, sticky="w")
+                    parameter_process_sliders[param.name] = slider
+                    row += 2
 
             # Apply button
-            apply_button = tk.Button(operations_ui_section, text="Apply", command=apply_preprocessing_onClick)
+            apply_button = tk.Button(operations_ui_section, text="Apply", command=apply_preprocessing_onClick,
+                                     state=tk.DISABLED if apply_state["poll_id"] is not None else tk.NORMAL)
             apply_button.grid(row=row + 2, column=0, padx=5, pady=5)
             parameter_process_buttons.append(apply_button)
         
@@ -152,48 +139,158 @@ def create_operations_ui(
         Handle the slider change event to update the displayed image.
         """
         try:
-            process_and_display_image()
+            schedule_preview()
         except Exception as e:
             logger.error(f"Error updating sliders: {e}")
 
+    def schedule_preview():
+        """
+        Debounce parameter changes: the preview is computed once they stop for PREVIEW_DELAY_MS.
+        """
+        if preview_state["after_id"] is not None:
+            root.after_cancel(preview_state["after_id"])
+        preview_state["after_id"] = root.after(PREVIEW_DELAY_MS, process_and_display_image)
+
+    def cancel_preview():
+        """
+        Cancel the scheduled and the running preview.
+        """
+        for key in ("after_id", "poll_id"):
+            if preview_state[key] is not None:
+                root.after_cancel(preview_state[key])
+                preview_state[key] = None
+        preview_worker.cancel()
+
+    def get_preview_source(img):
+        """
+        Get the image the preview is computed on, downscaling large images once per source image.
+        """
+        if preview_state["source"] is not img:
+            preview_state["source"] = img
+            preview_state["downscaled"] = downscale_for_preview(img)
+        return preview_state["downscaled"]
+
     def process_and_display_image():
         """
-        Process the image using the selected operation and display the result.
+        Process a preview image using the selected operation in the background and display the result.
+
+        Large images are previewed on a downscaled copy; the full resolution result is computed on Apply.
         """
         try:
+            preview_state["after_id"] = None
             params = {}
 
-            img = selected_item_manager.selected_item.image_for_processing
+            item = selected_item_manager.selected_item
+            img = item.image_for_processing
             get_values_from_preprocess_menu_items(params)
-            result_image, _ = apply_processing_operation(params, img)
-            selected_item_manager.selected_item.currently_processing_image = result_image
+            operation_name = selected_operation.get()
+            preview_source = get_preview_source(img)
+
+            def compute():
+                # Results of downscaled previews would only evict full resolution results from the cache
+                _, result_image = apply_operation(operation_name, params, preview_source, cache=preview_source is img)
+                if image_size(result_image) != image_size(img):
+                    result_image = resize_image(result_image, image_size(img), Image.NEAREST)
+                return item, result_image
+
+            preview_worker.submit(compute)
+            if preview_state["poll_id"] is None:
+                preview_state["poll_id"] = root.after(PREVIEW_POLL_MS, poll_preview)
         
         except Exception as e:
             logger.error(f"Error processing image: {e}")
+
+    def poll_preview():
+        """
+        Display the preview once the background worker has finished it.
+        """
+        try:
+            finished, result = preview_worker.get_result()
+            if not finished:
+                preview_state["poll_id"] = root.after(PREVIEW_POLL_MS, poll_preview)
+                return
+
+            preview_state["poll_id"] = None
+            if result is not None:
+                item, result_image = result
+                # The selection may have changed while the preview was computed
+                if item is selected_item_manager.selected_item:
+                    item.currently_processing_image = result_image
+        except Exception as e:
+            preview_state["poll_id"] = None
+            logger.error(f"Error displaying preview: {e}")
     
     def apply_preprocessing_onClick():
         """
         Apply the selected preprocessing operation to the image.
+
+        The full resolution result is computed on a background thread; the Apply button is disabled
+        until it is recorded. Interactive operations open OpenCV windows and run on the UI thread.
         """
         try:
+            if apply_state["poll_id"] is not None:
+                return
+            cancel_preview()
             params = {}
-            img = selected_item_manager.selected_item.image_for_processing
-
-            result_image = None
-            process_name = None
+            item = selected_item_manager.selected_item
+            img = item.image_for_processing
+            operation_name = selected_operation.get()
 
             get_values_from_preprocess_menu_items(params)
-            # Apply preprocessing based on selected option and parameters
-            result_image, process_name = apply_processing_operation(params, img)
-            operation = OperationModel(process_name, result_image)
+            if get_operation(operation_name).interactive:
+                result_image, process_name = apply_processing_operation(params, img)
+                record_applied_operation(item, operation_name, params, process_name, result_image)
+                return
 
-            selected_item_manager.selected_item.add_operation(operation)
-            selected_item_manager.selected_item.image_for_processing = result_image
-            selected_item_manager.selected_item.currently_processing_image = None
-            selected_item_manager.selected_item.image_for_analisys = result_image
+            def compute():
+                process_name, result_image = apply_operation(operation_name, params, img)
+                return item, img, operation_name, params, process_name, result_image
+
+            apply_worker.submit(compute)
+            set_apply_buttons_state(tk.DISABLED)
+            apply_state["poll_id"] = root.after(PREVIEW_POLL_MS, poll_apply)
 
         except Exception as e:
             logger.error(f"Error applying preprocessing: {e}")
+
+    def poll_apply():
+        """
+        Record the applied operation once the background worker has finished it.
+        """
+        try:
+            finished, result = apply_worker.get_result()
+            if not finished:
+                apply_state["poll_id"] = root.after(PREVIEW_POLL_MS, poll_apply)
+                return
+
+            apply_state["poll_id"] = None
+            set_apply_buttons_state(tk.NORMAL)
+            if result is not None:
+                item, img, operation_name, params, process_name, result_image = result
+                # Loading another chain meanwhile replaces the image the operation was applied to
+                if item.image_for_processing is img:
+                    record_applied_operation(item, operation_name, params, process_name, result_image)
+                else:
+                    logger.warning(f"{operation_name} was not recorded: the image changed while it was applied.")
+        except Exception as e:
+            apply_state["poll_id"] = None
+            set_apply_buttons_state(tk.NORMAL)
+            logger.error(f"Error applying preprocessing: {e}")
+
+    def set_apply_buttons_state(state):
+        for button in parameter_process_buttons:
+            button.config(state=state)
+
+    def record_applied_operation(item, operation_name, params, process_name, result_image):
+        """
+        Add the applied operation to the item and make its result the image for processing.
+        """
+        operation = OperationModel(process_name, result_image, operation_name, params)
+
+        item.add_operation(operation)
+        item.image_for_processing = result_image
+        item.currently_processing_image = None
+        item.image_for_analisys = result_image
     
     def apply_processing_operation(params, img):
         """
@@ -207,17 +304,7 @@ def create_operations_ui(
             tuple: The processed image and the name of the operation.
         """
         try:
-            if selected_operation.get() in preprocess_operations:
-                process_function = preprocess_operations[selected_operation.get()]
-                process_name, result_image = process_function(params, img)
-            elif selected_operation.get() in process_operations:
-                process_function = process_operations[selected_operation.get()]
-                process_name, result_image = process_function(params, img)
-            else:
-                msg = f"Invalid preprocessing option: {selected_operation}"
-                # logger.error(msg)
-                raise ValueError(msg)
-                
+            process_name, result_image = apply_operation(selected_operation.get(), params, img)
             return result_image, process_name
         
         except Exception as e:
@@ -232,138 +319,14 @@ def create_operations_ui(
             params (dict): The dictionary to store the parameters.
         """
         try:
-            option = selected_operation.get()
-
-            def add_odd_value(slider):
-                value = slider.get()
-                return value + 1 if value % 2 == 0 else value
-
-
-            preprocess_map = {
-                "GaussianFilter": lambda: params.update({'sigma': parameter_process_sliders[0].get()}),
-                "Gamma Adjustment": lambda: params.update({'gamma': parameter_process_sliders[0].get()}),
-                "Adaptive Equalization": lambda: params.update({'limit': parameter_process_sliders[0].get()}),
-                "Contrast Stretching": lambda: params.update({
-                    'min': parameter_process_sliders[0].get(),
-                    'max': parameter_process_sliders[1].get()
-                }),
-                "Gaussian Blur": lambda: params.update({
-                    'sigmaY': add_odd_value(parameter_process_sliders[0]),
-                    'sigmaX': add_odd_value(parameter_process_sliders[1])
-                }),
-                "Non-local Mean Denoising": lambda: params.update({
-                    'h': parameter_process_sliders[0].get(),
-                    'templateWindowSize': parameter_process_sliders[1].get(),
-                    'searchWindowSize': add_odd_value(parameter_process_sliders[2])
-                }),
-                "Erosion": lambda: params.update({
-                    'kernel_type': selected_option_var.get(),
-                    'iterations': parameter_process_sliders[1].get(),
-                    'kernel_size': add_odd_value(parameter_process_sliders[0])
-                }),
-                "Propagation": lambda: params.update({
-                    'type': selected_option_var.get(),
-                    'marker_value': parameter_process_sliders[0].get(),
-                }),
-                "Polynomial Leveling": lambda: params.update({
-                    'order': parameter_process_sliders[0].get(),
-                }),
-                "Adaptive Leveling": lambda: params.update({
-                    'disk_size': parameter_process_sliders[0].get(),
-                }),
-                "Local Median Filter": lambda: params.update({
-                    'size': parameter_process_sliders[0].get(),
-                }),
-                "Binary Greyscale Erosion": lambda: params.update({
-                    'kernel_type': selected_option_var.get(),
-                    'kernel_size': add_odd_value(parameter_process_sliders[0])
-                }),
-                "Gaussian Greyscale Erosion": lambda: params.update({
-                    'mask_size': add_odd_value(parameter_process_sliders[0]),
-                    'sigma': parameter_process_sliders[1].get()
-                }),
-                "Binary Greyscale Dilation": lambda: params.update({
-                    'kernel_type': selected_option_var.get(),
-                    'kernel_size': add_odd_value(parameter_process_sliders[0])
-                }),
-                "Gaussian Greyscale Dilation": lambda: params.update({
-                    'mask_size': add_odd_value(parameter_process_sliders[0]),
-                    'sigma': parameter_process_sliders[1].get()
-                }),
-                "Binary Greyscale Opening": lambda: params.update({
-                    'kernel_type': selected_option_var.get(),
-                    'kernel_size': add_odd_value(parameter_process_sliders[0])
-                }),
-                "Gaussian Greyscale Opening": lambda: params.update({
-                    'mask_size': add_odd_value(parameter_process_sliders[0]),
-                    'sigma': parameter_process_sliders[1].get()
-                }),
-                "Binary Greyscale Closing": lambda: params.update({
-                    'kernel_type': selected_option_var.get(),
-                    'kernel_size': add_odd_value(parameter_process_sliders[0])
-                }),
-                "White Top Hat": lambda: params.update({
-                    'selem_type': selected_option_var.get(),
-                    'selem_size': parameter_process_sliders[0].get()
-                }),
-                "Black Top Hat": lambda: params.update({
-                    'selem_type': selected_option_var.get(),
-                    'selem_size': parameter_process_sliders[0].get()
-                }),
-                "Gaussian Greyscale Closing": lambda: params.update({
-                    'mask_size': add_odd_value(parameter_process_sliders[0]),
-                    'sigma': parameter_process_sliders[1].get()
-                }),
-                "Gaussian Sharpening": lambda: params.update({
-                    'radius': parameter_process_sliders[0].get(),
-                    'amount': parameter_process_sliders[1].get()
-                }),
-                "Local Threshold": lambda: params.update({
-                    'method': selected_option_var.get(),
-                    'block_size': parameter_process_sliders[0].get(),
-                    'offset': parameter_process_sliders[1].get()
-                }),
-                "Niblack Threshold": lambda: params.update({
-                    'window_size': parameter_process_sliders[0].get(),
-                    'k': parameter_process_sliders[1].get()
-                }),
-                "Sauvola Threshold": lambda: params.update({
-                    'window_size': parameter_process_sliders[0].get(),
-                    'k': parameter_process_sliders[1].get(),
-                    'r': parameter_process_sliders[2].get()
-                }),
-                "Binary Erosion": lambda: params.update({
-                    'footprint_type': selected_option_var.get(),
-                    'footprint_size': parameter_process_sliders[0].get()
-                }),
-                "Binary Dilation": lambda: params.update({
-                    'footprint_type': selected_option_var.get(),
-                    'footprint_size': parameter_process_sliders[0].get()
-                }),
-                "Binary Opening": lambda: params.update({
-                    'footprint_type': selected_option_var.get(),
-                    'footprint_size': parameter_process_sliders[0].get()
-                }),
-                "Binary Closing": lambda: params.update({
-                    'footprint_type': selected_option_var.get(),
-                    'footprint_size': parameter_process_sliders[0].get()
-                }),
-                "Remove Small Holes": lambda: params.update({
-                    'area_threshold': parameter_process_sliders[0].get(),
-                    'connectivity': parameter_process_sliders[1].get()
-                }),
-                "Remove Small Objects": lambda: params.update({
-                    'min_size': parameter_process_sliders[0].get(),
-                    'connectivity': parameter_process_sliders[1].get()
-                }),
-                "Binary Threshold": lambda: params.update({
-                    'threshold': parameter_process_sliders[0].get()
-                }),
-            }
-
-            # Apply the corresponding function based on the selected preprocess option
-            if option in preprocess_map:
-                preprocess_map[option]()
+            operation = get_operation(selected_operation.get())
+
+            # Values are converted to the declared types; odd parameters are rounded up to an odd value
+            for param in operation.params:
+                if param.name in parameter_process_choices:
+                    params[param.name] = param.coerce(parameter_process_choices[param.name].get())
+                elif param.name in parameter_process_sliders:
+                    params[param.name] = param.coerce(parameter_process_sliders[param.name].get())
 
             # Handle any additional parameters from preprocess menu items
             for param_name, entry in parameter_process_entries.items():
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Background computation of live previews.
+
+This module defines the `PreviewWorker` class, a single background thread computing previews
+for the operations UI. Only the most recent request is kept: requests superseded before they
+start are dropped, and results of requests superseded while running are discarded, so the UI
+thread never waits for an operation and never shows a stale preview.
+
+@author
+Author: Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import queue
+import threading
+
+import numpy as np
+from PIL import Image
+
+from data.image_conversion import image_size, resize_image
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Images with a longer side above this size are previewed on a downscaled copy
+PREVIEW_MAX_SIZE = 1024
+
+def downscale_for_preview(img, max_size=PREVIEW_MAX_SIZE):
+    """
+    Downscale an image so that its longer side does not exceed max_size.
+
+    Args:
+        img (PIL.Image.Image or numpy.ndarray): The image to downscale, a PIL image or a float image.
+        max_size (int): Maximum length of the longer side.
+
+    Returns:
+        PIL.Image.Image or numpy.ndarray: The downscaled image, or the image itself if it is small enough.
+    """
+    width, height = image_size(img)
+    scale = max_size / max(width, height)
+    if scale >= 1:
+        return img
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    # Binary images must stay binary
+    resample = Image.NEAREST if is_binary_image(img) else Image.BILINEAR
+    return resize_image(img, size, resample)
+
+def is_binary_image(img):
+    """
+    Check whether an image is binary, a PIL image of mode '1' or a boolean array.
+    """
+    if isinstance(img, np.ndarray):
+        return img.dtype == bool
+    return img.mode == "1"
+
+class PreviewWorker:
+    """
+    Computes previews on a background thread, keeping only the latest request.
+    """
+    def __init__(self):
+        """
+        Initialize the worker and start its thread.
+        """
+        self._lock = threading.Lock()
+        self._request_ready = threading.Event()
+        self._request = None
+        self._generation = 0
+        self._results = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def submit(self, compute):
+        """
+        Request a preview, superseding any earlier request.
+
+        Args:
+            compute (callable): Function without arguments returning the preview.
+
+        Returns:
+            int: The generation of the request.
+        """
+        with self._lock:
+            self._generation += 1
+            self._request = (self._generation, compute)
+        self._request_ready.set()
+        return self._generation
+
+    def cancel(self):
+        """
+        Drop the pending request and discard the result of the running one.
+        """
+        with self._lock:
+            self._generation += 1
+            self._request = None
+
+    def get_result(self):
+        """
+        Return the result of the most recent request if it has finished, discarding stale ones.
+
+        Returns:
+            tuple: A flag telling whether the most recent request has finished, and its result
+                   (None if the computation failed).
+        """
+        finished, result = False, None
+        try:
+            while True:
+                generation, value = self._results.get_nowait()
+                if generation == self._generation:
+                    finished, result = True, value
+        except queue.Empty:
+            pass
+        return finished, result
+
+    def _run(self):
+        while True:
+            self._request_ready.wait()
+            with self._lock:
+                request = self._request
+                self._request = None
+                self._request_ready.clear()
+            if request is None:
+                continue
+
+            generation, compute = request
+            try:
+                result = compute()
+            except Exception as e:
+                logger.error(f"Error computing preview: {e}")
+                result = None
+            if generation == self._generation:
+                self._results.put((generation, result))
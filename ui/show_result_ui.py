@@ -14,6 +14,8 @@ import tkinter as tk
 
 from tkinter import ttk
 
+from ui.virtual_table import VirtualTable
+
 import logging
 
 # Configure logging
@@ -21,6 +23,16 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG,  # Set to DEBUG level for detailed logging
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+# Columns of the results table: id (column of the results model), heading and width
+RESULT_TABLE_COLUMNS = [
+    ("label", "Label", 40),
+    ("area", "Area", 60),
+    ("distance", "Distance", 60),
+    ("neighbor", "Neighbor", 40),
+    ("knn", "k-NN", 60),
+    ("voronoi", "Voronoi", 60)
+]
+
 def create_show_result_ui(
     root,
     checkbox,
@@ -29,13 +41,13 @@ def create_show_result_ui(
     save_button        
 ):
     """
-    Creates the result display UI section with a Treeview, a checkbox, and save/delete buttons.
+    Creates the result display UI section with a virtualized results table, a range filter, a checkbox, and save/delete buttons.
 
     Args:
         root (tk.Tk): The root Tkinter window.
         checkbox (tk.Checkbutton): The checkbox widget.
         checkbox_color_var (tk.IntVar): The variable associated with the checkbox for toggling color.
-        result_treeview (ttk.Treeview): The Treeview widget for displaying results.
+        result_treeview (VirtualTable): The table displaying results.
         delete_button (tk.Button): The button widget for deleting selected items.
         save_button (tk.Button): The button widget for saving the displayed results.
 
@@ -46,32 +58,33 @@ def create_show_result_ui(
         result_ui_section = ttk.Frame(root, padding="5")
         result_ui_section.grid(row=0, column=3, rowspan=3, padx=5, pady=2, sticky="nsew")
 
-        result_treeview = ttk.Treeview(result_ui_section)
-        result_treeview.grid(row=0, column=0, columnspan=2, sticky="ns")
-
-        treeview_scrollbar = tk.Scrollbar(
-            result_ui_section, 
-            orient=tk.VERTICAL
-            # command=self.measurement_results_treeview.yview
-            )
-        treeview_scrollbar.grid(row=0, column=2, sticky="ns")
-
-        # result_treeview.bind("<<TreeviewSelect>>", self.treeview_onSelect)
-
-        # Define columns
-        result_treeview["columns"] = ("label", "area", "distance", "neighbor")
-        result_treeview.column("#0", width=60, minwidth=25)
-        result_treeview.column("label", width=40, minwidth=25)
-        result_treeview.column("area", width=60, minwidth=25)
-        result_treeview.column("distance", width=60, minwidth=25)
-        result_treeview.column("neighbor", width=40, minwidth=25)
-
-        # Define headings
-        result_treeview.heading("#0", text="Frame", anchor=tk.W)
-        result_treeview.heading("label", text="Label", anchor=tk.W)
-        result_treeview.heading("area", text="Area", anchor=tk.W)
-        result_treeview.heading("distance", text="Distance", anchor=tk.W)
-        result_treeview.heading("neighbor", text="Neighbor", anchor=tk.W)
+        result_treeview = VirtualTable(result_ui_section, RESULT_TABLE_COLUMNS)
+        result_treeview.treeview.grid(row=0, column=0, columnspan=2, sticky="ns")
+        result_treeview.scrollbar.grid(row=0, column=2, sticky="ns")
+
+        # Range filter on a numeric column
+        filter_section = ttk.Frame(result_ui_section)
+        filter_section.grid(row=3, column=0, columnspan=3, sticky="we")
+        filter_columns = {heading: column for column, heading, _ in RESULT_TABLE_COLUMNS if column not in ("label", "neighbor")}
+        filter_column_var = tk.StringVar(value=next(iter(filter_columns)))
+        filter_min_var = tk.StringVar()
+        filter_max_var = tk.StringVar()
+
+        def apply_filter():
+            try:
+                minimum = float(filter_min_var.get()) if filter_min_var.get().strip() else None
+                maximum = float(filter_max_var.get()) if filter_max_var.get().strip() else None
+            except ValueError:
+                logger.error("Filter bounds must be numbers")
+                return
+            column = filter_columns[filter_column_var.get()] if minimum is not None or maximum is not None else None
+            result_treeview.set_filter(column, minimum, maximum)
+
+        ttk.Combobox(filter_section, textvariable=filter_column_var, values=list(filter_columns), state="readonly", width=8).grid(row=0, column=0, padx=2)
+        ttk.Entry(filter_section, textvariable=filter_min_var, width=7).grid(row=0, column=1, padx=2)
+        ttk.Label(filter_section, text="-").grid(row=0, column=2)
+        ttk.Entry(filter_section, textvariable=filter_max_var, width=7).grid(row=0, column=3, padx=2)
+        ttk.Button(filter_section, text="Filter", command=apply_filter).grid(row=0, column=4, padx=2)
 
         # self.checkbox_color_var = tk.IntVar()
 
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Virtualized results table.
+
+This module defines the `VirtualTable` class, a `ttk.Treeview` showing a `ResultsTableModel`.
+The Treeview only ever holds the rows that fit in its window; scrolling replaces them with the
+rows at the new position, so tables with millions of spots display instantly. Clicking a frame row
+expands or collapses the frame, clicking a column heading sorts the spots of every frame by it.
+
+Author:
+- Rafał Lewandków (rafal.lewandkow2@uwr.edu.pl)
+"""
+
+import os, sys
+
+sys.path.insert(1, "/".join(os.path.realpath(__file__).split("/")[0:-2]))
+
+import tkinter as tk
+
+from tkinter import ttk
+
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG,  # Set to DEBUG level for detailed logging
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+class VirtualTable:
+    """
+    A Treeview materializing only the visible rows of a ResultsTableModel.
+
+    Attributes:
+        treeview (ttk.Treeview): The Treeview widget.
+        scrollbar (tk.Scrollbar): The vertical scrollbar of the table.
+    """
+    def __init__(self, parent, columns, height=25):
+        """
+        Create the Treeview and its scrollbar; the caller places them.
+
+        Args:
+            parent (tk.Widget): The parent widget.
+            columns (list): Tuples (column id, heading, width); the ids are the column names of the
+                            models shown in the table.
+            height (int): Number of visible rows.
+        """
+        self._model = None
+        self._first_row = 0
+        self._height = height
+        self._selected = None
+        self._current = None
+
+        self.treeview = ttk.Treeview(parent, columns=[column for column, _, _ in columns], height=height, selectmode="browse")
+        self.treeview.column("#0", width=80, minwidth=25)
+        self.treeview.heading("#0", text="Frame", anchor=tk.W)
+        for column, heading, width in columns:
+            self.treeview.column(column, width=width, minwidth=25)
+            self.treeview.heading(column, text=heading, anchor=tk.W, command=lambda column=column: self.sort_by(column))
+
+        self.scrollbar = tk.Scrollbar(parent, orient=tk.VERTICAL, command=self._on_scrollbar)
+
+        self.treeview.bind("<<TreeviewSelect>>", self._on_select)
+        self.treeview.bind("<MouseWheel>", self._on_mouse_wheel)
+        self.treeview.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.treeview.bind("<Button-5>", lambda event: self.scroll(3))
+
+    @property
+    def model(self):
+        return self._model
+
+    def bind(self, sequence, func):
+        """
+        Bind an event handler to the Treeview, in addition to the handlers of the table.
+        """
+        return self.treeview.bind(sequence, func, add="+")
+
+    def set_model(self, model):
+        """
+        Show a model, scrolled to the top.
+
+        Args:
+            model (ResultsTableModel): The model; None clears the table.
+        """
+        self._model = model
+        self._first_row = 0
+        self._selected = None
+        self._current = None
+        self.refresh()
+
+    def get_selected(self):
+        """
+        Get the spot selected by the last selection event.
+
+        Returns:
+            tuple: Index of the frame and index of the spot within the frame, or None if the event
+                   did not select a spot (a frame row was clicked, or the selected row scrolled away).
+        """
+        return self._current
+
+    def sort_by(self, column):
+        """
+        Sort by a column; sorting again by the same column reverses the order.
+
+        Args:
+            column (str): Id of the column.
+        """
+        if self._model is None:
+            return
+        descending = self._model.sort_column == column and not self._model.sort_descending
+        self._model.sort(column, descending)
+        self.refresh()
+
+    def set_filter(self, column=None, minimum=None, maximum=None):
+        """
+        Show only the spots with the values of a column within a range (see ResultsTableModel.set_filter).
+        """
+        if self._model is None:
+            return
+        self._model.set_filter(column, minimum, maximum)
+        self._first_row = min(self._first_row, self._max_first_row())
+        self.refresh()
+
+    def scroll(self, rows):
+        """
+        Scroll by a number of rows.
+
+        Args:
+            rows (int): Number of rows, positive to scroll down.
+        """
+        self._scroll_to(self._first_row + rows)
+        return "break"
+
+    def refresh(self):
+        """
+        Replace the rows of the Treeview with the visible rows of the model.
+        """
+        try:
+            self.treeview.delete(*self.treeview.get_children())
+            if self._model is None:
+                self.scrollbar.set(0, 1)
+                return
+
+            num_rows = self._model.num_rows
+            last_row = min(self._first_row + self._height, num_rows)
+            selected_iid = None
+            for row in range(self._first_row, last_row):
+                text, values = self._model.format_row(row)
+                iid = str(row)
+                self.treeview.insert("", "end", iid=iid, text=text, values=values)
+                description = self._model.get_row(row)
+                if description[0] == "spot" and description[1:] == self._selected:
+                    selected_iid = iid
+
+            # Mark the selected spot without selecting it, which would emit another selection event
+            self.treeview.tag_configure("selected", background="#cce4f7")
+            if selected_iid is not None:
+                self.treeview.item(selected_iid, tags=("selected",))
+
+            if num_rows:
+                self.scrollbar.set(self._first_row / num_rows, last_row / num_rows)
+            else:
+                self.scrollbar.set(0, 1)
+
+        except Exception as e:
+            logger.error(f"Error refreshing results table: {e}")
+
+    def _max_first_row(self):
+        return max(0, self._model.num_rows - self._height) if self._model is not None else 0
+
+    def _scroll_to(self, first_row):
+        first_row = int(min(max(first_row, 0), self._max_first_row()))
+        if first_row != self._first_row:
+            self._first_row = first_row
+            self.refresh()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if self._model is None:
+            return
+        if action == "moveto":
+            self._scroll_to(round(float(amount) * self._model.num_rows))
+        elif action == "scroll":
+            step = self._height if unit == "pages" else 1
+            self._scroll_to(self._first_row + int(amount) * step)
+
+    def _on_mouse_wheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_select(self, event=None):
+        # Deleting the selected row while scrolling also emits a selection event
+        self._current = None
+        selection = self.treeview.selection()
+        if not selection or self._model is None:
+            return
+
+        description = self._model.get_row(int(selection[0]))
+        if description[0] == "frame":
+            self._model.toggle_frame(description[1])
+            self._first_row = min(self._first_row, self._max_first_row())
+            # Refreshing after the other handlers keeps them from seeing the rebuilt rows
+            self.treeview.after_idle(self.refresh)
+        else:
+            self._selected = self._current = description[1:]
+            for iid in self.treeview.get_children():
+                self.treeview.item(iid, tags=())